@@ -0,0 +1,290 @@
+# Author: Bryan Zierk
+# Date: 10/18/26
+# Description: Batched move generation with NumPy. A batch of positions is held as an (N, 10, 9) int8 array of the
+# piece codes used by JanggiGame, and the pseudo-legal and valid moves of every board are computed together with array
+# operations rather than one game at a time. Moves come back as (N, 90, 90) boolean masks indexed by board, origin
+# square, and destination square, where square is row * 9 + col. Requires numpy, unlike the rest of the game.
+
+import argparse
+import sys
+import time
+import numpy as np
+import JanggiGame as jg
+import JanggiPerft
+
+# Lookups past the edge of a table use square 90, an extra column which is always empty, so every table can be padded
+# to a fixed width and read with one fancy index.
+PAD = 90
+
+
+def build_step_table(steps):
+    """
+    Flattens a table of one step destinations into parallel arrays of origin and destination squares.
+    """
+    rows = [(square, dest) for square in range(90) for dest in steps[square]]
+    return tuple(np.array(column, dtype=np.intp) for column in zip(*rows))
+
+
+def build_leg_table(moves):
+    """
+    Flattens a Horse or Elephant table into parallel arrays of origin squares, one array per leg, and destinations.
+    """
+    rows = [(square,) + move for square in range(90) for move in moves[square]]
+    return tuple(np.array(column, dtype=np.intp) for column in zip(*rows))
+
+
+def build_ray_table():
+    """
+    Flattens SLIDER_RAYS into an array of ray origins and an (R, 9) array of the squares along each ray, padded.
+    """
+    origins = []
+    rays = []
+    for square in range(90):
+        for ray in jg.SLIDER_RAYS[square]:
+            origins.append(square)
+            rays.append(ray + (PAD,) * (9 - len(ray)))
+    return np.array(origins, dtype=np.intp), np.array(rays, dtype=np.intp)
+
+
+def build_square_table(entries, width, depth):
+    """
+    Builds a (90, width, depth) array from a table giving, for every square, a list of tuples of depth squares, padding
+    unused entries with PAD.
+    """
+    table = np.full((90, width, depth), PAD, dtype=np.intp)
+    for square in range(90):
+        for index, entry in enumerate(entries[square]):
+            table[square, index] = entry
+    return table
+
+
+PALACE_STEP_TABLES = {color: build_step_table(jg.PALACE_STEPS[color]) for color in (jg.BLUE, jg.RED)}
+SOLDIER_STEP_TABLES = {color: build_step_table(jg.SOLDIER_MOVES[color]) for color in (jg.BLUE, jg.RED)}
+HORSE_ORIGINS, HORSE_LEGS, HORSE_DESTS = build_leg_table(jg.HORSE_MOVES)
+ELEPHANT_ORIGINS, ELEPHANT_FIRSTS, ELEPHANT_LEGS, ELEPHANT_DESTS = build_leg_table(jg.ELEPHANT_MOVES)
+RAY_ORIGINS, RAY_SQUARES = build_ray_table()
+RAYS_BY_SQUARE = build_square_table([[ray + (PAD,) * (9 - len(ray)) for ray in jg.SLIDER_RAYS[square]]
+                                     for square in range(90)], 8, 9)
+HORSE_ATTACK_TABLE = build_square_table(jg.HORSE_ATTACKS, 8, 2)
+ELEPHANT_ATTACK_TABLE = build_square_table(jg.ELEPHANT_ATTACKS, 8, 3)
+SOLDIER_ATTACK_TABLE = np.stack([build_square_table([[(other,) for other in jg.SOLDIER_ATTACKS[color][square]]
+                                                     for square in range(90)], 5, 1)[:, :, 0]
+                                 for color in (jg.BLUE, jg.RED)])
+PALACE_ATTACK_TABLE = np.stack([build_square_table([[(other,) for other in jg.PALACE_STEPS[color][square]]
+                                                    for square in range(90)], 8, 1)[:, :, 0]
+                                for color in (jg.BLUE, jg.RED)])
+SQUARE_ID_ARRAY = np.array(jg.SQUARE_IDS, dtype=np.intp)
+
+
+def build_line_table():
+    """
+    Builds a (90, 90) boolean array marking, for a General on each square, the squares whose contents can decide
+    whether a Chariot, Cannon, Horse or Elephant attacks it: every square on its rays and every Horse and Elephant leg.
+    """
+    table = np.zeros((90, 90), dtype=bool)
+    for square in range(90):
+        for ray in jg.SLIDER_RAYS[square]:
+            table[square, list(ray)] = True
+        for src, leg in jg.HORSE_ATTACKS[square]:
+            table[square, leg] = True
+        for src, first, leg in jg.ELEPHANT_ATTACKS[square]:
+            table[square, [first, leg]] = True
+    return table
+
+
+LINE_TABLE = build_line_table()
+
+
+def boards_from_games(games):
+    """
+    Returns the positions of a list of games as an (N, 10, 9) int8 array of piece codes and an (N,) int8 array of the
+    color bit of the side to move in each.
+    """
+    boards = np.frombuffer(b''.join(bytes(game.get_squares()) for game in games), dtype=np.int8)
+    colors = np.array([jg.COLOR_BITS[game.active_turn()] for game in games], dtype=np.int8)
+    return boards.reshape(len(games), 10, 9), colors
+
+
+def extend(boards):
+    """
+    Returns (N, 91) uint8 piece codes: the boards flattened, with the always empty PAD square added at the end.
+    """
+    extended = np.zeros((len(boards), 91), dtype=np.uint8)
+    extended[:, :90] = boards.reshape(len(boards), 90)
+    return extended
+
+
+def pseudo_legal_masks(boards, colors):
+    """
+    Returns an (N, 90, 90) mask of every move each board's side to move could make by the piece movement rules
+    alone, without regard to leaving its own General in check, and without passes.
+    """
+    return _pseudo_legal(extend(boards), np.asarray(colors, dtype=np.uint8))[:, :, :90]
+
+
+def _pseudo_legal(squares, colors):
+    """
+    Does the work of pseudo_legal_masks on extended boards, returning the (N, 90, 91) mask with the PAD column.
+    """
+    masks = np.zeros((len(squares), 90, 91), dtype=bool)
+    occupied = squares != 0
+    own = (squares & colors[:, None]) != 0
+    own_types = np.where(own, squares & jg.TYPE_MASK, 0)
+
+    # Every table is only read past the origin where the moving piece stands. Generals, Guards and Soldiers step to
+    # fixed neighbours which depend on their color, so each color's step tables are read for the boards with that
+    # color to move.
+    for color in (jg.BLUE, jg.RED):
+        moving = (colors == color)[:, None]
+        origins, dests = PALACE_STEP_TABLES[color]
+        board, step = np.nonzero(moving & ((own_types[:, origins] == jg.GENERAL) | (own_types[:, origins] == jg.GUARD)))
+        keep = ~own[board, dests[step]]
+        masks[board[keep], origins[step[keep]], dests[step[keep]]] = True
+        origins, dests = SOLDIER_STEP_TABLES[color]
+        board, step = np.nonzero(moving & (own_types[:, origins] == jg.SOLDIER))
+        keep = ~own[board, dests[step]]
+        masks[board[keep], origins[step[keep]], dests[step[keep]]] = True
+
+    # Horses and Elephants move along precomputed paths which are blocked by a piece on any leg.
+    board, step = np.nonzero(own_types[:, HORSE_ORIGINS] == jg.HORSE)
+    keep = ~occupied[board, HORSE_LEGS[step]] & ~own[board, HORSE_DESTS[step]]
+    masks[board[keep], HORSE_ORIGINS[step[keep]], HORSE_DESTS[step[keep]]] = True
+    board, step = np.nonzero(own_types[:, ELEPHANT_ORIGINS] == jg.ELEPHANT)
+    keep = (~occupied[board, ELEPHANT_FIRSTS[step]] & ~occupied[board, ELEPHANT_LEGS[step]] &
+            ~own[board, ELEPHANT_DESTS[step]])
+    masks[board[keep], ELEPHANT_ORIGINS[step[keep]], ELEPHANT_DESTS[step[keep]]] = True
+
+    # Chariots and Cannons scan only the rays leaving them, with a running count of the pieces passed: a Chariot
+    # reaches every point with none before it, a Cannon every point with exactly one, the screen, which must not be a
+    # Cannon.
+    ray_types = own_types[:, RAY_ORIGINS]
+    board, ray = np.nonzero((ray_types == jg.CHARIOT) | (ray_types == jg.CANNON))
+    ray_squares = RAY_SQUARES[ray]
+    codes = squares[board[:, None], ray_squares]
+    ray_occupied = codes != 0
+    before = np.cumsum(ray_occupied, axis=1, dtype=np.uint8) - ray_occupied
+    open_dest = (codes & colors[board, None]) == 0
+    screens = codes[np.arange(len(ray)), np.argmax(ray_occupied, axis=1)]
+    cannon = ((ray_types[board, ray] == jg.CANNON) & ray_occupied.any(axis=1) &
+              ((screens & jg.TYPE_MASK) != jg.CANNON))
+    reach = np.where((ray_types[board, ray] == jg.CHARIOT)[:, None], before == 0,
+                     cannon[:, None] & (before == 1) & ((codes & jg.TYPE_MASK) != jg.CANNON)) & open_dest
+    hit, step = np.nonzero(reach & (ray_squares != PAD))
+    masks[board[hit], RAY_ORIGINS[ray[hit]], ray_squares[hit, step]] = True
+    return masks
+
+
+def attacked(squares, targets, by):
+    """
+    Takes (M, 91) extended boards, an (M,) array of target squares, and an (M,) array of attacking color bits, and
+    returns an (M,) mask of the boards on which the target square is attacked. Works outward from the target square
+    as JanggiGame._attacked does.
+    """
+    rows = np.arange(len(squares))
+    by = np.asarray(by, dtype=np.uint8)
+    color_index = (by == jg.RED).astype(np.intp)
+    occupant = squares[rows, targets]
+
+    codes = squares[rows[:, None, None], RAYS_BY_SQUARE[targets]]
+    ray_occupied = codes != 0
+    before = np.cumsum(ray_occupied, axis=2, dtype=np.uint8) - ray_occupied
+    hits = ((before == 0) & (codes == (by | jg.CHARIOT)[:, None, None])).any(axis=(1, 2))
+    screens = np.take_along_axis(codes, np.argmax(ray_occupied, axis=2)[:, :, None], axis=2)[:, :, 0]
+    cannon_hits = ((before == 1) & (codes == (by | jg.CANNON)[:, None, None]) &
+                   ((screens & jg.TYPE_MASK) != jg.CANNON)[:, :, None]).any(axis=(1, 2))
+    hits |= cannon_hits & ((occupant & jg.TYPE_MASK) != jg.CANNON)
+
+    horses = HORSE_ATTACK_TABLE[targets]
+    hits |= ((squares[rows[:, None], horses[:, :, 0]] == (by | jg.HORSE)[:, None]) &
+             (squares[rows[:, None], horses[:, :, 1]] == 0)).any(axis=1)
+    elephants = ELEPHANT_ATTACK_TABLE[targets]
+    hits |= ((squares[rows[:, None], elephants[:, :, 0]] == (by | jg.ELEPHANT)[:, None]) &
+             (squares[rows[:, None], elephants[:, :, 1]] == 0) &
+             (squares[rows[:, None], elephants[:, :, 2]] == 0)).any(axis=1)
+    soldiers = squares[rows[:, None], SOLDIER_ATTACK_TABLE[color_index, targets]]
+    hits |= (soldiers == (by | jg.SOLDIER)[:, None]).any(axis=1)
+    palace = squares[rows[:, None], PALACE_ATTACK_TABLE[color_index, targets]]
+    hits |= ((palace == (by | jg.GENERAL)[:, None]) | (palace == (by | jg.GUARD)[:, None])).any(axis=1)
+    return hits & ((occupant & by) == 0)
+
+
+def general_squares(squares, colors):
+    """
+    Returns the square of the General of the given color bit on each extended board.
+    """
+    return np.argmax(squares[:, :90] == (colors | jg.GENERAL)[:, None], axis=1)
+
+
+def legal_masks(boards, colors):
+    """
+    Returns an (N, 90, 90) mask of the valid moves of each board's side to move, the same moves get_valid_moves
+    returns: every pseudo-legal move which could expose the General is played on a copy of its board and kept if it
+    leaves the General safe, and every piece may pass (origin equal to destination) unless its side is in check.
+    """
+    squares = extend(boards)
+    colors = np.asarray(colors, dtype=np.uint8)
+    enemies = colors ^ jg.COLOR_MASK
+    masks = _pseudo_legal(squares, colors)
+    generals = general_squares(squares, colors)
+    in_check = attacked(squares, generals, enemies)
+
+    # As in JanggiGame._is_safe, a side not in check can only be put in check by moving its General or by moving a
+    # piece from or to a square on one of the General's lines, so only those moves are played out.
+    board, orig = np.divmod(np.flatnonzero(masks), 90 * 91)
+    orig, dest = np.divmod(orig, 91)
+    general = generals[board]
+    tested = in_check[board] | (orig == general) | LINE_TABLE[general, orig] | LINE_TABLE[general, dest]
+    board, orig, dest, general = board[tested], orig[tested], dest[tested], general[tested]
+    after = squares[board]
+    rows = np.arange(len(board))
+    after[rows, dest] = after[rows, orig]
+    after[rows, orig] = 0
+    unsafe = attacked(after, np.where(orig == general, dest, general), enemies[board])
+    masks[board[unsafe], orig[unsafe], dest[unsafe]] = False
+
+    passes = ((squares[:, :90] & colors[:, None]) != 0) & ~in_check[:, None]
+    diagonal = np.arange(90)
+    masks[:, diagonal, diagonal] = passes
+    return masks[:, :, :90]
+
+
+def mask_moves(mask):
+    """
+    Returns the sorted move IDs of one board's (90, 90) move mask, in the numbering used by JanggiGame.
+    """
+    orig, dest = np.nonzero(mask)
+    return sorted((SQUARE_ID_ARRAY[orig] * 100 + SQUARE_ID_ARRAY[dest]).tolist())
+
+
+def main(argv=None):
+    """
+    Command line entry point. Times pseudo-legal and legal mask generation on a batch of random positions against
+    calling get_valid_moves on each game, checks that every board agrees, and prints boards per second.
+    """
+    parser = argparse.ArgumentParser(description='Batched NumPy move generation benchmark')
+    parser.add_argument('boards', type=int, nargs='?', default=1000, help='number of positions (default 1000)')
+    parser.add_argument('--seed', type=int, default=0, help='seed for the random positions (default 0)')
+    args = parser.parse_args(argv)
+
+    games = JanggiPerft.random_games(args.boards, args.seed)
+    boards, colors = boards_from_games(games)
+    start = time.perf_counter()
+    pseudo_legal_masks(boards, colors)
+    pseudo_time = time.perf_counter() - start
+    start = time.perf_counter()
+    masks = legal_masks(boards, colors)
+    legal_time = time.perf_counter() - start
+    start = time.perf_counter()
+    valid_moves = [game.get_valid_moves(game.active_turn()) for game in games]
+    loop_time = time.perf_counter() - start
+
+    mismatches = sum(mask_moves(mask) != sorted(valid) for mask, valid in zip(masks, valid_moves))
+    print('pseudo_legal_masks %10d boards/sec' % (len(games) / pseudo_time))
+    print('legal_masks        %10d boards/sec' % (len(games) / legal_time))
+    print('get_valid_moves    %10d boards/sec' % (len(games) / loop_time))
+    print('%d boards, %d disagree with get_valid_moves' % (len(games), mismatches))
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
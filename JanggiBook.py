@@ -0,0 +1,216 @@
+# Author: Bryan Zierk
+# Date: 10/18/26
+# Description: Opening book for JanggiGame. The book is built by replaying the games of record files (see
+# JanggiImporter) up to a fixed number of moves and counting, for every position reached, how often each move was
+# played and how well it scored for the side which played it. The counts are saved in a small sorted binary file,
+# and probing the book for a position is a single dictionary lookup on the position key.
+
+import argparse
+import random
+import struct
+import sys
+import time
+import JanggiGame as jg
+import JanggiImporter
+
+DEFAULT_PLY = 20
+
+# The file is a header holding the number of entries, then one entry per (position, move) sorted by position key and
+# move ID: the key, the move ID, the number of games the move was played in, and the points it scored for the side
+# which played it, counted in half points so a win is 2 and a draw is 1. Games with no recorded result count as draws.
+MAGIC = b'JGBK'
+VERSION = 1
+HEADER_STRUCT = struct.Struct('<4sHI')
+ENTRY_STRUCT = struct.Struct('<QHII')
+
+
+class BookMove:
+    """
+    One move stored in the book for a position, with the number of games it was played in and the points it scored.
+    """
+    def __init__(self, move, games, points, weight):
+        self._move = move
+        self._games = games
+        self._points = points
+        self._weight = weight
+
+    def get_move(self):
+        """
+        Returns the Move
+        """
+        return self._move
+
+    def get_games(self):
+        """
+        Returns the number of games the move was played in
+        """
+        return self._games
+
+    def get_points(self):
+        """
+        Returns the points the move scored, in half points: 2 for each win and 1 for each draw
+        """
+        return self._points
+
+    def get_score(self):
+        """
+        Returns the fraction of the available points the move scored, from 0 for all losses to 1 for all wins
+        """
+        return self._points / (2 * self._games)
+
+    def get_weight(self):
+        """
+        Returns the share of the games reaching the position in which this move was played
+        """
+        return self._weight
+
+    def __repr__(self):
+        return 'BookMove(%r, %d games, score %.2f)' % (self._move, self._games, self.get_score())
+
+
+class OpeningBook:
+    """
+    Maps position keys to the moves played from them, most played first. A book is built with BookBuilder or loaded
+    from a file with OpeningBook.load.
+    """
+    def __init__(self, counts=None):
+        """
+        Builds a book from a dictionary mapping position keys to dictionaries of move ID to [games, points].
+        """
+        self._entries = {}
+        for key, moves in (counts or {}).items():
+            total = sum(games for games, points in moves.values())
+            self._entries[key] = tuple(BookMove(jg.Move.from_id(move), games, points, games / total)
+                                       for move, (games, points) in sorted(moves.items(),
+                                                                           key=lambda item: (-item[1][0], item[0])))
+
+    def __len__(self):
+        return len(self._entries)
+
+    def probe(self, game):
+        """
+        Returns the list of BookMoves for the game's current position, most played first, or an empty list if the
+        position is not in the book. Positions are matched on their 64 bit position key alone, so the moves are not
+        checked again here; choose checks the move it picks.
+        """
+        return list(self._entries.get(game.position_key(), ()))
+
+    def choose(self, game, rng=random):
+        """
+        Picks a book move for the game's current position at random, in proportion to how often each was played,
+        and returns it as a Move, or returns None if the position is not in the book. The move picked is checked
+        with is_valid_move, so a position key collision can never play an invalid move.
+        """
+        entries = self.probe(game)
+        if not entries:
+            return None
+        move = rng.choices(entries, [entry.get_games() for entry in entries])[0].get_move()
+        return move if game.is_valid_move(move) else None
+
+    def save(self, path):
+        """
+        Writes the book to a file at path, replacing any file already there.
+        """
+        rows = sorted((key, int(entry.get_move()), entry.get_games(), entry.get_points())
+                      for key, entries in self._entries.items() for entry in entries)
+        with open(path, 'wb') as file:
+            file.write(HEADER_STRUCT.pack(MAGIC, VERSION, len(rows)))
+            for row in rows:
+                file.write(ENTRY_STRUCT.pack(*row))
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads a book written by save. Raises ValueError if the file is not a book.
+        """
+        with open(path, 'rb') as file:
+            data = file.read()
+        if len(data) < HEADER_STRUCT.size:
+            raise ValueError('%s is too short to be an opening book' % path)
+        magic, version, count = HEADER_STRUCT.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION or len(data) != HEADER_STRUCT.size + ENTRY_STRUCT.size * count:
+            raise ValueError('%s is not a version %d opening book' % (path, VERSION))
+        counts = {}
+        for key, move, games, points in ENTRY_STRUCT.iter_unpack(data[HEADER_STRUCT.size:]):
+            counts.setdefault(key, {})[move] = [games, points]
+        return cls(counts)
+
+
+class BookBuilder:
+    """
+    Counts the moves played in the first max_ply moves of each game added, for building an OpeningBook.
+    """
+    def __init__(self, max_ply=DEFAULT_PLY):
+        self._max_ply = max_ply
+        self._counts = {}
+        self._games = 0
+
+    def add_game(self, moves, result=None):
+        """
+        Replays a game given as a list of move IDs or Moves, which must already be known to be valid, and counts its
+        first max_ply moves. The result is 'blue' or 'red' for the winner, 'draw', or None if it is unknown.
+        """
+        game = jg.JanggiGame(jg.MoveCache(0))
+        for move in moves[:self._max_ply]:
+            turn = game.active_turn()
+            points = 2 if result == turn else 0 if result in ('blue', 'red') else 1
+            entry = self._counts.setdefault(game.position_key(), {}).setdefault(int(move), [0, 0])
+            entry[0] += 1
+            entry[1] += points
+            game.make_move_helper(jg.Move.from_id(move))
+        self._games += 1
+
+    def add_file(self, path):
+        """
+        Adds every valid game in a record file and returns how many games were skipped because of an invalid move.
+        """
+        skipped = 0
+        for record in JanggiImporter.import_file(path):
+            if record.is_valid():
+                self.add_game(record.get_moves(), record.get_result())
+            else:
+                skipped += 1
+        return skipped
+
+    def get_games(self):
+        """
+        Returns the number of games added
+        """
+        return self._games
+
+    def build(self, min_games=1):
+        """
+        Returns an OpeningBook of the moves played in at least min_games of the games added.
+        """
+        counts = {}
+        for key, moves in self._counts.items():
+            kept = {move: entry for move, entry in moves.items() if entry[0] >= min_games}
+            if kept:
+                counts[key] = kept
+        return OpeningBook(counts)
+
+
+def main(argv=None):
+    """
+    Command line entry point. Builds a book from record files, saves it, and prints its size and the time taken.
+    """
+    parser = argparse.ArgumentParser(description='Build a Janggi opening book from game record files')
+    parser.add_argument('output', help='file to write the book to')
+    parser.add_argument('paths', nargs='+', help='record files, one game per line')
+    parser.add_argument('--ply', type=int, default=DEFAULT_PLY, help='moves of each game to count (default %d)'
+                        % DEFAULT_PLY)
+    parser.add_argument('--min-games', type=int, default=1, help='games a move needs to be kept (default 1)')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    builder = BookBuilder(args.ply)
+    skipped = sum(builder.add_file(path) for path in args.paths)
+    book = builder.build(args.min_games)
+    book.save(args.output)
+    print('games %d  skipped %d  positions %d  time %.3fs' % (builder.get_games(), skipped, len(book),
+                                                             time.perf_counter() - start))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
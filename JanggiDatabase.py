@@ -0,0 +1,176 @@
+# Author: Bryan Zierk
+# Date: 10/18/26
+# Description: An on-disk database of Janggi positions with an evaluation, a visit count, and a best move stored for
+# each. The file is opened with mmap and searched through an open addressing hash index on the position key, so a
+# lookup reads only the few bytes it needs and any number of reader processes share one copy in the page cache
+# instead of each loading the whole database into memory.
+
+import mmap
+import struct
+import sys
+from array import array
+import JanggiGame as jg
+
+# The file is a header, then one fixed size entry per position, then the index. Each entry holds the position key,
+# the position's binary record (see JanggiGame.RECORD_SLOTS), and the payload: the evaluation, the visit count, and the
+# best move ID, 0 meaning none. The index is a power of two number of slots, at least twice the number of entries,
+# each holding the number of an entry plus one, or 0 if the slot is free. A position's search starts at the slot
+# given by the low bits of its key and moves forward one slot at a time until its entry or a free slot is found.
+MAGIC = b'JGDB'
+VERSION = 1
+HEADER_STRUCT = struct.Struct('<4sHHQQ')
+ENTRY_STRUCT = struct.Struct('<Q%dsiIH2x' % jg.RECORD_SIZE)
+PAYLOAD_STRUCT = struct.Struct('<iIH')
+SLOT_STRUCT = struct.Struct('<I')
+KEY_STRUCT = struct.Struct('<Q')
+
+# The move counters at the end of a record are not part of the position, so only the piece slots and the side to move
+# are compared when checking that an entry really is the position looked up.
+POSITION_BYTES = 33
+
+
+class DatabaseEntry:
+    """
+    The stored information about one position: its evaluation, how many times it was visited, and its best move.
+    """
+    def __init__(self, score, visits, best_move):
+        self._score = score
+        self._visits = visits
+        self._best_move = best_move
+
+    def get_score(self):
+        """
+        Returns the stored evaluation of the position, from the point of view of the side to move
+        """
+        return self._score
+
+    def get_visits(self):
+        """
+        Returns the number of times the position was visited
+        """
+        return self._visits
+
+    def get_best_move(self):
+        """
+        Returns the stored best Move, or None if there is none
+        """
+        if not self._best_move:
+            return None
+        return jg.Move.from_id(self._best_move)
+
+    def __repr__(self):
+        return 'DatabaseEntry(%d, %d, %r)' % (self._score, self._visits, self.get_best_move())
+
+
+class DatabaseBuilder:
+    """
+    Collects positions and their payloads in memory and writes them out as a database file. Adding a position which
+    is already present replaces its payload.
+    """
+    def __init__(self):
+        self._entries = {}
+
+    def add(self, game, score, visits=1, best_move=None):
+        """
+        Adds the game's current position with its evaluation, visit count, and best move, given as a Move, a move
+        ID, or None.
+        """
+        record = game.to_record()
+        self._entries[(game.position_key(), record[:POSITION_BYTES])] = \
+            (record, score, visits, int(best_move) if best_move is not None else 0)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def write(self, path):
+        """
+        Writes every position added so far to a database file at path, replacing any file already there.
+        """
+        count = len(self._entries)
+        slots = 1
+        while slots < count * 2:
+            slots *= 2
+        mask = slots - 1
+        index = array('I', bytes(4 * slots))
+        with open(path, 'wb') as file:
+            file.write(HEADER_STRUCT.pack(MAGIC, VERSION, ENTRY_STRUCT.size, count, slots))
+            for number, ((key, position), payload) in enumerate(self._entries.items()):
+                file.write(ENTRY_STRUCT.pack(key, *payload))
+                slot = key & mask
+                while index[slot]:
+                    slot = (slot + 1) & mask
+                index[slot] = number + 1
+            if sys.byteorder == 'big':
+                index.byteswap()
+            file.write(index.tobytes())
+
+
+class PositionDatabase:
+    """
+    A read only database file opened with mmap. Positions are found with lookup, which reads the index and the one
+    matching entry straight from the mapped file.
+    """
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < HEADER_STRUCT.size:
+            self._map.close()
+            raise ValueError('%s is too short to be a position database' % path)
+        magic, version, entry_size, count, slots = HEADER_STRUCT.unpack_from(self._map, 0)
+        expected_size = HEADER_STRUCT.size + entry_size * count + SLOT_STRUCT.size * slots
+        if magic != MAGIC or version != VERSION or entry_size != ENTRY_STRUCT.size or slots & (slots - 1) or \
+                slots <= count or len(self._map) != expected_size:
+            self._map.close()
+            raise ValueError('%s is not a version %d position database' % (path, VERSION))
+        self._count = count
+        self._mask = slots - 1
+        self._index_start = HEADER_STRUCT.size + entry_size * count
+
+    def __len__(self):
+        return self._count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Unmaps the database file.
+        """
+        self._map.close()
+
+    def lookup(self, game):
+        """
+        Returns the DatabaseEntry for the game's current position, or None if the position is not in the database.
+        """
+        return self._find(game.position_key(), game.to_record()[:POSITION_BYTES])
+
+    def _find(self, key, position):
+        """
+        Returns the DatabaseEntry stored for a position key whose record starts with the given position bytes, or
+        None if there is none.
+        """
+        database = self._map
+        mask = self._mask
+        slot = key & mask
+        while True:
+            number = SLOT_STRUCT.unpack_from(database, self._index_start + 4 * slot)[0]
+            if not number:
+                return None
+            offset = HEADER_STRUCT.size + ENTRY_STRUCT.size * (number - 1)
+            if KEY_STRUCT.unpack_from(database, offset)[0] == key and \
+                    database[offset + 8:offset + 8 + POSITION_BYTES] == position:
+                return DatabaseEntry(*PAYLOAD_STRUCT.unpack_from(database, offset + 8 + jg.RECORD_SIZE))
+            slot = (slot + 1) & mask
+
+    def __iter__(self):
+        """
+        Yields a (game, DatabaseEntry) pair for every position in the database, in the order they were written.
+        """
+        move_cache = jg.MoveCache()
+        for number in range(self._count):
+            key, record, score, visits, best_move = ENTRY_STRUCT.unpack_from(
+                self._map, HEADER_STRUCT.size + ENTRY_STRUCT.size * number)
+            yield jg.JanggiGame.from_record(record, move_cache), DatabaseEntry(score, visits, best_move)
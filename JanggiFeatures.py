@@ -0,0 +1,297 @@
+# Author: Bryan Zierk
+# Date: 10/18/26
+# Description: Feature planes for training neural networks on Janggi positions. Each position becomes a stack of
+# PLANE_COUNT 10 x 9 planes: one occupancy plane per color and piece type, then one plane which is all ones when Red
+# is to move. Planes are written with array operations straight from the games' square arrays or from packed binary
+# records (see JanggiGame.RECORD_SLOTS) into preallocated NumPy buffers or np.memmap shards on disk, and a generator
+# reads the shards back in fixed size batches. Requires numpy, unlike the rest of the game.
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import JanggiGame as jg
+import JanggiImporter
+import JanggiPerft
+
+# Plane (color index * 7 + piece type - 1) marks the squares holding that piece, with Blue's seven planes first in the
+# order General, Guard, Elephant, Horse, Chariot, Cannon, Soldier, then Red's. The last plane marks the side to move.
+PLANE_COUNT = 15
+SIDE_PLANE = 14
+PLANE_SHAPE = (PLANE_COUNT, 10, 9)
+DEFAULT_SHARD_SIZE = 65536
+SHARD_PATTERN = 'shard-%05d.npy'
+
+# The binary record layout as a NumPy structured type, so a block of records can be read without unpacking each.
+RECORD_DTYPE = np.dtype([('slots', np.uint8, 32), ('turn', np.uint8), ('halfmove', np.uint8), ('fullmove', '<u2')])
+
+
+def plane_index(color, piece_type):
+    """
+    Returns the plane marking the pieces of a color ('blue' or 'red') and piece type
+    """
+    return (jg.COLOR_BITS[color] == jg.RED) * 7 + piece_type - 1
+
+
+def build_code_offsets():
+    """
+    Builds the lookup from a piece code to the flat offset of its plane. Empty squares map to the side to move plane,
+    which is written last and so overwrites them.
+    """
+    offsets = np.full(32, SIDE_PLANE * 90, dtype=np.intp)
+    for color in ('blue', 'red'):
+        for piece_type in jg.PIECE_NAMES:
+            offsets[jg.COLOR_BITS[color] | piece_type] = plane_index(color, piece_type) * 90
+    return offsets
+
+
+# Lookups from a piece code to the flat offset of its plane, and from a record slot to the same.
+CODE_OFFSETS = build_code_offsets()
+SLOT_OFFSETS = np.array([plane_index('blue' if slot < 16 else 'red', jg.RECORD_SLOTS[slot & 15]) * 90
+                         for slot in range(32)], dtype=np.intp)
+
+
+def allocate(count, dtype=np.uint8):
+    """
+    Returns a zeroed buffer for the planes of count positions, of shape (count,) + PLANE_SHAPE
+    """
+    return np.zeros((count,) + PLANE_SHAPE, dtype=dtype)
+
+
+def squares_to_planes(squares, red_to_move, out):
+    """
+    Writes the planes of an (N, 90) array of piece codes, with an (N,) boolean array marking the boards with Red to
+    move, into out, an (N,) + PLANE_SHAPE array, and returns out.
+    """
+    flat = out.reshape(len(out), PLANE_COUNT * 90)
+    flat[:] = 0
+    board, square = np.nonzero(squares)
+    flat[board, CODE_OFFSETS[squares[board, square]] + square] = 1
+    out[:, SIDE_PLANE] = red_to_move[:, None, None]
+    return out
+
+
+def games_to_planes(games, out=None):
+    """
+    Writes the planes of the current positions of a list of games into out, or into a new uint8 buffer if out is
+    None, and returns it. Each game's square array is copied straight into one shared scratch array.
+    """
+    if out is None:
+        out = allocate(len(games))
+    squares = np.empty((len(games), 90), dtype=np.uint8)
+    view = memoryview(squares.reshape(-1))
+    red_to_move = np.empty(len(games), dtype=bool)
+    for index, game in enumerate(games):
+        view[index * 90:index * 90 + 90] = game.get_squares()
+        red_to_move[index] = game.active_turn() == 'red'
+    return squares_to_planes(squares, red_to_move, out)
+
+
+def records_to_planes(data, out=None):
+    """
+    Writes the planes of a bytes-like block of binary records (see JanggiGame.encode_records) into out, or into a
+    new uint8 buffer if out is None, and returns it. The records are read in place, with no object per position.
+    Raises ValueError if the data is not a whole number of records or a slot holds a square off the board.
+    """
+    if len(data) % jg.RECORD_SIZE:
+        raise ValueError('%d bytes is not a whole number of %d byte records' % (len(data), jg.RECORD_SIZE))
+    records = np.frombuffer(data, dtype=RECORD_DTYPE)
+    slots = records['slots']
+    if out is None:
+        out = allocate(len(records))
+    present = slots != jg.NO_SQUARE
+    if (slots[present] >= 90).any():
+        raise ValueError('a record holds a square off the board')
+    flat = out.reshape(len(out), PLANE_COUNT * 90)
+    flat[:] = 0
+    board, slot = np.nonzero(present)
+    flat[board, SLOT_OFFSETS[slot] + slots[board, slot]] = 1
+    out[:, SIDE_PLANE] = (records['turn'] == jg.RED)[:, None, None]
+    return out
+
+
+class ShardWriter:
+    """
+    Writes planes into numbered .npy shards of shard_size positions in a directory, each opened as an np.memmap and
+    filled in place. close, or leaving a with block, trims the last shard to the positions written. The shards are
+    ordinary .npy files, so np.load(path, mmap_mode='r') reads them back. Shards already in the directory from an
+    earlier export are deleted, so load_shards never mixes them into the new data set.
+    """
+    def __init__(self, directory, shard_size=DEFAULT_SHARD_SIZE, dtype=np.uint8):
+        os.makedirs(directory, exist_ok=True)
+        for name in shard_names(directory):
+            os.remove(os.path.join(directory, name))
+        self._directory = directory
+        self._shard_size = shard_size
+        self._dtype = dtype
+        self._paths = []
+        self._shard = None
+        self._filled = 0
+        self._count = 0
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self._count
+
+    def get_paths(self):
+        """
+        Returns the list of shard paths written so far
+        """
+        return list(self._paths)
+
+    def _reserve(self, count):
+        """
+        Returns a view of the next count or fewer free positions of the current shard, starting a new shard when the
+        current one is full. Raises ValueError if the writer has been closed.
+        """
+        if self._closed:
+            raise ValueError('the shard writer is closed')
+        if self._shard is None or self._filled == self._shard_size:
+            self._finish()
+            path = os.path.join(self._directory, SHARD_PATTERN % len(self._paths))
+            self._shard = np.lib.format.open_memmap(path, mode='w+', dtype=self._dtype,
+                                                    shape=(self._shard_size,) + PLANE_SHAPE)
+            self._paths.append(path)
+            self._filled = 0
+        count = min(count, self._shard_size - self._filled)
+        view = self._shard[self._filled:self._filled + count]
+        self._filled += count
+        self._count += count
+        return view
+
+    def add_games(self, games):
+        """
+        Writes the current positions of a list of games
+        """
+        start = 0
+        while start < len(games):
+            view = self._reserve(len(games) - start)
+            games_to_planes(games[start:start + len(view)], view)
+            start += len(view)
+
+    def add_records(self, data):
+        """
+        Writes a bytes-like block of binary records. Raises ValueError if it is not a whole number of records.
+        """
+        data = memoryview(data).cast('B')
+        if len(data) % jg.RECORD_SIZE:
+            raise ValueError('%d bytes is not a whole number of %d byte records' % (len(data), jg.RECORD_SIZE))
+        count = len(data) // jg.RECORD_SIZE
+        start = 0
+        while start < count:
+            view = self._reserve(count - start)
+            records_to_planes(data[start * jg.RECORD_SIZE:(start + len(view)) * jg.RECORD_SIZE], view)
+            start += len(view)
+
+    def _finish(self):
+        """
+        Flushes the current shard, first copying it into a shorter file if it was not filled.
+        """
+        if self._shard is None:
+            return
+        shard, self._shard = self._shard, None
+        if self._filled < self._shard_size:
+            path = self._paths[-1]
+            trimmed = np.array(shard[:self._filled])
+            del shard
+            np.save(path, trimmed)
+        else:
+            shard.flush()
+
+    def close(self):
+        """
+        Finishes the last shard. No more positions can be added after this.
+        """
+        self._finish()
+        self._closed = True
+
+
+def shard_names(directory):
+    """
+    Returns the file names of the shards in a directory, in order
+    """
+    return sorted(name for name in os.listdir(directory) if name.startswith('shard-') and name.endswith('.npy'))
+
+
+def load_shards(directory):
+    """
+    Returns the shards in a directory written by ShardWriter, in order, each opened read only as an np.memmap.
+    """
+    return [np.load(os.path.join(directory, name), mmap_mode='r') for name in shard_names(directory)]
+
+
+def iter_batches(shards, batch_size, shuffle=False, seed=0, out=None):
+    """
+    Yields batches of exactly batch_size positions read from a list of plane arrays, such as the shards returned by
+    load_shards, in order or in a random order if shuffle is set. Positions left over after the last full batch are
+    skipped. Every batch is written into the same buffer, out if it is given, so a batch must be used or copied
+    before the next one is read.
+    """
+    sizes = np.array([len(shard) for shard in shards], dtype=np.intp)
+    starts = np.concatenate(([0], np.cumsum(sizes)))
+    total = int(starts[-1])
+    if out is None:
+        out = np.empty((batch_size,) + PLANE_SHAPE, dtype=shards[0].dtype if shards else np.uint8)
+    order = np.random.default_rng(seed).permutation(total) if shuffle else None
+    for first in range(0, total - batch_size + 1, batch_size):
+        if order is None:
+            # Reading in order copies whole runs, crossing into the next shard when one runs out.
+            filled = 0
+            while filled < batch_size:
+                position = first + filled
+                shard = int(np.searchsorted(starts, position, side='right')) - 1
+                row = position - starts[shard]
+                count = min(batch_size - filled, int(sizes[shard] - row))
+                out[filled:filled + count] = shards[shard][row:row + count]
+                filled += count
+        else:
+            indexes = order[first:first + batch_size]
+            owners = np.searchsorted(starts, indexes, side='right') - 1
+            for shard in np.unique(owners):
+                chosen = np.nonzero(owners == shard)[0]
+                out[chosen] = shards[shard][indexes[chosen] - starts[shard]]
+        yield out
+
+
+def main(argv=None):
+    """
+    Command line entry point. Exports the positions of every valid game in the given record files, or of random
+    games, into shards, then reads them back in batches, printing positions per second for each step.
+    """
+    parser = argparse.ArgumentParser(description='Export Janggi positions as feature plane shards')
+    parser.add_argument('output', help='directory to write the shards to')
+    parser.add_argument('paths', nargs='*', help='record files, one game per line')
+    parser.add_argument('--random', type=int, default=0, help='also export this many random positions')
+    parser.add_argument('--shard-size', type=int, default=DEFAULT_SHARD_SIZE, help='positions per shard (default %d)'
+                        % DEFAULT_SHARD_SIZE)
+    parser.add_argument('--batch-size', type=int, default=256, help='positions per batch read back (default 256)')
+    args = parser.parse_args(argv)
+
+    games = JanggiPerft.random_games(args.random) if args.random else []
+    start = time.perf_counter()
+    with ShardWriter(args.output, args.shard_size) as writer:
+        for path in args.paths:
+            for record in JanggiImporter.import_file(path, positions=True):
+                writer.add_records(b''.join(record.get_positions()))
+        writer.add_games(games)
+    elapsed = time.perf_counter() - start
+    print('exported %d positions to %d shards  time %.3fs  positions/sec %.0f'
+          % (len(writer), len(writer.get_paths()), elapsed, len(writer) / elapsed if elapsed else 0))
+
+    start = time.perf_counter()
+    batches = sum(1 for batch in iter_batches(load_shards(args.output), args.batch_size, shuffle=True))
+    elapsed = time.perf_counter() - start
+    print('read %d shuffled batches of %d  time %.3fs  positions/sec %.0f'
+          % (batches, args.batch_size, elapsed, batches * args.batch_size / elapsed if elapsed else 0))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
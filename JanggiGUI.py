@@ -62,6 +62,11 @@ def main():
                 if event.key == p.K_z:
                     sel_square = ()
                     orig_dest_list = []
+                elif event.key == p.K_u:
+                    if game_state.undo_move():
+                        update_board = True
+                    sel_square = ()
+                    orig_dest_list = []
             if len(orig_dest_list) == 2:
                 move = jg.Move(orig_dest_list[0], orig_dest_list[1], game_state.get_board())
                 # print("move is: ", move)
@@ -75,7 +80,7 @@ def main():
                 orig_dest_list = []
         if update_board:
             valid_moves = game_state.get_valid_moves(game_state.active_turn())
-            if len(valid_moves) == 0:
+            if not game_state.has_any_legal_move(game_state.active_turn()):
                 if game_state.active_turn() == 'blue':
                     print('RED WON')
                     game_state.set_game_state('RED_WON')
@@ -83,7 +88,7 @@ def main():
                     print('BLUE WON')
                     game_state.set_game_state('BLUE_WON')
             update_board = False
-        draw_game_state(disp_board, game_state, valid_moves, sel_square)
+        draw_game_state(disp_board, game_state, sel_square)
         clock.tick(maxFps)
         p.display.flip()
 
@@ -97,28 +102,28 @@ def input_to_string(mouse_x, mouse_y):
     return col + row
 
 
-def highlight_valid_moves(disp_board, game_state, valid_moves, sel_square):
+def highlight_valid_moves(disp_board, game_state, sel_square):
     if sel_square != ():
         r, c = sel_square
-        if game_state.get_board()[r][c] is not None:
-            if game_state.get_board()[r][c].get_color() == game_state.active_turn():
+        code = game_state.get_squares()[r * 9 + c]
+        if code:
+            if jg.COLOR_NAMES[code & jg.COLOR_MASK] == game_state.active_turn():
                 s = p.Surface((sqWidth, sqHeight))
                 s.set_alpha(100)
                 s.fill(p.Color('black'))
                 disp_board.blit(s, (c * sqWidth, r * sqHeight))
                 s.fill(p.Color('red'))
-                for move in valid_moves:
-                    #print("r, c: ", r, c)
-                    #print("orig: ", move.get_orig()[0], move.get_orig()[1])
-                    if move.get_orig()[0] == r and move.get_orig()[1] == c:
-                        disp_board.blit(s, (move.get_target()[1] * sqHeight, move.get_target()[0] * sqWidth))
+                # Only the selected piece's moves are generated, rather than scanning every valid move.
+                for move in game_state.iter_moves(game_state.active_turn(),
+                                                  piece_filter=lambda square, code: square == r * 9 + c):
+                    disp_board.blit(s, (move.get_target()[1] * sqHeight, move.get_target()[0] * sqWidth))
     pass
 
 
-def draw_game_state(disp_board, game_state, valid_moves, sel_square):
+def draw_game_state(disp_board, game_state, sel_square):
     draw_board(disp_board)
-    highlight_valid_moves(disp_board, game_state, valid_moves, sel_square)
-    draw_pieces(disp_board, game_state.get_board())
+    highlight_valid_moves(disp_board, game_state, sel_square)
+    draw_pieces(disp_board, game_state)
 
 
 def draw_board(disp_board):
@@ -150,12 +155,13 @@ def draw_board(disp_board):
 
 
 def draw_pieces(disp_board, game_state):
-    for r in range(yDimension):
-        for c in range(xDimension):
-            piece = game_state[r][c]
-            if piece is not None:
-                disp_board.blit(images[piece.get_color() + piece.get_name()], p.Rect(c * sqWidth, r * sqHeight,
-                                                                                     sqWidth, sqHeight))
+    # Only the squares in the piece lists are drawn, rather than building a Piece for every square each frame.
+    squares = game_state.get_squares()
+    for color in ('blue', 'red'):
+        for square in game_state.get_piece_squares(color):
+            r, c = divmod(square, 9)
+            disp_board.blit(images[color + jg.PIECE_NAMES[squares[square] & jg.TYPE_MASK]],
+                            p.Rect(c * sqWidth, r * sqHeight, sqWidth, sqHeight))
 
 
 if __name__ == '__main__':
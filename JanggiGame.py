@@ -5,52 +5,363 @@
 # of lines similar to Go. Players take turns moving pieces in an attempt to trap the opposing player's General. A player
 # is victorious once they have checkmated the opposing general by leaving them no remaining valid moves.
 
+import random
 import string
+from array import array
+import struct
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+# The board is stored as a flat bytearray of 90 squares, indexed row * 9 + col, where row 0 is the Red side. Each
+# square holds a small integer piece code made of a piece type in the low three bits and a color bit above them, with
+# 0 meaning the square is empty.
+EMPTY = 0
+GENERAL = 1
+GUARD = 2
+ELEPHANT = 3
+HORSE = 4
+CHARIOT = 5
+CANNON = 6
+SOLDIER = 7
+TYPE_MASK = 7
+
+BLUE = 8
+RED = 16
+COLOR_MASK = BLUE | RED
+
+COLOR_BITS = {'blue': BLUE, 'red': RED}
+COLOR_NAMES = {BLUE: 'blue', RED: 'red'}
+OPPONENT = {BLUE: RED, RED: BLUE}
+PIECE_NAMES = {GENERAL: 'General', GUARD: 'Guard', ELEPHANT: 'Elephant', HORSE: 'Horse', CHARIOT: 'Chariot',
+               CANNON: 'Cannon', SOLDIER: 'Soldier'}
+
+ORTHOGONAL = ((-1, 0), (1, 0), (0, -1), (0, 1))
+DIAGONAL = ((-1, -1), (1, 1), (-1, 1), (1, -1))
+
+# Corners and centers of both palaces, the only points from which the palace diagonals can be followed
+PALACE_POINTS = frozenset(row * 9 + col for row, col in ((0, 3), (0, 5), (2, 3), (2, 5), (1, 4),
+                                                           (9, 3), (9, 5), (7, 3), (7, 5), (8, 4)))
+
+# Moves are identified by the four digit ID origin row, origin column, destination row, destination column, so the
+# move from a2 to b2 is 0111. IDs fit in an unsigned short, which lets move lists live in preallocated array('H')
+# buffers of MAX_MOVES entries instead of lists of objects.
+SQUARE_IDS = tuple(row * 10 + col for row in range(10) for col in range(9))
+MAX_MOVES = 256
+
+START_POSITION = (
+    (RED | CHARIOT, RED | ELEPHANT, RED | HORSE, RED | GUARD, EMPTY, RED | GUARD, RED | ELEPHANT, RED | HORSE,
+     RED | CHARIOT),
+    (EMPTY, EMPTY, EMPTY, EMPTY, RED | GENERAL, EMPTY, EMPTY, EMPTY, EMPTY),
+    (EMPTY, RED | CANNON, EMPTY, EMPTY, EMPTY, EMPTY, EMPTY, RED | CANNON, EMPTY),
+    (RED | SOLDIER, EMPTY, RED | SOLDIER, EMPTY, RED | SOLDIER, EMPTY, RED | SOLDIER, EMPTY, RED | SOLDIER),
+    (EMPTY,) * 9,
+    (EMPTY,) * 9,
+    (BLUE | SOLDIER, EMPTY, BLUE | SOLDIER, EMPTY, BLUE | SOLDIER, EMPTY, BLUE | SOLDIER, EMPTY, BLUE | SOLDIER),
+    (EMPTY, BLUE | CANNON, EMPTY, EMPTY, EMPTY, EMPTY, EMPTY, BLUE | CANNON, EMPTY),
+    (EMPTY, EMPTY, EMPTY, EMPTY, BLUE | GENERAL, EMPTY, EMPTY, EMPTY, EMPTY),
+    (BLUE | CHARIOT, BLUE | ELEPHANT, BLUE | HORSE, BLUE | GUARD, EMPTY, BLUE | GUARD, BLUE | ELEPHANT,
+     BLUE | HORSE, BLUE | CHARIOT),
+)
+START_SQUARES = bytes(code for row in START_POSITION for code in row)
+
+
+# Positions can be written as text, one letter per piece in the style of chess FEN: the ranks from 10 down to 1
+# separated by slashes, runs of empty points as digits, Blue in upper case and Red in lower case, then the side to
+# move ('b' or 'r'), the number of moves since the last capture, and the move number, which goes up after each Red
+# move. The letters are K General, A Guard, B Elephant, N Horse, R Chariot, C Cannon, and P Soldier.
+PIECE_LETTERS = {GENERAL: 'k', GUARD: 'a', ELEPHANT: 'b', HORSE: 'n', CHARIOT: 'r', CANNON: 'c', SOLDIER: 'p'}
+LETTER_CODES = dict([(letter, RED | piece_type) for piece_type, letter in PIECE_LETTERS.items()] +
+                    [(letter.upper(), BLUE | piece_type) for piece_type, letter in PIECE_LETTERS.items()])
+TURN_LETTERS = {'blue': 'b', 'red': 'r'}
+START_TEXT = 'RBNA1ABNR/4K4/1C5C1/P1P1P1P1P/9/9/p1p1p1p1p/1c5c1/4k4/rbna1abnr b 0 1'
+
+# Positions can also be packed into fixed size binary records. Janggi has no promotion, so neither side can ever
+# have more of a piece than it starts with, and each side gets one byte per starting piece in the order of
+# RECORD_SLOTS holding the square the piece stands on, or NO_SQUARE once it has been captured. Squares of the same
+# kind of piece are kept in increasing order so a position always packs to the same bytes. Blue's 16 bytes come first,
+# then Red's, then the color bit of the side to move, the moves since the last capture (at most 255), and the move
+# number as a little endian unsigned short.
+RECORD_SLOTS = (GENERAL, GUARD, GUARD, ELEPHANT, ELEPHANT, HORSE, HORSE, CHARIOT, CHARIOT, CANNON, CANNON,
+                SOLDIER, SOLDIER, SOLDIER, SOLDIER, SOLDIER)
+RECORD_FIRST_SLOT = {piece_type: RECORD_SLOTS.index(piece_type) for piece_type in PIECE_NAMES}
+RECORD_STRUCT = struct.Struct('<32sBBH')
+RECORD_SIZE = RECORD_STRUCT.size
+NO_SQUARE = 255
+
+MOVE_CACHE_SIZE = 4096
+
+# _apply returns the captured piece code with the captured piece's index in its color's piece list shifted above it,
+# so _revert can put the piece back in the same place without searching the list.
+CAPTURE_SHIFT = 5
+CAPTURE_CODE_MASK = (1 << CAPTURE_SHIFT) - 1
+
+
+class MoveCache:
+    """
+    A bounded least recently used cache of valid move sets, keyed on a position key and the color to move. When the
+    cache is full, adding a position evicts the one which was looked up longest ago. Counts hits and misses so the
+    cache size can be tuned. A single MoveCache may be shared by many games.
+    """
+    def __init__(self, max_size=MOVE_CACHE_SIZE):
+        self._entries = OrderedDict()
+        self._max_size = max_size
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key):
+        """
+        Returns the cached value for a key and marks it as recently used, or None if the key is not cached.
+        """
+        value = self._entries.get(key)
+        if value is None:
+            self._misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self._hits += 1
+        return value
+
+    def put(self, key, value):
+        """
+        Stores a value for a key, evicting the least recently used entry if the cache is over its size bound.
+        """
+        if self._max_size <= 0:
+            return
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Removes every entry and resets the hit and miss counters.
+        """
+        self._entries.clear()
+        self._hits = 0
+        self._misses = 0
+
+    def get_stats(self):
+        """
+        Returns a dictionary with the number of hits and misses, and the current and maximum number of entries.
+        """
+        return {'hits': self._hits, 'misses': self._misses, 'size': len(self._entries), 'max_size': self._max_size}
 
 
 class JanggiGame:
-    def __init__(self):
+    def __init__(self, move_cache=None):
         """
         Builds the Janggi board. A rectangular board with lines creating 90 intersections in a 9x10 grid on which
-        pieces can be placed. This class receives information from the Piece class and its subclasses in order to
-        populate the board and keep track of the type of piece, its color, and its current position.
+        pieces can be placed. The board is kept as a flat array of piece codes along with a list of occupied squares
+        for each color, Piece objects are only built when a caller asks for them through get_board. Valid move sets
+        are remembered in move_cache, a MoveCache which may be shared between games, or a private one if none is
+        given.
+        """
+        self._load_squares(START_SQUARES, 'blue')
+        self._buffer = move_buffer()
+        if move_cache is None:
+            move_cache = MoveCache()
+        self._move_cache = move_cache
+
+    @classmethod
+    def _from_squares(cls, squares, active_turn, halfmove_clock=0, fullmove_number=1, move_cache=None):
+        """
+        Builds a new game directly from 90 piece codes and the rest of the position, without setting up the opening
+        first as __init__ does. Used by the from_* constructors.
         """
+        game = cls.__new__(cls)
+        game._load_squares(squares, active_turn, halfmove_clock, fullmove_number)
+        game._buffer = move_buffer()
+        game._move_cache = move_cache if move_cache is not None else MoveCache()
+        return game
+
+    def _load_squares(self, squares, active_turn, halfmove_clock=0, fullmove_number=1):
+        """
+        Sets up the game from 90 piece codes, the color to move, and the move counters, clearing the move history.
+        Raises ValueError if the codes are not valid or either side does not have exactly one General.
+        """
+        if len(squares) != 90:
+            raise ValueError('a board has 90 squares, got %d' % len(squares))
         self._active_turn = 'blue'
-        self._board = [
-            [Chariot('red', 0, 0), Elephant('red', 0, 1), Horse('red', 0, 2), Guard('red', 0, 3), None,
-             Guard('red', 0, 5), Elephant('red', 0, 6), Horse('red', 0, 7), Chariot('red', 0, 8)],
-            [None, None, None, None, General('red', 1, 4), None, None, None, None],
-            [None, Cannon('red', 2, 1), None, None, None, None, None, Cannon('red', 2, 7), None],
-            [Soldier('red', 3, 0), None, Soldier('red', 3, 2), None, Soldier('red', 3, 4), None, Soldier('red', 3, 6),
-             None, Soldier('red', 3, 8)],
-            [None, None, None, None, None, None, None, None, None],
-            [None, None, None, None, None, None, None, None, None],
-            [Soldier('blue', 6, 0), None, Soldier('blue', 6, 2), None, Soldier('blue', 6, 4), None,
-             Soldier('blue', 6, 6), None, Soldier('blue', 6, 8)],
-            [None, Cannon('blue', 7, 1), None, None, None, None, None, Cannon('blue', 7, 7), None],
-            [None, None, None, None, General('blue', 8, 4), None, None, None, None],
-            [Chariot('blue', 9, 0), Elephant('blue', 9, 1), Horse('blue', 9, 2), Guard('blue', 9, 3), None,
-             Guard('blue', 9, 5), Elephant('blue', 9, 6), Horse('blue', 9, 7), Chariot('blue', 9, 8)],
-        ]
+        self._squares = bytearray(90)
+        self._pieces = {BLUE: [], RED: []}
+        self._slots = bytearray(90)
+        self._generals = {BLUE: None, RED: None}
+        self._key = 0
+        generals = 0
+        for square in range(90):
+            code = squares[square]
+            if code:
+                if code not in ZOBRIST_CODES:
+                    raise ValueError('invalid piece code %d on square %d' % (code, square))
+                if code & TYPE_MASK == GENERAL:
+                    if self._generals[code & COLOR_MASK] is not None:
+                        raise ValueError('%s has more than one General' % COLOR_NAMES[code & COLOR_MASK])
+                    generals += 1
+                self._place(square, code)
+        if generals != 2:
+            raise ValueError('each side needs a General')
+        if active_turn not in COLOR_BITS:
+            raise ValueError('invalid color to move %r' % (active_turn,))
+        if active_turn == 'red':
+            self.set_next_turn()
+        if halfmove_clock < 0 or fullmove_number < 1:
+            raise ValueError('invalid move counters %d %d' % (halfmove_clock, fullmove_number))
+        self._halfmove_clock = halfmove_clock
+        self._fullmove_number = fullmove_number
         self._game_state = 'UNFINISHED'
-        self._red_general = (1, 4)
-        self._blue_general = (8, 4)
+        self._history = []
+
+    def get_halfmove_clock(self):
+        """
+        Returns the number of moves, passes included, made since the last capture
+        """
+        return self._halfmove_clock
+
+    def get_fullmove_number(self):
+        """
+        Returns the move number, which starts at 1 and goes up after each move made by Red
+        """
+        return self._fullmove_number
+
+    def to_text(self):
+        """
+        Returns the position in the FEN style text notation described at PIECE_LETTERS.
+        """
+        squares = self._squares
+        ranks = []
+        for row in range(9, -1, -1):
+            rank = ''
+            empty = 0
+            for square in range(row * 9, row * 9 + 9):
+                code = squares[square]
+                if code:
+                    if empty:
+                        rank += str(empty)
+                        empty = 0
+                    letter = PIECE_LETTERS[code & TYPE_MASK]
+                    rank += letter.upper() if code & BLUE else letter
+                else:
+                    empty += 1
+            if empty:
+                rank += str(empty)
+            ranks.append(rank)
+        return '%s %s %d %d' % ('/'.join(ranks), TURN_LETTERS[self._active_turn], self.get_halfmove_clock(),
+                                self.get_fullmove_number())
+
+    @classmethod
+    def from_text(cls, text, move_cache=None):
+        """
+        Builds a new game from the text notation returned by to_text. The move counters may be left off, in which case
+        they start at 0 and 1. Raises ValueError if the text does not describe a valid position.
+        """
+        fields = text.split()
+        if len(fields) not in (2, 4) or fields[1] not in ('b', 'r'):
+            raise ValueError('expected ranks, side to move and optionally two move counters: %r' % text)
+        ranks = fields[0].split('/')
+        if len(ranks) != 10:
+            raise ValueError('expected 10 ranks, got %d' % len(ranks))
+        squares = bytearray(90)
+        for row, rank in zip(range(9, -1, -1), ranks):
+            col = 0
+            for char in rank:
+                if char in '123456789':
+                    col += int(char)
+                elif char in LETTER_CODES and col < 9:
+                    squares[row * 9 + col] = LETTER_CODES[char]
+                    col += 1
+                else:
+                    raise ValueError('invalid rank %r' % rank)
+            if col != 9:
+                raise ValueError('rank %r does not have 9 points' % rank)
+        counters = (0, 1)
+        if len(fields) == 4:
+            if not (fields[2].isdigit() and fields[3].isdigit()):
+                raise ValueError('invalid move counters %r %r' % (fields[2], fields[3]))
+            counters = (int(fields[2]), int(fields[3]))
+        return cls._from_squares(squares, 'blue' if fields[1] == 'b' else 'red', counters[0], counters[1], move_cache)
+
+    def to_record(self):
+        """
+        Returns the position packed into the RECORD_SIZE byte binary record described at RECORD_SLOTS. Raises
+        ValueError if a side has more of a piece than it starts the game with.
+        """
+        slots = bytearray(b'\xff' * 32)
+        squares = self._squares
+        for base, color in ((0, BLUE), (16, RED)):
+            taken = [0] * 8
+            for square in sorted(self._pieces[color]):
+                piece_type = squares[square] & TYPE_MASK
+                slot = RECORD_FIRST_SLOT[piece_type] + taken[piece_type]
+                if slot >= 16 or RECORD_SLOTS[slot] != piece_type:
+                    raise ValueError('%s has too many %ss to pack' % (COLOR_NAMES[color], PIECE_NAMES[piece_type]))
+                slots[base + slot] = square
+                taken[piece_type] += 1
+        return RECORD_STRUCT.pack(bytes(slots), COLOR_BITS[self._active_turn], min(self.get_halfmove_clock(), 255),
+                                  min(self.get_fullmove_number(), 65535))
+
+    @classmethod
+    def from_record(cls, record, move_cache=None):
+        """
+        Builds a new game from a binary record returned by to_record. Raises ValueError if the record does not
+        describe a valid position.
+        """
+        if len(record) != RECORD_SIZE:
+            raise ValueError('a record is %d bytes, got %d' % (RECORD_SIZE, len(record)))
+        slots, turn, halfmove_clock, fullmove_number = RECORD_STRUCT.unpack(record)
+        if turn not in COLOR_NAMES:
+            raise ValueError('invalid color to move %d' % turn)
+        return cls._from_squares(unpack_slots(slots), COLOR_NAMES[turn], halfmove_clock, fullmove_number, move_cache)
+
+    def to_bytes(self):
+        """
+        Returns the position as 91 bytes: the 90 piece codes of the board array followed by the color bit of the side
+        to move. This is the compact form used to hand positions to worker processes.
+        """
+        return bytes(self._squares) + bytes((COLOR_BITS[self._active_turn],))
+
+    @classmethod
+    def from_bytes(cls, data, move_cache=None):
+        """
+        Builds a new game from the 91 bytes returned by to_bytes. Raises ValueError if the data does not describe a
+        valid position.
+        """
+        if len(data) != 91 or data[90] not in COLOR_NAMES:
+            raise ValueError('expected 90 piece codes followed by a color bit')
+        return cls._from_squares(data[:90], COLOR_NAMES[data[90]], move_cache=move_cache)
+
+    def _place(self, square, code):
+        """
+        Puts a piece code on an empty square and records it in its color's piece list.
+        """
+        color = code & COLOR_MASK
+        self._squares[square] = code
+        self._slots[square] = len(self._pieces[color])
+        self._pieces[color].append(square)
+        self._key ^= ZOBRIST[code][square]
+        if code & TYPE_MASK == GENERAL:
+            self._generals[color] = square
 
     def get_board(self):
         """
-        Returns a list of lists which represent the current board setup
+        Returns a list of lists which represent the current board setup. The Piece objects are built fresh from the
+        piece codes on every call, so changing them does not affect the game.
         """
-        return self._board.copy()
+        board = [[None] * 9 for _ in range(10)]
+        for color in (RED, BLUE):
+            for square in self._pieces[color]:
+                row, col = divmod(square, 9)
+                board[row][col] = piece_from_code(self._squares[square], row, col)
+        return board
 
     def terminal_print_board(self):
         """
         Prints a semi-readable version of the board in case you aren't using the GUI. Primarily for debugging purposes
         """
         print('-----------------------------------------------------------')
-        for row in range(len(self._board)):
-            for column in range(len(self._board[row])):
-                if self._board[row][column] is not None:
-                    print(self._board[row][column].get_name(), end=" ")
+        for row in range(10):
+            for col in range(9):
+                code = self._squares[row * 9 + col]
+                if code:
+                    print(PIECE_NAMES[code & TYPE_MASK], end=" ")
                 else:
                     print('--', end=" ")
             print()
@@ -58,18 +369,27 @@ class JanggiGame:
 
     def active_turn(self):
         """
-        If it is blue's turn, returns 'b', if red, returns 'r'.
+        If it is blue's turn, returns 'blue', if red, returns 'red'.
         """
         return self._active_turn
 
     def set_next_turn(self):
         """
-        Used to change the active player. If it is currently blue's turn, 'b' will be changed to 'r', and vice versa.
+        Used to change the active player. If it is currently blue's turn, 'blue' will be changed to 'red', and vice
+        versa.
         """
         if self._active_turn == 'blue':
             self._active_turn = 'red'
         else:
             self._active_turn = 'blue'
+        self._key ^= ZOBRIST_RED_TO_MOVE
+
+    def position_key(self):
+        """
+        Returns the 64 bit Zobrist hash of the current position, covering where every piece stands and whose turn it
+        is. The hash is kept up to date as moves are made and taken back, so this costs nothing to call.
+        """
+        return self._key
 
     def get_game_state(self):
         """
@@ -85,30 +405,83 @@ class JanggiGame:
 
     def is_in_check(self, color):
         """
-        Takes 'red' or 'blue' as a parameter and iterates through the board to locate the general of that color.
-        It takes this position and compares it against the possible moves of the other player. If the opponent has a
-        valid move which ends on the General's current square, this function returns True. If there are no valid
-        moves which would attack the specified general, the function returns False.
+        Takes 'red' or 'blue' as a parameter and locates the general of that color. If any piece of the opponent
+        could move onto the General's current square, this function returns True. Otherwise the function returns
+        False.
         """
-        opponent = {'red': 'blue', 'blue': 'red'}
-        vuln_squares = set()
-        counter_moves = self.fill_possible_moves(opponent[color])
+        return self._in_check(COLOR_BITS[color])
+
+    def _in_check(self, color):
+        """
+        Color-bit version of is_in_check used by the move filter.
+        """
+        return self._attacked(self._generals[color], OPPONENT[color])
+
+    def is_square_attacked(self, square, by_color):
+        """
+        Takes a (row, col) pair and 'red' or 'blue' as parameters. Returns True if a piece of by_color could move onto
+        that square in the current position, capturing whatever stands there, otherwise returns False.
+        """
+        return self._attacked(square[0] * 9 + square[1], COLOR_BITS[by_color])
+
+    def _attacked(self, square, by):
+        """
+        Color-bit version of is_square_attacked. Rather than generating the opponent's moves, it works outward from
+        the square: along each line for Chariots and screened Cannons, then back along the Horse, Elephant, Soldier
+        and palace tables to see whether an attacker of the right type stands on a point that reaches the square.
+        """
+        squares = self._squares
+        occupant = squares[square]
+        if occupant & by:
+            return False
+
+        chariot = by | CHARIOT
+        cannon = by | CANNON
+        for ray in SLIDER_RAYS[square]:
+            screened = False
+            for other in ray:
+                code = squares[other]
+                if not code:
+                    continue
+                if not screened:
+                    if code == chariot:
+                        return True
+                    if code & TYPE_MASK == CANNON:
+                        break
+                    screened = True
+                else:
+                    # Cannons may not capture other Cannons
+                    if code == cannon and occupant & TYPE_MASK != CANNON:
+                        return True
+                    break
+
+        horse = by | HORSE
+        for other, leg in HORSE_ATTACKS[square]:
+            if squares[other] == horse and not squares[leg]:
+                return True
+
+        elephant = by | ELEPHANT
+        for other, first, leg in ELEPHANT_ATTACKS[square]:
+            if squares[other] == elephant and not squares[first] and not squares[leg]:
+                return True
+
+        soldier = by | SOLDIER
+        for other in SOLDIER_ATTACKS[by][square]:
+            if squares[other] == soldier:
+                return True
+
+        for other in PALACE_STEPS[by][square]:
+            code = squares[other]
+            if code == by | GENERAL or code == by | GUARD:
+                return True
 
-        for move in counter_moves:
-            print("piece color", move.get_original_piece().get_color())
-            vuln_squares.add(move.get_target())
-        if self.get_general_loc(color) in vuln_squares:
-            return True
         return False
 
     def get_general_loc(self, color):
         """
         Returns the current row and column for the general of a specified color.
         """
-        if color == 'red':
-            return self._red_general
-        else:
-            return self._blue_general
+        return divmod(self._generals[COLOR_BITS[color]], 9)
 
     @staticmethod
     def letter_to_number(char):
@@ -131,128 +504,529 @@ class JanggiGame:
         orig_pair = (int(orig[1:]) - 1, int(self.letter_to_number(orig[0])))
         dest_pair = (int(dest[1:]) - 1, int(self.letter_to_number(dest[0])))
 
-        if self._board[orig_pair[0]][orig_pair[1]] is None:
+        if not (0 <= orig_pair[0] <= 9 and 0 <= orig_pair[1] <= 8 and
+                0 <= dest_pair[0] <= 9 and 0 <= dest_pair[1] <= 8):
             return False
 
-        if self._board[orig_pair[0]][orig_pair[1]].get_color() != self._active_turn:
+        if self._game_state != 'UNFINISHED':
             return False
 
-        if len(self.get_valid_moves(self._active_turn)) == 0:
-            if self._active_turn == 'blue':
-                print('RED WON')
-                self.set_game_state('RED_WON')
-            else:
-                print('BLUE WON')
-                self.set_game_state('BLUE_WON')
+        # Only the requested move is checked: the piece's own targets, then one trial of the move on the board.
+        move = Move(orig_pair, dest_pair)
+        if not self.is_valid_move(move):
+            return False
 
-        move = Move(orig_pair, dest_pair, self._board)
+        self.push(move)
+        self._update_game_state()
+        return True
 
-        if move not in self.get_valid_moves(self._active_turn):
-            return False
+    def _update_game_state(self):
+        """
+        Called after a move to end the game if the side now to move has been checkmated.
+        """
+        if not self.has_any_legal_move(self._active_turn):
+            self.set_game_state('RED_WON' if self._active_turn == 'blue' else 'BLUE_WON')
 
-        if move.get_orig() == move.get_target():
-            if not self.is_in_check(self._active_turn):
-                self.set_next_turn()
+    def has_any_legal_move(self, color):
+        """
+        Takes 'red' or 'blue' as a parameter and returns True if that color has at least one valid move. A side which
+        is not in check can always pass, so it has no moves only when it is checkmated. When it is in check, the
+        candidate evasions from _evasions are tried one at a time and the search stops at the first which leaves the
+        General safe, so this usually tries a handful of moves rather than building the whole valid move set.
+        """
+        color = COLOR_BITS[color]
+        if not self._in_check(color):
+            return True
+        is_safe = self._is_safe
+        for orig, dest in self._evasions(color):
+            if is_safe(orig, dest, color):
                 return True
+        return False
 
-        return self.make_move_helper(move)
+    def _evasions(self, color):
+        """
+        Lazily yields (orig, dest) pairs for the moves which could get the General of the given color bit out of
+        check, by the piece rules alone, most likely first: the General's own moves, then captures of a checking
+        piece, then the other moves which arrive on or leave a square on a checking line.
+        """
+        squares = self._squares
+        general = self._generals[color]
+        checkers, sensitive = self._check_lines(general, color)
+        targets = []
+        TARGET_GENERATORS[GENERAL](squares, general, color, targets)
+        for dest in targets:
+            yield general, dest
+
+        pieces = [square for square in self._pieces[color] if square != general]
+        moves = []
+        for square in pieces:
+            targets = []
+            TARGET_GENERATORS[squares[square] & TYPE_MASK](squares, square, color, targets)
+            for dest in targets:
+                if dest in checkers:
+                    yield square, dest
+                elif dest in sensitive or square in sensitive:
+                    moves.append((square, dest))
+        for move in moves:
+            yield move
 
     def make_move_helper(self, move):
         """
         Helper function which takes a Move class object as a parameter and uses the information within the object
-        to update the board and update the information within the appropriate Piece class objects. If a general is
-        moved, updates the general's location in the JanggiGame class so that it can be easily referenced for
-        "check" verifications.
+        to update the board and the piece lists. If a general is moved, updates the general's location so that it
+        can be easily referenced for "check" verifications. The move is recorded so it can be taken back with
+        undo_move.
         """
         if self._game_state != 'UNFINISHED':
             return False
 
-        orig_piece = move.get_original_piece()
-        self._board[move.get_orig()[0]][move.get_orig()[1]] = None
-        self._board[move.get_target()[0]][move.get_target()[1]] = orig_piece
-        orig_piece.set_row(move.get_target()[0])
-        orig_piece.set_col(move.get_target()[1])
-
-        if orig_piece.get_name() == 'General':
-            if orig_piece.get_color() == 'red':
-                self._red_general = (move.get_target()[0], move.get_target()[1])
-            else:
-                self._blue_general = (move.get_target()[0], move.get_target()[1])
+        self.push(move)
+        return True
 
+    def push(self, move):
+        """
+        Makes a move, given as a Move or a move ID, without checking that it is valid and passes the turn. Everything
+        needed to take the move back, the captured piece, the turn, the game state, the position hash, and the halfmove
+        clock, is pushed onto the game's history so pop can restore the position exactly.
+        """
+        orig, dest = MOVE_SQUARES[move]
+        key = self._key
+        if orig != dest:
+            squares = self._squares
+            code = squares[orig]
+            captured = squares[dest]
+            self._key = key ^ ZOBRIST[code][orig] ^ ZOBRIST[code][dest] ^ ZOBRIST[captured][dest]
+        captured = self._apply(orig, dest)
+        turn = self._active_turn
+        self._history.append((move, captured, turn, self._game_state, key, self._halfmove_clock))
+        self._halfmove_clock = 0 if captured else self._halfmove_clock + 1
+        if turn == 'red':
+            self._fullmove_number += 1
         self.set_next_turn()
+
+    def pop(self):
+        """
+        Takes back the last move made with push and returns it. The moved piece, any captured piece, the generals'
+        locations, the turn, the game state, the position hash, and the move counters are all restored.
+        """
+        move, captured, turn, game_state, key, self._halfmove_clock = self._history.pop()
+        if turn == 'red':
+            self._fullmove_number -= 1
+        orig, dest = MOVE_SQUARES[move]
+        self._revert(orig, dest, captured)
+        self._active_turn = turn
+        self._game_state = game_state
+        self._key = key
+        return Move.from_id(move)
+
+    def undo_move(self):
+        """
+        Takes back the last move played. Returns True if a move was taken back, or False if no moves have been made.
+        """
+        if not self._history:
+            return False
+        self.pop()
         return True
 
+    def _apply(self, orig, dest):
+        """
+        Moves the piece on square orig to square dest, removing any captured piece from its color's piece list.
+        Returns the captured piece code (EMPTY if nothing was captured) so that _revert can undo the move, with the
+        captured piece's place in its piece list in the bits above CAPTURE_SHIFT.
+        """
+        if orig == dest:
+            return EMPTY
+        squares = self._squares
+        slots = self._slots
+        code = squares[orig]
+        captured = squares[dest]
+        color = code & COLOR_MASK
+        if captured:
+            # The last piece of the list takes the captured piece's place, so nothing has to be searched or shifted.
+            index = slots[dest]
+            others = self._pieces[captured & COLOR_MASK]
+            last = others.pop()
+            if last != dest:
+                others[index] = last
+                slots[last] = index
+            captured |= index << CAPTURE_SHIFT
+        index = slots[orig]
+        self._pieces[color][index] = dest
+        slots[dest] = index
+        squares[dest] = code
+        squares[orig] = EMPTY
+        if code & TYPE_MASK == GENERAL:
+            self._generals[color] = dest
+        return captured
+
+    def _revert(self, orig, dest, captured):
+        """
+        Undoes a move made by _apply given the same squares and the value it returned. The piece lists are put back
+        in the order they had before the move.
+        """
+        if orig == dest:
+            return
+        squares = self._squares
+        slots = self._slots
+        code = squares[dest]
+        color = code & COLOR_MASK
+        index = slots[dest]
+        self._pieces[color][index] = orig
+        slots[orig] = index
+        squares[orig] = code
+        if captured:
+            index = captured >> CAPTURE_SHIFT
+            captured &= CAPTURE_CODE_MASK
+            others = self._pieces[captured & COLOR_MASK]
+            if index < len(others):
+                last = others[index]
+                slots[last] = len(others)
+                others.append(last)
+                others[index] = dest
+            else:
+                others.append(dest)
+            slots[dest] = index
+        squares[dest] = captured
+        if code & TYPE_MASK == GENERAL:
+            self._generals[color] = orig
+
+    def _pseudo_legal(self, color, buffer, passes=True):
+        """
+        Writes the move ID of every move allowed by the piece rules for the given color bit, including a pass for
+        each piece unless passes is False, into a preallocated move buffer and returns how many were written. Does
+        not account for check.
+        """
+        squares = self._squares
+        count = 0
+        targets = []
+        for square in self._pieces[color]:
+            base = SQUARE_IDS[square] * 100
+            if passes:
+                buffer[count] = base + SQUARE_IDS[square]
+                count += 1
+            del targets[:]
+            TARGET_GENERATORS[squares[square] & TYPE_MASK](squares, square, color, targets)
+            for dest in targets:
+                buffer[count] = base + SQUARE_IDS[dest]
+                count += 1
+        return count
+
     def fill_possible_moves(self, color):
         """
         This function generates all possible moves for a player, regardless of whether or not the move would leave
         that player's general in check.
         """
-        possible_moves = []
-        for row in range(len(self._board)):
-            for col in range(len(self._board[row])):
-                if self._board[row][col] is not None:
-                    if self._board[row][col].get_color() == color:
-                        self._board[row][col].get_legal_moves(self._board, possible_moves)
-
-        return possible_moves
+        buffer = self._buffer
+        return [Move.from_id(buffer[index]) for index in range(self._pseudo_legal(COLOR_BITS[color], buffer))]
 
     def get_valid_moves(self, color):
         """
-        Takes a set of all possible moves for a color according to the individual pieces' move rules and verifies
-        that they do not violate other rules by leaving their own General in check. For each possible move,
-        makes that move, generates the opponents possible moves, and checks if the General has been place in check,
-        if so that move is removed from the list of valid moves and the next move is checked. The list of valid
-        moves which is returned meets the movement rules for a given piece and does not leave the General open to a
-        revealed check.
+        Returns a set of every move for a color which follows the individual pieces' move rules and does not leave
+        that player's own General in check, so checking whether a move is valid takes constant time. Moves are built
+        legal by _legal_moves rather than by trying and taking back every possible move. Results are cached by
+        position key, so asking again about a position already seen does no move generation at all.
+        """
+        color_bit = COLOR_BITS[color]
+        cache_key = (self._key, color_bit)
+        valid_moves = self._move_cache.get(cache_key)
+        if valid_moves is None:
+            buffer = self._buffer
+            valid_moves = frozenset(Move.from_id(buffer[index])
+                                    for index in range(self._legal_moves(color_bit, buffer)))
+            self._move_cache.put(cache_key, valid_moves)
+        return valid_moves
+
+    def iter_moves(self, color, captures_only=False, piece_filter=None, captures_first=False):
+        """
+        Takes 'red' or 'blue' and lazily yields the same valid Moves as get_valid_moves, working out each piece's
+        moves only when the caller asks for more, so a caller which stops early never pays for the rest. With
+        captures_only, only captures are yielded. piece_filter, if given, is called with the square (row * 9 + col)
+        and piece code of each piece and only the pieces it returns True for are moved. Moves come piece by piece,
+        each piece's pass first, unless captures_first is set, in which case every capture comes first, then the
+        other moves, then the passes.
+        """
+        color = COLOR_BITS[color]
+        squares = self._squares
+        lines = (self._generals[color],) + self._check_lines(self._generals[color], color)
+        passes = not lines[1] and not captures_only
+        deferred = []
+        pass_squares = []
+
+        for square in list(self._pieces[color]):
+            code = squares[square]
+            if piece_filter is not None and not piece_filter(square, code):
+                continue
+            if passes:
+                if captures_first:
+                    pass_squares.append(square)
+                else:
+                    yield Move.from_id(SQUARE_IDS[square] * 101)
+            targets = []
+            TARGET_GENERATORS[code & TYPE_MASK](squares, square, color, targets)
+            for dest in targets:
+                if not squares[dest] and (captures_only or captures_first):
+                    if captures_first and not captures_only:
+                        deferred.append((square, dest))
+                    continue
+                if self._is_legal_target(square, dest, color, lines):
+                    yield Move.from_id(SQUARE_IDS[square] * 100 + SQUARE_IDS[dest])
+
+        for square, dest in deferred:
+            if self._is_legal_target(square, dest, color, lines):
+                yield Move.from_id(SQUARE_IDS[square] * 100 + SQUARE_IDS[dest])
+        for square in pass_squares:
+            yield Move.from_id(SQUARE_IDS[square] * 101)
+
+    def _is_legal_target(self, square, dest, color, lines):
+        """
+        Returns True if moving the piece of the given color bit on square to dest, a target allowed by its piece
+        rules, leaves the General safe. lines is (general, checkers, sensitive) from _check_lines, and the move is
+        only tried on the board when it could matter, by the same rules as _legal_moves.
         """
-        valid_moves = self.fill_possible_moves(color)
+        general, checkers, sensitive = lines
+        if square == general or square in sensitive:
+            return self._is_safe(square, dest, color)
+        if checkers:
+            return dest in sensitive and self._is_safe(square, dest, color)
+        return dest not in sensitive or self._is_safe(square, dest, color)
 
-        for i in range(len(valid_moves)-1, -1, -1):
-            temp_move = valid_moves[i]
-            self.make_move_helper(valid_moves[i])
-            self.set_next_turn()
-            if self.is_in_check(self._active_turn):
-                valid_moves.remove(valid_moves[i])
-            self.set_next_turn()
-            self._board[temp_move.get_orig()[0]][temp_move.get_orig()[1]] = temp_move.get_original_piece()
-            self._board[temp_move.get_target()[0]][temp_move.get_target()[1]] = temp_move.get_target_piece()
-            self.set_next_turn()
+    def generate_legal(self, buffer, captures_only=False):
+        """
+        Engine entry point to move generation. Writes the move IDs of the valid moves for the side to move into a
+        preallocated buffer from move_buffer and returns how many were written. Unlike get_valid_moves, a position
+        has a single pass (the General's) rather than one per piece, and captures_only leaves out every move which
+        does not capture.
+        """
+        return self._legal_moves(COLOR_BITS[self._active_turn], buffer, True, captures_only)
 
-        return valid_moves
+    def generate_pseudo_legal(self, buffer):
+        """
+        Engine entry point for fast playouts. Writes the move IDs of every move the piece rules allow for the side to
+        move into a preallocated buffer from move_buffer and returns how many were written. Passes are left out and
+        nothing is checked about the General's safety, so a move picked from these should be checked with
+        is_safe_move before it is played.
+        """
+        return self._pseudo_legal(COLOR_BITS[self._active_turn], buffer, False)
 
+    def is_safe_move(self, move):
+        """
+        Returns True if a move for the side to move which already follows the piece rules, such as one written by
+        generate_pseudo_legal, does not leave that side's General in check. Only this check is made, so it is cheaper
+        than is_valid_move, which also checks the piece rules.
+        """
+        orig, dest = MOVE_SQUARES[move]
+        return self._is_safe(orig, dest, COLOR_BITS[self._active_turn])
 
-def valid_space_check(row, col, board, my_color):
-    """
-    Generic function which checks that a target square can be occupied. Takes a target row, column, board instance,
-    and moving piece's color as parameters. If the target space is on the board and either empty
-    or occupied by a piece of the other color, returns True, otherwise if it is occupied by a piece of the
-    same color, returns False.
-    """
-    if row < 0 or row > 9 or col < 0 or col > 8:
-        return False
-    if board[row][col] is None:
-        return True
-    elif board[row][col].get_color() != my_color:
-        return True
-    else:
-        return False
+    def is_valid_move(self, move):
+        """
+        Returns True if a move, given as a Move or a move ID, is valid for the side to move, with the same answer as
+        checking it against get_valid_moves. Only the moving piece's own targets are generated and only this one move
+        is tried on the board, so this is much cheaper than building the whole valid move set.
+        """
+        squares = MOVE_SQUARES[move] if 0 <= move < 10000 else None
+        if squares is None:
+            return False
+        orig, dest = squares
+        color = COLOR_BITS[self._active_turn]
+        code = self._squares[orig]
+        if not code & color:
+            return False
+        if orig == dest:
+            return not self._in_check(color)
+        targets = []
+        TARGET_GENERATORS[code & TYPE_MASK](self._squares, orig, color, targets)
+        return dest in targets and self._is_safe(orig, dest, color)
+
+    def perft(self, depth, workers=1):
+        """
+        Counts the positions reached by playing every sequence of depth valid moves from the current position, with a
+        single pass per position as in generate_legal. The counts depend only on the rules, so comparing them against
+        stored reference numbers checks that move generation has not changed. With workers greater than one, the
+        root moves are split across that many processes.
+        """
+        if depth <= 0:
+            return 1
+        if workers > 1 and depth > 1:
+            return sum(self.divide(depth, workers).values())
+        return self._perft(depth, [move_buffer() for _ in range(depth)])
+
+    def _perft(self, depth, buffers):
+        """
+        Recursive part of perft, using one preallocated move buffer per remaining ply.
+        """
+        buffer = buffers[depth - 1]
+        count = self.generate_legal(buffer)
+        if depth == 1:
+            return count
+        nodes = 0
+        for index in range(count):
+            self.push(buffer[index])
+            nodes += self._perft(depth - 1, buffers)
+            self.pop()
+        return nodes
+
+    def divide(self, depth, workers=1):
+        """
+        Returns a dictionary mapping each valid move in the current position to the perft count of depth - 1 after
+        it, for tracking down which move a perft difference comes from. With workers greater than one, the root
+        moves are counted in a pool of that many processes, each rebuilding the position from to_bytes rather than
+        receiving the game itself.
+        """
+        buffer = move_buffer()
+        moves = [buffer[index] for index in range(self.generate_legal(buffer))]
+        if workers > 1:
+            data = self.to_bytes()
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                counts = pool.map(perft_task, [data] * len(moves), moves, [depth - 1] * len(moves))
+                return {Move.from_id(move): count for move, count in zip(moves, counts)}
+        counts = {}
+        for move in moves:
+            self.push(move)
+            counts[Move.from_id(move)] = self.perft(depth - 1)
+            self.pop()
+        return counts
+
+    def get_squares(self):
+        """
+        Returns the board's flat array of 90 piece codes, indexed row * 9 + col. This is the game's own array, for
+        engines which need to read the board quickly, and must not be changed.
+        """
+        return self._squares
+
+    def get_piece_squares(self, color):
+        """
+        Returns the list of squares occupied by the pieces of a color. This is the game's own list and must not be
+        changed.
+        """
+        return self._pieces[COLOR_BITS[color]]
+
+    def move_cache_stats(self):
+        """
+        Returns the hit and miss counts and size of the cache used by get_valid_moves.
+        """
+        return self._move_cache.get_stats()
+
+    def _legal_moves(self, color, buffer, single_pass=False, captures_only=False):
+        """
+        Writes the move ID of every valid move of the given color bit into a preallocated move buffer and returns how
+        many were written. The pieces giving check and the squares where a move could uncover or create a check are
+        worked out up front. Moves which touch none of those squares are legal as generated, only the General's own
+        moves and moves on a sensitive square are tried on the board and taken back. While in check, only moves which
+        could answer the check are considered at all, and the passes are left out. With single_pass, only the
+        General's pass is written instead of one per piece, and with captures_only, only captures are written.
+        """
+        squares = self._squares
+        general = self._generals[color]
+        checkers, sensitive = self._check_lines(general, color)
+        is_safe = self._is_safe
+        passes = not checkers and not captures_only
+        piece_passes = passes and not single_pass
+
+        count = 0
+        targets = []
+        for square in self._pieces[color]:
+            base = SQUARE_IDS[square] * 100
+            del targets[:]
+            TARGET_GENERATORS[squares[square] & TYPE_MASK](squares, square, color, targets)
+            if captures_only:
+                targets = [dest for dest in targets if squares[dest]]
+            if square == general:
+                for dest in targets:
+                    if is_safe(square, dest, color):
+                        buffer[count] = base + SQUARE_IDS[dest]
+                        count += 1
+                if passes:
+                    buffer[count] = base + SQUARE_IDS[square]
+                    count += 1
+            elif checkers:
+                for dest in targets:
+                    if (dest in sensitive or square in sensitive) and is_safe(square, dest, color):
+                        buffer[count] = base + SQUARE_IDS[dest]
+                        count += 1
+            else:
+                if piece_passes:
+                    buffer[count] = base + SQUARE_IDS[square]
+                    count += 1
+                if square in sensitive:
+                    for dest in targets:
+                        if is_safe(square, dest, color):
+                            buffer[count] = base + SQUARE_IDS[dest]
+                            count += 1
+                else:
+                    for dest in targets:
+                        if dest not in sensitive or is_safe(square, dest, color):
+                            buffer[count] = base + SQUARE_IDS[dest]
+                            count += 1
+        return count
+
+    def _is_safe(self, orig, dest, color):
+        """
+        Tries a move on the board and returns True if it does not leave the General of the given color bit in check.
+        """
+        captured = self._apply(orig, dest)
+        safe = not self._in_check(color)
+        self._revert(orig, dest, captured)
+        return safe
+
+    def _check_lines(self, general, color):
+        """
+        Finds the opponent pieces giving check to the General on square general, and the set of squares on which
+        arriving or leaving could change that. The sensitive squares are the lines from the General up to any enemy
+        Chariot close enough to be uncovered by one move or Cannon close enough to gain or lose a screen, plus the
+        legs of enemy Horses and Elephants aimed at the General. When the General is in check, the set also holds
+        the checking pieces and the squares that block or screen them, which are the only squares an evasion other
+        than a General move can use. Returns a (checkers, sensitive) pair.
+        """
+        squares = self._squares
+        opponent = OPPONENT[color]
+        chariot = opponent | CHARIOT
+        cannon = opponent | CANNON
+        checkers = []
+        sensitive = set()
+
+        for ray in SLIDER_RAYS[general]:
+            found = 0
+            first = EMPTY
+            for index in range(len(ray)):
+                code = squares[ray[index]]
+                if not code:
+                    continue
+                if code == chariot and found <= 1 or code == cannon and found <= 2:
+                    if code == chariot and found == 0 or code == cannon and found == 1 and \
+                            first & TYPE_MASK != CANNON:
+                        checkers.append(ray[index])
+                    sensitive.update(ray[:index + 1])
+                    break
+                if found == 0:
+                    first = code
+                found += 1
+                if found == 3:
+                    break
 
+        horse = opponent | HORSE
+        for other, leg in HORSE_ATTACKS[general]:
+            if squares[other] == horse:
+                sensitive.add(leg)
+                if not squares[leg]:
+                    checkers.append(other)
+                    sensitive.add(other)
 
-def blue_palace_check(row, col, board, my_color):
-    """
-    Generic function which checks that a target palace square can be occupied. Takes a target row, column, board
-    instance,and moving piece's color as parameters. If the target space is on the board and either empty
-    or occupied by a piece of the other color, returns True, otherwise if it is occupied by a piece of the
-    same color, returns False.
-    """
-    if row < 7 or row > 9 or col < 3 or col > 5:
-        return False
-    if board[row][col] is None:
-        return True
-    elif board[row][col].get_color() != my_color:
-        return True
-    else:
-        return False
+        elephant = opponent | ELEPHANT
+        for other, first, leg in ELEPHANT_ATTACKS[general]:
+            if squares[other] == elephant:
+                sensitive.add(first)
+                sensitive.add(leg)
+                if not squares[first] and not squares[leg]:
+                    checkers.append(other)
+                    sensitive.add(other)
+
+        soldier = opponent | SOLDIER
+        for other in SOLDIER_ATTACKS[opponent][general]:
+            if squares[other] == soldier:
+                checkers.append(other)
+                sensitive.add(other)
+
+        return checkers, sensitive
 
 
 def is_in_palace(row, col):
@@ -266,29 +1040,431 @@ def is_in_palace(row, col):
     return False
 
 
-def red_palace_check(row, col, board, my_color):
+def in_own_palace(row, col, color):
     """
-    Generic function which checks that a target palace square can be occupied. Takes a target row, column, board
-    instance,and moving piece's color as parameters. If the target space is on the board and either empty
-    or occupied by a piece of the other color, returns True, otherwise if it is occupied by a piece of the
-    same color, returns False.
+    Returns True if a coordinate is inside the palace belonging to the given color bit.
     """
-    if row < 0 or row > 2 or col < 3 or col > 5:
+    if not 3 <= col <= 5:
         return False
-    if board[row][col] is None:
-        return True
-    elif board[row][col].get_color() != my_color:
-        return True
-    else:
+    if color == RED:
+        return 0 <= row <= 2
+    return 7 <= row <= 9
+
+
+def on_board(row, col):
+    """
+    Returns True if a coordinate is one of the 90 points on the board.
+    """
+    return 0 <= row <= 9 and 0 <= col <= 8
+
+
+def valid_space_check(row, col, board, my_color):
+    """
+    Generic function which checks that a target square can be occupied. Takes a target row, column, a board of
+    Pieces as returned by get_board, and the moving piece's color as parameters. Returns True if the square is on the
+    board and either empty or occupied by a piece of the other color. Kept for callers of the original board API.
+    """
+    if not on_board(row, col):
         return False
+    return board[row][col] is None or board[row][col].get_color() != my_color
+
+
+def blue_palace_check(row, col, board, my_color):
+    """
+    Like valid_space_check, but also requires the square to be inside Blue's palace.
+    """
+    return in_own_palace(row, col, BLUE) and valid_space_check(row, col, board, my_color)
+
+
+def red_palace_check(row, col, board, my_color):
+    """
+    Like valid_space_check, but also requires the square to be inside Red's palace.
+    """
+    return in_own_palace(row, col, RED) and valid_space_check(row, col, board, my_color)
+
+
+# The tables below are built once when the module is imported. Each is indexed by square so the move generators only
+# have to look up where a piece could go and which squares must be empty for it to get there.
+
+def build_slider_rays():
+    """
+    For every square, builds the lines a Chariot or Cannon can travel along: the four orthogonal rays to the edge of
+    the board, followed by the palace diagonals when the square is a palace corner or center.
+    """
+    rays = []
+    for square in range(90):
+        row, col = divmod(square, 9)
+        square_rays = []
+        for d_row, d_col in ORTHOGONAL:
+            ray = []
+            new_row, new_col = row + d_row, col + d_col
+            while on_board(new_row, new_col):
+                ray.append(new_row * 9 + new_col)
+                new_row += d_row
+                new_col += d_col
+            if ray:
+                square_rays.append(tuple(ray))
+        if square in PALACE_POINTS:
+            for d_row, d_col in DIAGONAL:
+                ray = []
+                new_row, new_col = row + d_row, col + d_col
+                while is_in_palace(new_row, new_col):
+                    ray.append(new_row * 9 + new_col)
+                    new_row += d_row
+                    new_col += d_col
+                if ray:
+                    square_rays.append(tuple(ray))
+        rays.append(tuple(square_rays))
+    return tuple(rays)
+
+
+def build_palace_steps(color):
+    """
+    For every square, builds the one step moves a General or Guard of the given color bit may make along the lines
+    of its own palace.
+    """
+    steps = []
+    for square in range(90):
+        row, col = divmod(square, 9)
+        square_steps = []
+        if in_own_palace(row, col, color):
+            for d_row, d_col in ORTHOGONAL:
+                if in_own_palace(row + d_row, col + d_col, color):
+                    square_steps.append((row + d_row) * 9 + col + d_col)
+            if square in PALACE_POINTS:
+                for d_row, d_col in DIAGONAL:
+                    if in_own_palace(row + d_row, col + d_col, color):
+                        square_steps.append((row + d_row) * 9 + col + d_col)
+        steps.append(tuple(square_steps))
+    return tuple(steps)
+
+
+def build_horse_moves():
+    """
+    For every square, builds (leg, destination) pairs for a Horse. The leg is the orthogonally adjacent point which
+    must be empty for the Horse to reach the destination.
+    """
+    moves = []
+    for square in range(90):
+        row, col = divmod(square, 9)
+        square_moves = []
+        for d_row, d_col in ORTHOGONAL:
+            leg_row, leg_col = row + d_row, col + d_col
+            for direction in (-1, 1):
+                if d_row == 0:
+                    dest_row, dest_col = row + direction, col + 2 * d_col
+                else:
+                    dest_row, dest_col = row + 2 * d_row, col + direction
+                if on_board(dest_row, dest_col):
+                    square_moves.append((leg_row * 9 + leg_col, dest_row * 9 + dest_col))
+        moves.append(tuple(square_moves))
+    return tuple(moves)
+
+
+def build_elephant_moves():
+    """
+    For every square, builds (first leg, second leg, destination) triples for an Elephant. Both legs must be empty
+    for the Elephant to reach the destination.
+    """
+    moves = []
+    for square in range(90):
+        row, col = divmod(square, 9)
+        square_moves = []
+        for d_row, d_col in ORTHOGONAL:
+            first_row, first_col = row + d_row, col + d_col
+            for direction in (-1, 1):
+                if d_row == 0:
+                    leg_row, leg_col = row + direction, col + 2 * d_col
+                    dest_row, dest_col = row + 2 * direction, col + 3 * d_col
+                else:
+                    leg_row, leg_col = row + 2 * d_row, col + direction
+                    dest_row, dest_col = row + 3 * d_row, col + 2 * direction
+                if on_board(dest_row, dest_col):
+                    square_moves.append((first_row * 9 + first_col, leg_row * 9 + leg_col, dest_row * 9 + dest_col))
+        moves.append(tuple(square_moves))
+    return tuple(moves)
+
+
+def build_soldier_moves(color):
+    """
+    For every square, builds the destinations of a Soldier of the given color bit: one point forward or sideways,
+    plus the forward diagonals along the lines of the opponent's palace.
+    """
+    forward = 1 if color == RED else -1
+    moves = []
+    for square in range(90):
+        row, col = divmod(square, 9)
+        square_moves = []
+        for d_row, d_col in ((0, -1), (0, 1), (forward, 0)):
+            if on_board(row + d_row, col + d_col):
+                square_moves.append((row + d_row) * 9 + col + d_col)
+        if square in PALACE_POINTS and in_own_palace(row, col, OPPONENT[color]):
+            for d_col in (-1, 1):
+                new_row, new_col = row + forward, col + d_col
+                if in_own_palace(new_row, new_col, OPPONENT[color]) and new_row * 9 + new_col in PALACE_POINTS:
+                    square_moves.append(new_row * 9 + new_col)
+        moves.append(tuple(square_moves))
+    return tuple(moves)
+
+
+def build_horse_attacks(horse_moves):
+    """
+    Inverts the Horse table: for every square, builds (horse square, leg) pairs for each point a Horse could attack
+    that square from.
+    """
+    attacks = [[] for _ in range(90)]
+    for square in range(90):
+        for leg, dest in horse_moves[square]:
+            attacks[dest].append((square, leg))
+    return tuple(tuple(square_attacks) for square_attacks in attacks)
+
+
+def build_elephant_attacks(elephant_moves):
+    """
+    Inverts the Elephant table: for every square, builds (elephant square, first leg, second leg) triples for each
+    point an Elephant could attack that square from.
+    """
+    attacks = [[] for _ in range(90)]
+    for square in range(90):
+        for first, leg, dest in elephant_moves[square]:
+            attacks[dest].append((square, first, leg))
+    return tuple(tuple(square_attacks) for square_attacks in attacks)
+
+
+def build_soldier_attacks(soldier_moves):
+    """
+    Inverts a Soldier table: for every square, builds the squares a Soldier of that table's color could attack it
+    from.
+    """
+    attacks = [[] for _ in range(90)]
+    for square in range(90):
+        for dest in soldier_moves[square]:
+            attacks[dest].append(square)
+    return tuple(tuple(square_attacks) for square_attacks in attacks)
+
+
+def build_move_squares():
+    """
+    Builds the table which decodes a four digit move ID into its (origin, destination) squares. IDs which do not
+    name two points on the board map to None.
+    """
+    move_squares = [None] * 10000
+    for orig in range(90):
+        for dest in range(90):
+            move_squares[SQUARE_IDS[orig] * 100 + SQUARE_IDS[dest]] = (orig, dest)
+    return tuple(move_squares)
+
+
+def build_zobrist_keys():
+    """
+    Builds the random 64 bit Zobrist keys, one for every piece code on every square plus one for Red being the side
+    to move. The generator is seeded so position keys are the same in every process and every run. The rows for
+    EMPTY and unused codes are all zero so XORing in an empty square changes nothing.
+    """
+    generator = random.Random(0x4A616E676769)
+    keys = []
+    for code in range(COLOR_MASK):
+        if code & COLOR_MASK and code & TYPE_MASK:
+            keys.append(tuple(generator.getrandbits(64) for _ in range(90)))
+        else:
+            keys.append((0,) * 90)
+    return tuple(keys), generator.getrandbits(64)
+
+
+MOVE_SQUARES = build_move_squares()
+ZOBRIST, ZOBRIST_RED_TO_MOVE = build_zobrist_keys()
+ZOBRIST_CODES = frozenset(color | piece_type for color in (BLUE, RED) for piece_type in PIECE_NAMES)
+SLIDER_RAYS = build_slider_rays()
+PALACE_STEPS = {BLUE: build_palace_steps(BLUE), RED: build_palace_steps(RED)}
+HORSE_MOVES = build_horse_moves()
+ELEPHANT_MOVES = build_elephant_moves()
+SOLDIER_MOVES = {BLUE: build_soldier_moves(BLUE), RED: build_soldier_moves(RED)}
+
+# Reverse tables used to work outward from a square when asking whether it is attacked. Palace steps are symmetric,
+# so PALACE_STEPS doubles as its own reverse table.
+HORSE_ATTACKS = build_horse_attacks(HORSE_MOVES)
+ELEPHANT_ATTACKS = build_elephant_attacks(ELEPHANT_MOVES)
+SOLDIER_ATTACKS = {BLUE: build_soldier_attacks(SOLDIER_MOVES[BLUE]), RED: build_soldier_attacks(SOLDIER_MOVES[RED])}
+
+
+def general_targets(squares, square, color, targets):
+    """
+    Appends the destination squares a General (or Guard) of the given color bit may move to from square. Moves are
+    one step along the palace lines and may not leave the player's own palace.
+    """
+    for dest in PALACE_STEPS[color][square]:
+        if not squares[dest] & color:
+            targets.append(dest)
+
+
+def chariot_targets(squares, square, color, targets):
+    """
+    Appends the destination squares a Chariot may move to. Chariots slide any distance along a line, including the
+    palace diagonals, until they reach a piece, capturing it if it belongs to the opponent.
+    """
+    for ray in SLIDER_RAYS[square]:
+        for dest in ray:
+            code = squares[dest]
+            if code & color:
+                break
+            targets.append(dest)
+            # Piece cannot go through multiple opponents. If opponent is found in one direction, stop looking.
+            if code:
+                break
+
+
+def cannon_targets(squares, square, color, targets):
+    """
+    Appends the destination squares a Cannon may move to. Cannons must jump exactly one piece which is not a Cannon
+    and may not capture a Cannon. Along a palace diagonal this lets a Cannon on a corner jump the center.
+    """
+    for ray in SLIDER_RAYS[square]:
+        can_jump = False
+        for dest in ray:
+            code = squares[dest]
+            if not can_jump:
+                if code:
+                    if code & TYPE_MASK == CANNON:
+                        break
+                    can_jump = True
+            elif code == EMPTY:
+                targets.append(dest)
+            else:
+                if code & TYPE_MASK != CANNON and not code & color:
+                    targets.append(dest)
+                break
+
+
+def elephant_targets(squares, square, color, targets):
+    """
+    Appends the destination squares an Elephant may move to. Elephants move one point orthogonally and then two
+    points diagonally outward, and are blocked by a piece on either intermediate point.
+    """
+    for first, leg, dest in ELEPHANT_MOVES[square]:
+        if not squares[first] and not squares[leg] and not squares[dest] & color:
+            targets.append(dest)
+
+
+def horse_targets(squares, square, color, targets):
+    """
+    Appends the destination squares a Horse may move to. Horses move one point orthogonally and then one point
+    diagonally outward, and are blocked by a piece on the first point.
+    """
+    for leg, dest in HORSE_MOVES[square]:
+        if not squares[leg] and not squares[dest] & color:
+            targets.append(dest)
+
+
+def soldier_targets(squares, square, color, targets):
+    """
+    Appends the destination squares a Soldier may move to. Soldiers move one point forward or sideways, and inside
+    the opponent's palace may also move forward along the diagonals.
+    """
+    for dest in SOLDIER_MOVES[color][square]:
+        if not squares[dest] & color:
+            targets.append(dest)
+
+
+TARGET_GENERATORS = (None, general_targets, general_targets, elephant_targets, horse_targets, chariot_targets,
+                     cannon_targets, soldier_targets)
+
+
+def perft_task(data, move, depth):
+    """
+    Worker process entry point for a parallel perft: rebuilds the position from its to_bytes form, plays one root
+    move, and returns the perft count below it.
+    """
+    game = JanggiGame.from_bytes(data, MoveCache(0))
+    game.push(move)
+    return game.perft(depth)
+
+
+def unpack_slots(slots):
+    """
+    Converts the 32 piece slots of a binary record back into the 90 piece codes of a board. Raises ValueError if a
+    slot holds a square off the board or two pieces share a square.
+    """
+    squares = bytearray(90)
+    for slot in range(32):
+        square = slots[slot]
+        if square == NO_SQUARE:
+            continue
+        if square >= 90 or squares[square]:
+            raise ValueError('invalid or repeated square %d in record' % square)
+        squares[square] = (BLUE if slot < 16 else RED) | RECORD_SLOTS[slot & 15]
+    return squares
+
+
+def encode_records(games):
+    """
+    Packs a list of games into one bytes object of RECORD_SIZE byte records, in the same order.
+    """
+    data = bytearray(RECORD_SIZE * len(games))
+    for index, game in enumerate(games):
+        data[index * RECORD_SIZE:(index + 1) * RECORD_SIZE] = game.to_record()
+    return bytes(data)
+
+
+def decode_records(data, move_cache=None):
+    """
+    Unpacks a bytes-like object of RECORD_SIZE byte records, as returned by encode_records, into a list of games. The
+    games share move_cache, or one new MoveCache if none is given. Raises ValueError if the data is not a whole
+    number of valid records.
+    """
+    if len(data) % RECORD_SIZE:
+        raise ValueError('%d bytes is not a whole number of %d byte records' % (len(data), RECORD_SIZE))
+    if move_cache is None:
+        move_cache = MoveCache()
+    view = memoryview(data)
+    return [JanggiGame.from_record(view[start:start + RECORD_SIZE], move_cache)
+            for start in range(0, len(data), RECORD_SIZE)]
+
+
+def encode_texts(games):
+    """
+    Returns the text notation of each game in a list, one line per game.
+    """
+    return '\n'.join(game.to_text() for game in games) + '\n' if games else ''
+
+
+def decode_texts(text, move_cache=None):
+    """
+    Builds a list of games from text holding one position per line, as returned by encode_texts, skipping blank
+    lines. The games share move_cache, or one new MoveCache if none is given.
+    """
+    if move_cache is None:
+        move_cache = MoveCache()
+    return [JanggiGame.from_text(line, move_cache) for line in text.splitlines() if line.strip()]
+
+
+def move_buffer():
+    """
+    Returns a preallocated array('H') large enough to hold the move IDs of every move in any position.
+    """
+    return array('H', bytes(2 * MAX_MOVES))
+
+
+def encode_board(board):
+    """
+    Converts a list of lists of Piece objects, as returned by get_board, into the flat array of piece codes used by
+    the move generators.
+    """
+    squares = bytearray(90)
+    for row in range(10):
+        for col in range(9):
+            if board[row][col] is not None:
+                squares[row * 9 + col] = board[row][col].get_code()
+    return squares
 
 
 class Piece:
     """
-    This class serves as the super class for each individual Janggi piece. Each piece object will contain
-    information about their color and their position on the board, they will inherit this class and have piece
-    specific move validation.
+    This class serves as the super class for each individual Janggi piece. The game itself stores pieces as small
+    integer codes, Piece objects are a view of those codes which contain information about their color and their
+    position on the board. Each subclass records its piece type so move generation can be shared with the game.
     """
+    _type = EMPTY
+
     def __init__(self, color, row, col):
         self._color = color
         self._col = col
@@ -303,6 +1479,12 @@ class Piece:
         """
         return self._color
 
+    def get_code(self):
+        """
+        Returns the integer piece code used by the game's board array
+        """
+        return COLOR_BITS[self._color] | self._type
+
     def get_col(self):
         """
         Returns the current column value of a piece
@@ -336,11 +1518,28 @@ class Piece:
         """
         return self._row * 1000 + self._col * 100 + new_row * 10 + new_col
 
+    def get_legal_moves(self, board, moves):
+        """
+        Generates a set of all legal moves for the piece given the current board condition. Does not account for
+        check, so not all legal moves are valid.
+        """
+        # Allow player to pass
+        moves.append(Move((self._row, self._col), (self._row, self._col), board))
+
+        targets = []
+        TARGET_GENERATORS[self._type](encode_board(board), self._row * 9 + self._col, COLOR_BITS[self._color],
+                                      targets)
+        for target in targets:
+            moves.append(Move((self._row, self._col), divmod(target, 9), board))
+        return moves
+
 
 class Cannon(Piece):
     """
     Creates a Cannon object which contains color, position, and valid move information.
     """
+    _type = CANNON
+
     def __init__(self, color, row, col):
         super().__init__(color, row, col)
         self._name = 'Cannon'
@@ -348,69 +1547,13 @@ class Cannon(Piece):
     def get_name(self):
         return self._name
 
-    def get_legal_moves(self, board, moves):
-        """
-        Generates a set of all legal moves for the piece given the current board condition. Does not account for
-        check, so not all legal moves are valid.
-        """
-        # Allow player to pass
-        moves.append(Move((self._row, self._col), (self._row, self._col), board))
-
-        poss_moves = ((-1, 0), (1, 0), (0, -1), (0, 1))
-
-        for row, col in poss_moves:
-            can_jump = False
-            new_row, new_col = self._row + row, self._col + col
-            while 0 <= new_row <= 9 and 0 <= new_col <= 8:
-                if not can_jump:
-                    if board[new_row][new_col] is None:
-                        new_row += row
-                        new_col += col
-                        continue
-                    elif board[new_row][new_col].get_name() == 'Cannon':
-                        break
-                    else:
-                        can_jump = True
-                        new_row += row
-                        new_col += col
-                else:
-                    if board[new_row][new_col] is None:
-                        moves.append(Move((self._row, self._col), (new_row, new_col), board))
-                        new_row += row
-                        new_col += col
-                    elif board[new_row][new_col].get_name() != 'Cannon' and board[new_row][new_col].get_color() !=\
-                            self._color:
-                        moves.append(Move((self._row, self._col), (new_row, new_col), board))
-                        break
-                    else:
-                        break
-
-        palace_squares = [(0, 3), (0, 5), (2, 3), (2, 5), (1, 4), (9, 3), (9, 5), (7, 3), (7, 5), (8, 4)]
-        palace_moves = [(-1, -1), (1, 1), (-1, 1), (1, -1)]
-
-        # handles diagonal jumps in the palace
-        if self.get_orig() in palace_squares:
-            for row, col in palace_moves:
-                new_row, new_col = self._row + row, self._col + col
-                while is_in_palace(new_row, new_col):
-                    if board[new_row][new_col] is None:
-                        break
-                    else:
-                        if board[new_row][new_col].get_name() != 'Cannon':
-                            new_row += row
-                            new_col += col
-                            if board[new_row][new_col] is None:
-                                moves.append(Move((self._row, self._col), (new_row, new_col), board))
-                            elif board[new_row][new_col].get_color() != self._color and \
-                                    board[new_row][new_col].get_name() != 'Cannon':
-                                moves.append(Move((self._row, self._col), (new_row, new_col), board))
-                                break
-
 
 class Chariot(Piece):
     """
     Creates a Chariot object which contains color, position, and valid move information.
     """
+    _type = CHARIOT
+
     def __init__(self, color, row, col):
         super().__init__(color, row, col)
         self._name = 'Chariot'
@@ -418,56 +1561,12 @@ class Chariot(Piece):
     def get_name(self):
         return self._name
 
-    def get_legal_moves(self, board, moves):
-        """
-        Generates a set of all legal moves for the piece given the current board condition. Does not account for
-        check, so not all legal moves are valid.
-        """
-        # Allow player to pass
-        moves.append(Move((self._row, self._col), (self._row, self._col), board))
-
-        poss_moves = ((-1, 0), (1, 0), (0, -1), (0, 1))
-
-        for row, col in poss_moves:
-            new_row, new_col = self._row + row, self._col + col
-            while valid_space_check(new_row, new_col, board, self._color):
-                moves.append(Move((self._row, self._col), (new_row, new_col), board))
-                # Piece cannot go through multiple opponents. If opponent is found in one direction, stop looking.
-                if board[new_row][new_col] is not None and board[new_row][new_col].get_color() != self._color:
-                    break
-                new_row += row
-                new_col += col
-
-        blue_palace = [(9, 3), (9, 5), (7, 3), (7, 5), (8, 4)]
-        red_palace = [(0, 3), (0, 5), (2, 3), (2, 5), (1, 4)]
-        palace_moves = [(-1, -1), (1, 1), (-1, 1), (1, -1)]
-        # handles diagonal moves if chariot is in the red palace
-        if self.get_orig() in red_palace:
-            for row, col in palace_moves:
-                new_row, new_col = self._row + row, self._col + col
-                while red_palace_check(new_row, new_col, board, self._color):
-                    moves.append(Move((self._row, self._col), (new_row, new_col), board))
-                    if board[new_row][new_col] is not None and board[new_row][new_col].get_color() != self._color:
-                        break
-                    new_row += row
-                    new_col += col
-
-        # handles diagonal moves if chariot is in the blue palace
-        if self.get_orig() in blue_palace:
-            for row, col in palace_moves:
-                new_row, new_col = self._row + row, self._col + col
-                while blue_palace_check(new_row, new_col, board, self._color):
-                    moves.append(Move((self._row, self._col), (new_row, new_col), board))
-                    if board[new_row][new_col] is not None and board[new_row][new_col].get_color() != self._color:
-                        break
-                    new_row += row
-                    new_col += col
-
 
 class Elephant(Piece):
     """
     Creates a Elephant object which contains color, position, and valid move information.
     """
+    _type = ELEPHANT
 
     def __init__(self, color, row, col):
         super().__init__(color, row, col)
@@ -476,52 +1575,12 @@ class Elephant(Piece):
     def get_name(self):
         return self._name
 
-    def get_legal_moves(self, board, moves):
-        """
-        Generates a set of all legal moves for the piece given the current board condition. Does not account for
-        check, so not all legal moves are valid.
-        """
-        # Allow player to pass
-        moves.append(Move((self._row, self._col), (self._row, self._col), board))
-
-        poss_moves = ((-1, 0), (1, 0), (0, -1), (0, 1))
-        directions = [-1, 1]
-
-        for row, col in poss_moves:
-            new_row, new_col = self._row + row, self._col + col
-            if 0 <= new_row <= 9 and 0 <= new_col <= 8:
-                if board[new_row][new_col] is None:
-                    new_row += row
-                    new_col += col
-                    temp_coords = [new_row, new_col]
-                    if 0 <= new_row <= 9 and 0 <= new_col <= 8:
-                        if row == 0:
-                            for direction in directions:
-                                new_col = temp_coords[1]
-                                new_row = self._row + direction
-                                if 0 <= new_row <= 9 and 0 <= new_col <= 8:
-                                    if board[new_row][new_col] is None:
-                                        new_row += direction
-                                        new_col = new_col + col
-                                        if valid_space_check(new_row, new_col, board, self._color):
-                                            moves.append(Move((self._row, self._col), (new_row, new_col), board))
-
-                        if col == 0:
-                            for direction in directions:
-                                new_row = temp_coords[0]
-                                new_col = self._col + direction
-                                if 0 <= new_row <= 9 and 0 <= new_col <= 8:
-                                    if board[new_row][new_col] is None:
-                                        new_row = new_row + row
-                                        new_col += direction
-                                        if valid_space_check(new_row, new_col, board, self._color):
-                                            moves.append(Move((self._row, self._col), (new_row, new_col), board))
-
 
 class General(Piece):
     """
     Creates a General object which contains color, position, and valid move information.
     """
+    _type = GENERAL
 
     def __init__(self, color, row, col):
         super().__init__(color, row, col)
@@ -530,48 +1589,12 @@ class General(Piece):
     def get_name(self):
         return self._name
 
-    def get_legal_moves(self, board, moves):
-        """
-        Generates a set of all legal moves for the piece given the current board condition. Does not account for
-        check, so not all legal moves are valid.
-        """
-        # Allow player to pass
-        moves.append(Move((self._row, self._col), (self._row, self._col), board))
-
-        poss_moves = [(-1, 0), (1, 0), (0, -1), (0, 1)]
-        blue_palace = [(9, 3), (9, 5), (7, 3), (7, 5), (8, 4)]
-        red_palace = [(0, 3), (0, 5), (2, 3), (2, 5), (1, 4)]
-        palace_moves = [(-1, -1), (1, 1), (-1, 1), (1, -1)]
-
-        if self.get_color() == 'red':
-            for row, col in poss_moves:
-                new_row, new_col = self._row + row, self._col + col
-                if red_palace_check(new_row, new_col, board, self._color):
-                    moves.append(Move((self._row, self._col), (new_row, new_col), board))
-
-        if self.get_color() == 'blue':
-            for row, col in poss_moves:
-                new_row, new_col = self._row + row, self._col + col
-                if blue_palace_check(new_row, new_col, board, self._color):
-                    moves.append(Move((self._row, self._col), (new_row, new_col), board))
-
-        if self.get_orig() in red_palace:
-            for row, col in palace_moves:
-                new_row, new_col = self._row + row, self._col + col
-                if red_palace_check(new_row, new_col, board, self._color):
-                    moves.append(Move((self._row, self._col), (new_row, new_col), board))
-
-        if self.get_orig() in blue_palace:
-            for row, col in palace_moves:
-                new_row, new_col = self._row + row, self._col + col
-                if blue_palace_check(new_row, new_col, board, self._color):
-                    moves.append(Move((self._row, self._col), (new_row, new_col), board))
-
 
 class Guard(Piece):
     """
     Creates a Guard object which contains color, position, and valid move information.
     """
+    _type = GUARD
 
     def __init__(self, color, row, col):
         super().__init__(color, row, col)
@@ -580,19 +1603,12 @@ class Guard(Piece):
     def get_name(self):
         return self._name
 
-    def get_legal_moves(self, board, moves):
-        """
-        Generates a set of all legal moves for the piece given the current board condition. Does not account for
-        check, so not all legal moves are valid.
-        """
-        General(self.get_color(), self.get_row(), self.get_col()).get_legal_moves(board, moves)
-        return moves
-
 
 class Horse(Piece):
     """
     Creates a Horse object which contains color, position, and valid move information.
     """
+    _type = HORSE
 
     def __init__(self, color, row, col):
         super().__init__(color, row, col)
@@ -601,40 +1617,12 @@ class Horse(Piece):
     def get_name(self):
         return self._name
 
-    def get_legal_moves(self, board, moves):
-        """
-        Generates a set of all legal moves for the piece given the current board condition. Does not account for
-        check, so not all legal moves are valid.
-        """
-        # Allow player to pass
-        moves.append(Move((self._row, self._col), (self._row, self._col), board))
-
-        poss_moves = ((-1, 0), (1, 0), (0, -1), (0, 1))
-        directions = [-1, 1]
-
-        for row, col in poss_moves:
-            new_row, new_col = self._row + row, self._col + col
-            if 0 <= new_row <= 9 and 0 <= new_col <= 8:
-                if board[new_row][new_col] is None:
-                    new_row += row
-                    new_col += col
-                    if 0 <= new_row <= 9 and 0 <= new_col <= 8:
-                        if row == 0:
-                            for direction in directions:
-                                new_row = self._row + direction
-                                if valid_space_check(new_row, new_col, board, self._color):
-                                    moves.append(Move((self._row, self._col), (new_row, new_col), board))
-                        if col == 0:
-                            for direction in directions:
-                                new_col = self._col + direction
-                                if valid_space_check(new_row, new_col, board, self._color):
-                                    moves.append(Move((self._row, self._col), (new_row, new_col), board))
-
 
 class Soldier(Piece):
     """
     Creates a Soldier object which contains color, position, and valid move information.
     """
+    _type = SOLDIER
 
     def __init__(self, color, row, col):
         super().__init__(color, row, col)
@@ -643,86 +1631,52 @@ class Soldier(Piece):
     def get_name(self):
         return self._name
 
-    def get_legal_moves(self, board, moves):
-        """
-        Generates a set of all legal moves for the piece given the current board condition. Does not account for
-        check, so not all legal moves are valid.
-        """
-        # Allow player to pass
-        moves.append(Move((self._row, self._col), (self._row, self._col), board))
-
-        direction = {'red': 1, 'blue': -1}
-        poss_moves = ((0, -1), (0, 1), (direction[self._color], 0))
-
-        for row, col in poss_moves:
-            new_row, new_col = self._row + row, self._col + col
-            if valid_space_check(new_row, new_col, board, self._color):
-                moves.append(Move((self._row, self._col), (new_row, new_col), board))
 
-        blue_palace = [(9, 3), (9, 5)]
-        red_palace = [(0, 3), (0, 5)]
-        if self._row == 1 and self._col == 4:
-            for row, col in red_palace:
-                if valid_space_check(row, col, board, self._color):
-                    moves.append(Move((self._row, self._col), (row, col), board))
+PIECE_CLASSES = {GENERAL: General, GUARD: Guard, ELEPHANT: Elephant, HORSE: Horse, CHARIOT: Chariot, CANNON: Cannon,
+                 SOLDIER: Soldier}
 
-        if self._row == 8 and self._col == 4:
-            for row, col in blue_palace:
-                if valid_space_check(row, col, board, self._color):
-                    moves.append(Move((self._row, self._col), (row, col), board))
 
-        if self._row == 2:
-            if self._col == 3 or self._col == 5:
-                if board[1][4] is None or board[1][4].get_color() != self._color:
-                    moves.append(Move((self._row, self._col), (1, 4), board))
-
-        if self._row == 7:
-            if self._col == 3 or self._col == 5:
-                if board[8][4] is None or board[8][4].get_color() != self._color:
-                    moves.append(Move((self._row, self._col), (8, 4), board))
-
-        return moves
+def piece_from_code(code, row, col):
+    """
+    Builds the Piece object for a piece code found at the given row and column.
+    """
+    return PIECE_CLASSES[code & TYPE_MASK](COLOR_NAMES[code & COLOR_MASK], row, col)
 
 
-class Move:
+class Move(int):
     """
-    This class is used to create a Move object for each move as it is passed by the user. Stores the starting and
-    ending locations, the moving piece, and any piece that may be at the destination square. This class relies on
-    the Piece class to create valid moves. Information stored in this class can be used to easily undo moves
-    if a check or otherwise invalid move is discovered.
+    This class is used to create a Move object for each move as it is passed by the user. A Move is its own four
+    digit move ID (ie 0111 represents a piece moving from a2 to b2), so Moves are as small as an int, hash and compare
+    by that ID, and can be looked up directly in the set returned by get_valid_moves. The origin and destination are
+    decoded from the ID when asked for.
     """
-    def __init__(self, orig, dest, cur_board):
-        self._orig = orig
-        self._dest = dest
-        self._piece = cur_board[self._orig[0]][self._orig[1]]
-        self._target = cur_board[self._dest[0]][self._dest[1]]
-        self._cur_board = cur_board
-        self._moveID = self._orig[0] * 1000 + self._orig[1] * 100 + self._dest[0] * 10 + self._dest[1]
+    __slots__ = ()
 
-    def get_orig(self):
+    def __new__(cls, orig, dest, cur_board=None):
         """
-        Returns the origin coordinates of a desired move
+        Takes (row, col) pairs for the origin and destination. The board argument is accepted so existing callers
+        keep working, but it is not needed since the game tracks captured pieces itself.
         """
-        return self._orig[0], self._orig[1]
+        return int.__new__(cls, orig[0] * 1000 + orig[1] * 100 + dest[0] * 10 + dest[1])
 
-    def get_target(self):
+    @classmethod
+    def from_id(cls, move_id):
         """
-        Returns the target of a move
+        Returns the Move for a four digit move ID, as stored in move buffers
         """
-        return self._dest[0], self._dest[1]
+        return int.__new__(cls, move_id)
 
-    def get_original_piece(self):
+    def get_orig(self):
         """
-        Returns the piece which is being moved
+        Returns the origin coordinates of a desired move
         """
-        return self._piece
+        return divmod(self // 100, 10)
 
-    def get_target_piece(self):
+    def get_target(self):
         """
-        Returns the piece which was on the target space. This can be used to reset the move if a covered check is
-        discovered
+        Returns the target of a move
         """
-        return self._target
+        return divmod(self % 100, 10)
 
     @staticmethod
     def letter_to_number(char):
@@ -732,21 +1686,8 @@ class Move:
         """
         return string.ascii_lowercase.index(char.lower())
 
-    def __eq__(self, other):
-        """
-        This is used to equate the move objects generated in the "make_move" function which are created by the user's
-        string input to the list of valid moves generated within the Move class. Even though the moves look equal,
-        Python does not inherently know how to equate them so by generating a 4 digit "ID" of the origin and destination
-        coordinates of a move, two Moves can be equated as long as their ID matches.
-        """
-        if isinstance(other, Move):
-            return self._moveID == other._moveID
-        return False
+    def __reduce__(self):
+        return Move.from_id, (int(self),)
 
-gs = JanggiGame()
-gs.make_move('c10', 'd8')
-gs.make_move('h1', 'i3')
-gs.make_move('a10', 'a9')
-gs.make_move('i4', 'i5')
-gs.make_move('a9', 'a8')
-gs.make_move('i3', 'h5')
\ No newline at end of file
+    def __repr__(self):
+        return 'Move(%r, %r)' % (self.get_orig(), self.get_target())
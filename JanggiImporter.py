@@ -0,0 +1,199 @@
+# Author: Bryan Zierk
+# Date: 10/18/26
+# Description: Streaming reader and validator for Janggi game records. A record file holds one game per line, each
+# move written in the notation make_move accepts as origin-destination, for example "c10-d8 a4-b4 h10-g8". Games are
+# read one line at a time, every move is checked with JanggiGame.is_valid_move and played with push, and a result
+# (with the positions reached, if asked for) or the first error is yielded for each game. Archives of many files can
+# be checked across a pool of processes, reporting games and moves per second.
+
+import argparse
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import JanggiGame as jg
+
+# A move is two squares, column letter then row number, joined by an optional dash. "pass" passes with the General.
+# Lines which are blank or start with # are skipped. A game may end with its result: 1-0 for a Blue win, 0-1 for a Red
+# win, 1/2-1/2 for a draw, or * for unknown.
+MOVE_PATTERN = re.compile(r'([a-i])(10|[1-9])-?([a-i])(10|[1-9])$')
+RESULT_TOKENS = {'1-0': 'blue', '0-1': 'red', '1/2-1/2': 'draw', '*': None}
+PASS_TOKEN = 'pass'
+
+
+class GameRecord:
+    """
+    The outcome of reading one game: where it came from, the move IDs which were played, the error which stopped
+    it, if any, the binary records of the positions reached, if they were asked for, and the recorded result.
+    """
+    def __init__(self, source, line, moves, error, positions, result=None):
+        self._source = source
+        self._line = line
+        self._moves = moves
+        self._error = error
+        self._positions = positions
+        self._result = result
+
+    def get_source(self):
+        """
+        Returns the name of the file the game was read from
+        """
+        return self._source
+
+    def get_line(self):
+        """
+        Returns the line number of the game in its file
+        """
+        return self._line
+
+    def get_moves(self):
+        """
+        Returns the list of valid move IDs played before the end of the game or the first error
+        """
+        return self._moves
+
+    def get_error(self):
+        """
+        Returns a message describing the first invalid move, or None if every move was valid
+        """
+        return self._error
+
+    def is_valid(self):
+        """
+        Returns True if every move in the game was valid
+        """
+        return self._error is None
+
+    def get_positions(self):
+        """
+        Returns the binary records of the starting position and of the position after each valid move, or None if
+        positions were not asked for
+        """
+        return self._positions
+
+    def get_result(self):
+        """
+        Returns the recorded result of the game: 'blue' or 'red' for the winner, 'draw', or None if it is unknown
+        """
+        return self._result
+
+
+def parse_move(token, game):
+    """
+    Returns the move ID written by a move token, such as 'c10-d8'. The game is used to find the General for a
+    pass. Raises ValueError if the token is not a move.
+    """
+    if token == PASS_TOKEN:
+        general = game.get_general_loc(game.active_turn())
+        return jg.SQUARE_IDS[general[0] * 9 + general[1]] * 101
+    match = MOVE_PATTERN.match(token)
+    if match is None:
+        raise ValueError('%r is not a move' % token)
+    orig_col, orig_row, dest_col, dest_row = match.groups()
+    return ((int(orig_row) - 1) * 1000 + (ord(orig_col) - ord('a')) * 100 + (int(dest_row) - 1) * 10 +
+            ord(dest_col) - ord('a'))
+
+
+def replay_game(tokens, source='<input>', line=0, positions=False):
+    """
+    Plays the move tokens of one game from the opening, checking each, and returns a GameRecord. Play stops at the
+    first token which is not a valid move in the position it is played in.
+    """
+    game = jg.JanggiGame(jg.MoveCache(0))
+    moves = []
+    records = [game.to_record()] if positions else None
+    for token in tokens:
+        if token in RESULT_TOKENS:
+            return GameRecord(source, line, moves, None, records, RESULT_TOKENS[token])
+        try:
+            move = parse_move(token, game)
+        except ValueError as error:
+            return GameRecord(source, line, moves, 'move %d: %s' % (len(moves) + 1, error), records)
+        if not game.is_valid_move(move):
+            return GameRecord(source, line, moves, 'move %d: %s is not a valid move for %s' %
+                              (len(moves) + 1, token, game.active_turn()), records)
+        game.push(move)
+        moves.append(move)
+        if positions:
+            records.append(game.to_record())
+    return GameRecord(source, line, moves, None, records)
+
+
+def import_games(lines, source='<input>', positions=False):
+    """
+    Yields a GameRecord for each game in an iterable of lines, one game per line, reading the lines only as they
+    are needed.
+    """
+    for number, text in enumerate(lines, 1):
+        text = text.strip()
+        if not text or text.startswith('#'):
+            continue
+        yield replay_game(text.replace(',', ' ').split(), source, number, positions)
+
+
+def import_file(path, positions=False):
+    """
+    Yields a GameRecord for each game in a record file, streaming the file rather than reading it all at once.
+    """
+    with open(path) as file:
+        for record in import_games(file, path, positions):
+            yield record
+
+
+def import_task(path):
+    """
+    Worker process entry point: validates every game in one record file and returns (games, moves, errors), where
+    errors is a list of (path, line, message) for the games which failed.
+    """
+    games = 0
+    moves = 0
+    errors = []
+    for record in import_file(path):
+        games += 1
+        moves += len(record.get_moves())
+        if record.get_error() is not None:
+            errors.append((path, record.get_line(), record.get_error()))
+    return games, moves, errors
+
+
+def import_archive(paths, workers=1):
+    """
+    Validates every game in a list of record files, one file per task in a pool of worker processes (or in this
+    process when workers is one). Returns a dictionary with the number of games and valid moves, the list of
+    (path, line, message) errors, the time taken in seconds, and games and moves per second.
+    """
+    start = time.perf_counter()
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(import_task, paths))
+    else:
+        results = [import_task(path) for path in paths]
+    elapsed = time.perf_counter() - start
+    totals = {'games': sum(result[0] for result in results), 'moves': sum(result[1] for result in results),
+              'errors': [error for result in results for error in result[2]], 'time': elapsed}
+    totals['games_per_second'] = totals['games'] / elapsed if elapsed else 0
+    totals['moves_per_second'] = totals['moves'] / elapsed if elapsed else 0
+    return totals
+
+
+def main(argv=None):
+    """
+    Command line entry point. Validates the given record files, prints each error and the totals with games and
+    moves per second, and exits with a non-zero status if any game had an invalid move.
+    """
+    parser = argparse.ArgumentParser(description='Validate Janggi game record files')
+    parser.add_argument('paths', nargs='+', help='record files, one game per line')
+    parser.add_argument('--workers', type=int, default=1, help='number of worker processes (default 1)')
+    args = parser.parse_args(argv)
+
+    totals = import_archive(args.paths, args.workers)
+    for path, line, message in totals['errors']:
+        print('%s:%d: %s' % (path, line, message))
+    print('games %d  errors %d  moves %d  time %.3fs  games/sec %.1f  moves/sec %.0f'
+          % (totals['games'], len(totals['errors']), totals['moves'], totals['time'], totals['games_per_second'],
+             totals['moves_per_second']))
+    return 1 if totals['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
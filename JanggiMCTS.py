@@ -0,0 +1,314 @@
+# Author: Bryan Zierk
+# Date: 10/18/26
+# Description: Monte Carlo tree search player for JanggiGame. Each playout walks down the tree choosing moves by UCT,
+# adds one new position to the tree, and finishes the game from there with random moves. Playouts use the game's own
+# push and pop, generate moves by the piece rules alone, and only check the one move picked at random for the
+# General's safety. The tree is kept between searches, so the part below the moves actually played is reused.
+
+import argparse
+import math
+import random
+import sys
+import time
+import JanggiGame as jg
+import JanggiSearch
+
+DEFAULT_PLAYOUTS = 1000
+EXPLORATION = 1.4
+ROLLOUT_LIMIT = 80
+TIME_CHECK_INTERVAL = 16
+
+# A playout which reaches ROLLOUT_LIMIT moves without a checkmate is scored from the static evaluation, turned into a
+# win chance with a logistic curve which gives about 0.73 to a side a Horse and a Soldier ahead.
+EVALUATION_SCALE = 700.0
+
+
+class Node:
+    """
+    One position in the search tree: the move ID which reached it, the moves not yet added as children, and the
+    number of playouts through it with the points they scored for the side which made the move.
+    """
+    __slots__ = ('_move', '_parent', '_key', '_children', '_untried', '_visits', '_wins')
+
+    def __init__(self, move, parent, key, untried):
+        self._move = move
+        self._parent = parent
+        self._key = key
+        self._children = []
+        self._untried = untried
+        self._visits = 0
+        self._wins = 0.0
+
+    def get_move(self):
+        """
+        Returns the move ID which reached the position, or None for the root
+        """
+        return self._move
+
+    def get_visits(self):
+        """
+        Returns the number of playouts which passed through the position
+        """
+        return self._visits
+
+    def get_score(self):
+        """
+        Returns the average points scored for the side which made the move, from 0 for a loss to 1 for a win
+        """
+        return self._wins / self._visits if self._visits else 0.0
+
+    def get_children(self):
+        """
+        Returns the list of child Nodes added so far
+        """
+        return self._children
+
+
+class MCTSResult:
+    """
+    The outcome of one search: the best move, how often it was visited and how well it scored, and the number of
+    playouts run, how many were reused from the previous search, and the time taken.
+    """
+    def __init__(self, best_move, visits, score, playouts, reused, time_ms):
+        self._best_move = best_move
+        self._visits = visits
+        self._score = score
+        self._playouts = playouts
+        self._reused = reused
+        self._time_ms = time_ms
+
+    def get_best_move(self):
+        """
+        Returns the Move the search chose, or None if the side to move has no valid moves
+        """
+        return self._best_move
+
+    def get_visits(self):
+        """
+        Returns the number of playouts which went through the best move
+        """
+        return self._visits
+
+    def get_score(self):
+        """
+        Returns the average points the best move scored, from 0 for a loss to 1 for a win
+        """
+        return self._score
+
+    def get_playouts(self):
+        """
+        Returns the number of playouts run by this search
+        """
+        return self._playouts
+
+    def get_reused(self):
+        """
+        Returns the number of playouts already in the tree from earlier searches when this one started
+        """
+        return self._reused
+
+    def get_time_ms(self):
+        """
+        Returns the time the search took in milliseconds
+        """
+        return self._time_ms
+
+    def get_playouts_per_second(self):
+        """
+        Returns the playouts run per second
+        """
+        if self._time_ms <= 0:
+            return 0
+        return self._playouts * 1000 / self._time_ms
+
+
+class MCTS:
+    """
+    Holds the search tree and the random number generator between searches. Use one MCTS per game, so that the tree
+    from the last search can be reused for the next.
+    """
+    def __init__(self, exploration=EXPLORATION, rollout_limit=ROLLOUT_LIMIT, rng=None):
+        self._exploration = exploration
+        self._rollout_limit = rollout_limit
+        self._rng = rng if rng is not None else random.Random()
+        self._root = None
+        self._buffer = jg.move_buffer()
+
+    def get_root(self):
+        """
+        Returns the root Node of the last search, or None before the first
+        """
+        return self._root
+
+    def search(self, game, playouts=None, time_ms=None):
+        """
+        Runs playouts from the game's current position until playouts have been run or time_ms milliseconds have
+        passed, whichever comes first (DEFAULT_PLAYOUTS if neither is given), and returns an MCTSResult for the most
+        visited move. The game is left as it was found.
+        """
+        if playouts is None and time_ms is None:
+            playouts = DEFAULT_PLAYOUTS
+        start = time.perf_counter()
+        deadline = start + time_ms / 1000 if time_ms is not None else None
+        root = self._find_root(game)
+        reused = root._visits
+        if not root._untried and not root._children:
+            # The side to move has no valid moves, so there is nothing to search.
+            return MCTSResult(None, 0, 0.0, 0, reused, (time.perf_counter() - start) * 1000)
+        log = math.log
+        sqrt = math.sqrt
+        exploration = self._exploration
+
+        done = 0
+        while playouts is None or done < playouts:
+            if deadline is not None and done % TIME_CHECK_INTERVAL == 0 and time.perf_counter() >= deadline:
+                break
+            node = root
+            depth = 0
+            while not node._untried and node._children:
+                scale = exploration * sqrt(log(node._visits))
+                best = None
+                best_value = -1.0
+                for child in node._children:
+                    value = child._wins / child._visits + scale / sqrt(child._visits)
+                    if value > best_value:
+                        best_value = value
+                        best = child
+                node = best
+                game.push(node._move)
+                depth += 1
+            if node._untried:
+                move = node._untried.pop()
+                game.push(move)
+                depth += 1
+                child = Node(move, node, game.position_key(), self._legal_moves(game))
+                node._children.append(child)
+                node = child
+
+            # The value is from the point of view of the side which moved into node. A position with no moves, in
+            # the tree or at the end of a playout, is checkmate and a win for that side.
+            if node._untried or node._children:
+                value = 1.0 - self._rollout(game)
+            else:
+                value = 1.0
+            for _ in range(depth):
+                game.pop()
+            while node is not None:
+                node._visits += 1
+                node._wins += value
+                value = 1.0 - value
+                node = node._parent
+            done += 1
+
+        elapsed = (time.perf_counter() - start) * 1000
+        if not root._children:
+            return MCTSResult(None, 0, 0.0, done, reused, elapsed)
+        best = max(root._children, key=lambda child: child._visits)
+        return MCTSResult(jg.Move.from_id(best._move), best._visits, best.get_score(), done, reused, elapsed)
+
+    def _find_root(self, game):
+        """
+        Returns the tree node for the game's position, taking it from the last tree if the position is the root or
+        two moves below it, and otherwise starting a new tree.
+        """
+        key = game.position_key()
+        root = self._root
+        if root is not None and root._key != key:
+            found = None
+            for child in root._children:
+                for grandchild in child._children:
+                    if grandchild._key == key:
+                        found = grandchild
+                if child._key == key:
+                    found = child
+            root = found
+        if root is None:
+            root = Node(None, None, key, self._legal_moves(game))
+        root._parent = None
+        self._root = root
+        return root
+
+    def _legal_moves(self, game):
+        """
+        Returns the valid move IDs of the side to move as a list in random order, for popping one at a time
+        """
+        buffer = self._buffer
+        moves = [buffer[index] for index in range(game.generate_legal(buffer))]
+        self._rng.shuffle(moves)
+        return moves
+
+    def _rollout(self, game):
+        """
+        Plays random moves from the game's current position and returns the points scored for the side to move: 1 or
+        0 if a side is checkmated, 0.5 if both sides pass in a row, and a win chance from the static evaluation if
+        the game reaches rollout_limit moves. Passes are only played when no other move is possible. The moves are
+        taken back before returning.
+        """
+        buffer = self._buffer
+        rng = self._rng.random
+        played = 0
+        passed = False
+        result = None
+        while played < self._rollout_limit:
+            count = game.generate_pseudo_legal(buffer)
+            move = None
+            while count:
+                index = int(rng() * count)
+                if game.is_safe_move(buffer[index]):
+                    move = buffer[index]
+                    break
+                count -= 1
+                buffer[index] = buffer[count]
+            if move is None:
+                turn = game.active_turn()
+                if game.is_in_check(turn):
+                    result = 0.0 if played % 2 == 0 else 1.0
+                    break
+                if passed:
+                    result = 0.5
+                    break
+                row, col = game.get_general_loc(turn)
+                move = jg.SQUARE_IDS[row * 9 + col] * 101
+                passed = True
+            else:
+                passed = False
+            game.push(move)
+            played += 1
+        if result is None:
+            chance = 1.0 / (1.0 + math.exp(-JanggiSearch.evaluate(game) / EVALUATION_SCALE))
+            result = chance if played % 2 == 0 else 1.0 - chance
+        for _ in range(played):
+            game.pop()
+        return result
+
+
+def main(argv=None):
+    """
+    Command line entry point. Plays a few moves of a game with MCTS for both sides, printing each move with its
+    visits, score, playouts reused from the previous search, and playouts per second.
+    """
+    parser = argparse.ArgumentParser(description='Monte Carlo tree search for Janggi')
+    parser.add_argument('--playouts', type=int, default=None, help='playouts per move (default %d)'
+                        % DEFAULT_PLAYOUTS)
+    parser.add_argument('--time-ms', type=int, default=None, help='time per move in milliseconds')
+    parser.add_argument('--moves', type=int, default=4, help='moves to play (default 4)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed (default 0)')
+    args = parser.parse_args(argv)
+
+    game = jg.JanggiGame(jg.MoveCache(0))
+    players = {'blue': MCTS(rng=random.Random(args.seed)), 'red': MCTS(rng=random.Random(args.seed + 1))}
+    for _ in range(args.moves):
+        turn = game.active_turn()
+        result = players[turn].search(game, args.playouts, args.time_ms)
+        if result.get_best_move() is None:
+            print('%s is checkmated' % turn)
+            break
+        print('%-4s %-8r visits %5d  score %.3f  playouts %5d  reused %5d  time %8.1fms  playouts/sec %.0f'
+              % (turn, result.get_best_move(), result.get_visits(), result.get_score(), result.get_playouts(),
+                 result.get_reused(), result.get_time_ms(), result.get_playouts_per_second()))
+        game.push(result.get_best_move())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
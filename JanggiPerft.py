@@ -0,0 +1,209 @@
+# Author: Bryan Zierk
+# Date: 10/18/26
+# Description: Perft node counts and move generation benchmarks for JanggiGame. Running this file counts the positions
+# reachable from the opening and a set of stored test positions, prints nodes, time, and nodes per second for each, and
+# checks every count against the reference numbers below so that speed work cannot silently change the rules.
+
+import argparse
+import random
+import sys
+import time
+import JanggiGame as jg
+import JanggiSearch
+
+# Each test position is reached by playing its moves from the opening, in the notation make_move accepts. The
+# reference counts were checked against the original piece-by-piece move rules.
+PERFT_POSITIONS = [
+    ('start', [], [32, 1024, 33506, 1095844]),
+    ('opening', [('c7', 'c6'), ('a4', 'b4'), ('h10', 'g8'), ('a1', 'a6'), ('a7', 'a6'), ('e4', 'f4'), ('d10', 'd9'),
+                 ('e2', 'f3'), ('a10', 'a8'), ('f3', 'e3'), ('e7', 'f7'), ('i4', 'h4')],
+     [37, 1490, 56169, 2288711]),
+    ('middlegame', [('f10', 'f9'), ('a4', 'b4'), ('f9', 'f10'), ('a1', 'a7'), ('a10', 'a7'), ('c4', 'd4'),
+                    ('d10', 'e10'), ('e4', 'e5'), ('a7', 'a8'), ('b4', 'c4'), ('c7', 'd7'), ('i1', 'i2'),
+                    ('a8', 'a7'), ('e5', 'e6'), ('e7', 'e6'), ('e2', 'f3'), ('i10', 'i9'), ('f1', 'e2'),
+                    ('e9', 'd9'), ('b3', 'g3'), ('i9', 'i10'), ('f3', 'f2'), ('e6', 'e5'), ('g1', 'e4'),
+                    ('a7', 'b7'), ('g4', 'h4'), ('b7', 'b1'), ('g3', 'g10'), ('b1', 'b6'), ('g10', 'e10')],
+     [44, 1448, 60559, 2078188]),
+    ('palace', [('a10', 'a9'), ('h1', 'g3'), ('a9', 'c9'), ('i4', 'h4'), ('a7', 'a6'), ('i1', 'h1'), ('c7', 'd7'),
+                ('e2', 'e1'), ('c9', 'c4'), ('h4', 'h5'), ('c4', 'e4'), ('g1', 'e4'), ('a6', 'b6'), ('a4', 'b4'),
+                ('b8', 'b4'), ('e4', 'g7'), ('d7', 'd6'), ('h3', 'f3'), ('h8', 'h1'), ('f1', 'f2'), ('h1', 'd1'),
+                ('c1', 'd3'), ('e9', 'd8'), ('d3', 'b4'), ('h10', 'g8'), ('b4', 'a6'), ('d8', 'e9'), ('f3', 'f1'),
+                ('d1', 'a1'), ('f1', 'd1')],
+     [33, 1057, 35447, 1143977]),
+    ('check', [('h10', 'g8'), ('e2', 'e1'), ('c10', 'd8'), ('a1', 'a3'), ('h8', 'e8'), ('c4', 'd4'), ('e8', 'i8'),
+               ('d4', 'd5'), ('i8', 'i4'), ('h1', 'i3'), ('i4', 'i1'), ('g4', 'g5'), ('d8', 'f7'), ('g5', 'g6'),
+               ('e9', 'd9'), ('g6', 'g7'), ('f7', 'g5'), ('c1', 'd3'), ('g5', 'h3'), ('g7', 'h7'), ('h3', 'g1'),
+               ('i3', 'g4'), ('i7', 'h7'), ('d3', 'c5'), ('f10', 'e10'), ('d5', 'd6'), ('i10', 'h10'),
+               ('a4', 'b4'), ('i1', 'f1'), ('g4', 'e5'), ('f1', 'd1'), ('a3', 'a6'), ('a7', 'a6'), ('c5', 'a6'),
+               ('g8', 'h6'), ('a6', 'c7')],
+     [2, 60, 2279, 61142]),
+]
+
+
+def load_position(moves):
+    """
+    Returns a new JanggiGame with the given list of (origin, destination) moves played from the opening.
+    """
+    game = jg.JanggiGame()
+    for orig, dest in moves:
+        if not game.make_move(orig, dest):
+            raise ValueError('invalid move %s-%s in stored position' % (orig, dest))
+    return game
+
+
+def find_position(name):
+    """
+    Returns the move list of the stored position with the given name. Raises ValueError if there is none.
+    """
+    for position_name, moves, expected in PERFT_POSITIONS:
+        if position_name == name:
+            return moves
+    raise ValueError('unknown position %s' % name)
+
+
+def random_games(count, seed=0, max_moves=120):
+    """
+    Returns a list of games, each reached by playing a random number of random valid moves from the opening.
+    """
+    rng = random.Random(seed)
+    buffer = jg.move_buffer()
+    games = []
+    for _ in range(count):
+        game = jg.JanggiGame(jg.MoveCache(0))
+        for _ in range(rng.randrange(max_moves)):
+            moves = game.generate_legal(buffer)
+            if not moves:
+                break
+            game.push(buffer[rng.randrange(moves)])
+        games.append(game)
+    return games
+
+
+def run_perft(depth, names=None, workers=1):
+    """
+    Runs perft to the given depth on every stored position (or only those named), printing nodes, time, and nodes
+    per second for each and comparing against the reference counts. Returns True if every count matched.
+    """
+    all_match = True
+    total_nodes = 0
+    total_time = 0
+    for name, moves, expected in PERFT_POSITIONS:
+        if names and name not in names:
+            continue
+        game = load_position(moves)
+        start = time.perf_counter()
+        nodes = game.perft(depth, workers)
+        elapsed = time.perf_counter() - start
+        total_nodes += nodes
+        total_time += elapsed
+        if depth <= len(expected):
+            status = 'ok' if nodes == expected[depth - 1] else 'MISMATCH (expected %d)' % expected[depth - 1]
+            all_match = all_match and nodes == expected[depth - 1]
+        else:
+            status = 'no reference'
+        print('%-12s depth %d  nodes %10d  time %8.3fs  nodes/sec %10d  %s'
+              % (name, depth, nodes, elapsed, nodes / elapsed if elapsed else 0, status))
+    if total_time:
+        print('%-12s depth %d  nodes %10d  time %8.3fs  nodes/sec %10d'
+              % ('total', depth, total_nodes, total_time, total_nodes / total_time))
+    return all_match
+
+
+def run_divide(depth, name, workers=1):
+    """
+    Prints the divide counts for one stored position, one root move per line, counting the root moves in workers
+    processes.
+    """
+    counts = load_position(find_position(name)).divide(depth, workers)
+    for move in sorted(counts):
+        print(move, counts[move])
+    print('total', sum(counts.values()))
+
+
+def run_scaling_benchmark(depth, max_workers, name='start'):
+    """
+    Times perft on one stored position and the search from the opening with 1, 2, 4, ... up to max_workers
+    processes, printing the speedup of each over a single process.
+    """
+    game = load_position(find_position(name))
+    counts = [1]
+    while counts[-1] * 2 <= max_workers:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != max_workers:
+        counts.append(max_workers)
+
+    perft_base = search_base = None
+    for workers in counts:
+        start = time.perf_counter()
+        nodes = game.perft(depth, workers)
+        perft_time = time.perf_counter() - start
+        start = time.perf_counter()
+        JanggiSearch.search(game, depth + 1, workers=workers)
+        search_time = time.perf_counter() - start
+        if perft_base is None:
+            perft_base, search_base = perft_time, search_time
+        print('workers %3d  perft %10d nodes %8.3fs  speedup %5.2f   search depth %d %8.3fs  speedup %5.2f'
+              % (workers, nodes, perft_time, perft_base / perft_time, depth + 1, search_time,
+                 search_base / search_time))
+
+
+def run_movegen_benchmark(iterations):
+    """
+    Times move generation alone on every stored position: the engine path (generate_legal into a preallocated
+    buffer), the public path (get_valid_moves with its cache bypassed), and the lazy path (iter_moves) run to the end,
+    stopped after the first move, and limited to one piece, reporting positions per second for each.
+    """
+    buffer = jg.move_buffer()
+    for name, moves, expected in PERFT_POSITIONS:
+        game = load_position(moves)
+        color = game.active_turn()
+        uncached = jg.JanggiGame(jg.MoveCache(0))
+        for orig, dest in moves:
+            uncached.make_move(orig, dest)
+        square = game.get_piece_squares(color)[-1]
+
+        def one_piece(piece_square, code):
+            return piece_square == square
+
+        paths = [('generate_legal', lambda: game.generate_legal(buffer)),
+                 ('get_valid_moves', lambda: uncached.get_valid_moves(color)),
+                 ('iter_moves all', lambda: list(game.iter_moves(color))),
+                 ('iter_moves first', lambda: next(game.iter_moves(color))),
+                 ('iter_moves piece', lambda: list(game.iter_moves(color, piece_filter=one_piece)))]
+        rates = []
+        for label, run in paths:
+            start = time.perf_counter()
+            for _ in range(iterations):
+                run()
+            rates.append('%s %d' % (label, iterations / (time.perf_counter() - start)))
+        print('%-12s positions/sec: %s' % (name, ', '.join(rates)))
+
+
+def main(argv=None):
+    """
+    Command line entry point. With no arguments, runs perft to depth 3 on every stored position and exits with a
+    non-zero status if any count differs from its reference.
+    """
+    parser = argparse.ArgumentParser(description='Perft node counts and move generation benchmarks for Janggi')
+    parser.add_argument('depth', type=int, nargs='?', default=3, help='perft depth (default 3)')
+    parser.add_argument('--position', action='append', help='only run the named stored position')
+    parser.add_argument('--divide', metavar='NAME', help='print per-move counts for one stored position')
+    parser.add_argument('--movegen', type=int, metavar='N', help='time N move generations per position instead')
+    parser.add_argument('--workers', type=int, default=1, metavar='N', help='split perft or divide across N processes')
+    parser.add_argument('--scaling', type=int, metavar='N', help='time perft and search with 1 up to N processes')
+    args = parser.parse_args(argv)
+
+    if args.divide:
+        run_divide(args.depth, args.divide, args.workers)
+        return 0
+    if args.movegen:
+        run_movegen_benchmark(args.movegen)
+        return 0
+    if args.scaling:
+        run_scaling_benchmark(args.depth, args.scaling, args.position[0] if args.position else 'start')
+        return 0
+    return 0 if run_perft(args.depth, args.position, args.workers) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,503 @@
+# Author: Bryan Zierk
+# Date: 10/18/26
+# Description: Alpha-beta search for JanggiGame. Given a game, search picks a move for the side to move using negamax
+# alpha-beta with iterative deepening, a transposition table keyed on the game's position key, killer and history
+# move ordering, a capture-only quiescence search, and an optional hard time budget.
+
+import time
+from concurrent.futures import ProcessPoolExecutor
+import JanggiGame as jg
+
+MATE_SCORE = 100000
+MATE_BOUND = MATE_SCORE - 1000
+INFINITY = 1000000
+DEFAULT_DEPTH = 3
+MAX_DEPTH = 64
+MAX_PLY = 128
+# The transposition table has TABLE_SIZE slots. A position goes in slot key % TABLE_SIZE, replacing whatever was
+# there, so the table never holds more than TABLE_SIZE entries however long a search runs.
+TABLE_SIZE = 1 << 20
+TIME_CHECK_INTERVAL = 63
+RESULT_ALLOWANCE_MS = 20
+
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+PIECE_VALUES = {jg.GENERAL: 0, jg.GUARD: 300, jg.ELEPHANT: 300, jg.HORSE: 500, jg.CHARIOT: 1300, jg.CANNON: 700,
+                jg.SOLDIER: 200}
+
+
+def build_position_values():
+    """
+    Builds the evaluation table: for every piece code and square, the material value of the piece plus a bonus for
+    Soldiers that have advanced toward the opponent's side.
+    """
+    values = []
+    for code in range(jg.COLOR_MASK):
+        piece_type = code & jg.TYPE_MASK
+        if not code & jg.COLOR_MASK or not piece_type:
+            values.append((0,) * 90)
+            continue
+        square_values = []
+        for square in range(90):
+            row = square // 9
+            value = PIECE_VALUES[piece_type]
+            if piece_type == jg.SOLDIER:
+                advanced = row - 3 if code & jg.RED else 6 - row
+                value += 10 * max(advanced, 0)
+            square_values.append(value)
+        values.append(tuple(square_values))
+    return tuple(values)
+
+
+POSITION_VALUES = build_position_values()
+CAPTURE_VALUES = tuple(PIECE_VALUES.get(code & jg.TYPE_MASK, 0) for code in range(jg.COLOR_MASK))
+
+
+def evaluate(game):
+    """
+    Returns a static score for the position from the point of view of the side to move, positive when that side is
+    ahead.
+    """
+    squares = game.get_squares()
+    score = 0
+    for square in game.get_piece_squares('blue'):
+        score += POSITION_VALUES[squares[square]][square]
+    for square in game.get_piece_squares('red'):
+        score -= POSITION_VALUES[squares[square]][square]
+    if game.active_turn() == 'blue':
+        return score
+    return -score
+
+
+class SearchTimeout(Exception):
+    """
+    Raised inside the search when the time budget runs out, to unwind back to the root.
+    """
+    pass
+
+
+class SearchResult:
+    """
+    Holds the outcome of a search: the best move found, its score from the searching side's point of view, the
+    principal variation, the number of nodes visited, the deepest fully completed iteration, and the time taken.
+    """
+    def __init__(self, best_move, score, pv, nodes, depth, time_ms):
+        self._best_move = best_move
+        self._score = score
+        self._pv = pv
+        self._nodes = nodes
+        self._depth = depth
+        self._time_ms = time_ms
+
+    def get_best_move(self):
+        """
+        Returns the best Move found, or None if the side to move has no valid moves
+        """
+        return self._best_move
+
+    def get_score(self):
+        """
+        Returns the score of the best move. Scores beyond MATE_BOUND in size mean a forced checkmate was found
+        """
+        return self._score
+
+    def get_pv(self):
+        """
+        Returns the principal variation as a list of Moves, starting with the best move
+        """
+        return self._pv
+
+    def get_nodes(self):
+        """
+        Returns the number of positions visited
+        """
+        return self._nodes
+
+    def get_depth(self):
+        """
+        Returns the depth of the last completed iteration
+        """
+        return self._depth
+
+    def get_time_ms(self):
+        """
+        Returns the time taken by the search in milliseconds
+        """
+        return self._time_ms
+
+    def get_nodes_per_second(self):
+        """
+        Returns the search speed in positions visited per second
+        """
+        if self._time_ms <= 0:
+            return 0
+        return self._nodes * 1000 / self._time_ms
+
+
+class Searcher:
+    """
+    Searches JanggiGame positions. A Searcher keeps its transposition table and move ordering history between
+    searches, so reusing one for the moves of a game lets each search start from what the last one learned. The game
+    being searched is changed with push and pop while searching and is left as it was found.
+    """
+    def __init__(self, table_size=TABLE_SIZE):
+        self._table = [None] * table_size
+        self._table_size = table_size
+        self._history = [0] * 10000
+        self._killers = [[0, 0] for _ in range(MAX_PLY)]
+        self._buffers = [jg.move_buffer() for _ in range(MAX_PLY)]
+        self._nodes = 0
+        self._deadline = None
+        self._root_moves = None
+        self._iterations = []
+
+    def search(self, game, max_depth=None, time_ms=None, root_moves=None):
+        """
+        Searches the game's current position one ply deeper at a time until max_depth plies have been completed or
+        time_ms milliseconds have passed, and returns a SearchResult. The time budget is a hard limit: a search in
+        progress is abandoned when it runs out and the result of the last completed iteration is returned. With
+        neither limit given, searches DEFAULT_DEPTH plies. If root_moves is given, only those move IDs are tried
+        from the current position, which is how a parallel search splits the root between processes.
+        """
+        start = time.perf_counter()
+        self._deadline = start + time_ms / 1000 if time_ms is not None else None
+        if max_depth is None:
+            max_depth = MAX_DEPTH if time_ms is not None else DEFAULT_DEPTH
+        max_depth = min(max_depth, MAX_DEPTH)
+        self._nodes = 0
+        self._root_moves = frozenset(root_moves) if root_moves is not None else None
+        self._iterations = []
+        for killers in self._killers:
+            killers[0] = killers[1] = 0
+
+        buffer = self._buffers[0]
+        count = game.generate_legal(buffer)
+        if game.get_game_state() != 'UNFINISHED' or count == 0:
+            return SearchResult(None, -MATE_SCORE if count == 0 else 0, [], 0, 0, 0)
+
+        if self._root_moves is not None:
+            self._root_moves = self._root_moves.intersection(buffer[:count])
+            if not self._root_moves:
+                return SearchResult(None, -INFINITY, [], 0, 0, 0)
+            # The root entry of the table was made by a search over only some of the moves, so it is not kept.
+            self._discard(game.position_key())
+
+        best_move = min(self._root_moves) if self._root_moves is not None else buffer[0]
+        score = 0
+        pv = [jg.Move.from_id(best_move)]
+        completed = 0
+        for depth in range(1, max_depth + 1):
+            try:
+                score = self._negamax(game, depth, -INFINITY, INFINITY, 0)
+            except SearchTimeout:
+                break
+            completed = depth
+            entry = self._probe(game.position_key())
+            if entry is not None and entry[3]:
+                best_move = entry[3]
+            pv = self._principal_variation(game, depth)
+            self._iterations.append((depth, best_move, score, [int(move) for move in pv]))
+            if abs(score) >= MATE_BOUND:
+                break
+            if self._deadline is not None and time.perf_counter() >= self._deadline:
+                break
+
+        if self._root_moves is not None:
+            self._discard(game.position_key())
+            self._root_moves = None
+        elapsed = (time.perf_counter() - start) * 1000
+        if not pv or pv[0] != best_move:
+            pv = [jg.Move.from_id(best_move)]
+        return SearchResult(jg.Move.from_id(best_move), score, pv, self._nodes, completed, elapsed)
+
+    def split_root(self, game, workers):
+        """
+        Returns the valid move IDs of the game's current position sorted best first and dealt out in turn into at most
+        workers lists, so that every list gets a share of the likely best moves.
+        """
+        buffer = self._buffers[0]
+        count = game.generate_legal(buffer)
+        moves = self._order_moves(game, buffer, count, 0, 0)
+        workers = min(workers, count)
+        return [moves[index::workers] for index in range(workers)]
+
+    def _probe(self, key):
+        """
+        Returns the (depth, score, flag, best move ID, key) table entry of a position key, or None if it is not stored
+        """
+        entry = self._table[key % self._table_size]
+        if entry is not None and entry[4] == key:
+            return entry
+        return None
+
+    def _discard(self, key):
+        """
+        Removes the table entry of a position key, if it is stored
+        """
+        if self._probe(key) is not None:
+            self._table[key % self._table_size] = None
+
+    def get_iterations(self):
+        """
+        Returns a list with one (depth, best move ID, score, principal variation move IDs) tuple for each iteration
+        the last search completed
+        """
+        return self._iterations
+
+    def _negamax(self, game, depth, alpha, beta, ply):
+        """
+        Returns the score of the position to the given depth within the alpha-beta window, from the point of view of
+        the side to move.
+        """
+        self._nodes += 1
+        if not self._nodes & TIME_CHECK_INTERVAL and self._deadline is not None and \
+                time.perf_counter() >= self._deadline:
+            raise SearchTimeout
+
+        key = game.position_key()
+        slot = key % self._table_size
+        entry = self._table[slot]
+        table_move = 0
+        if entry is not None and entry[4] == key:
+            table_move = entry[3]
+            if ply and entry[0] >= depth:
+                table_score = score_from_table(entry[1], ply)
+                if entry[2] == EXACT:
+                    return table_score
+                if entry[2] == LOWER:
+                    alpha = max(alpha, table_score)
+                else:
+                    beta = min(beta, table_score)
+                if alpha >= beta:
+                    return table_score
+
+        if depth <= 0 or ply >= MAX_PLY - 1:
+            return self._quiesce(game, alpha, beta, ply)
+
+        buffer = self._buffers[ply]
+        count = game.generate_legal(buffer)
+        if count == 0:
+            return -MATE_SCORE + ply
+
+        moves = self._order_moves(game, buffer, count, table_move, ply)
+        if not ply and self._root_moves is not None:
+            moves = [move for move in moves if move in self._root_moves]
+        original_alpha = alpha
+        best_score = -INFINITY
+        best_move = 0
+        squares = game.get_squares()
+        for move in moves:
+            quiet = not squares[jg.MOVE_SQUARES[move][1]] or move // 100 == move % 100
+            game.push(move)
+            try:
+                score = -self._negamax(game, depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                game.pop()
+            if score > best_score:
+                best_score = score
+                best_move = move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                if quiet:
+                    killers = self._killers[ply]
+                    if killers[0] != move:
+                        killers[1] = killers[0]
+                        killers[0] = move
+                    self._history[move] += depth * depth
+                break
+
+        if best_score <= original_alpha:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self._table[slot] = (depth, score_to_table(best_score, ply), flag, best_move, key)
+        return best_score
+
+    def _quiesce(self, game, alpha, beta, ply):
+        """
+        Searches captures only until the position is quiet, so the static evaluation is never taken in the middle of
+        an exchange.
+        """
+        self._nodes += 1
+        if not self._nodes & TIME_CHECK_INTERVAL and self._deadline is not None and \
+                time.perf_counter() >= self._deadline:
+            raise SearchTimeout
+
+        stand_pat = evaluate(game)
+        if stand_pat >= beta or ply >= MAX_PLY - 1:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+
+        buffer = self._buffers[ply]
+        count = game.generate_legal(buffer, captures_only=True)
+        squares = game.get_squares()
+        moves = sorted(buffer[:count], key=lambda move: capture_order(squares, move), reverse=True)
+        for move in moves:
+            game.push(move)
+            try:
+                score = -self._quiesce(game, -beta, -alpha, ply + 1)
+            finally:
+                game.pop()
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        return alpha
+
+    def _order_moves(self, game, buffer, count, table_move, ply):
+        """
+        Returns the moves in the buffer sorted best first: the transposition table move, then captures of the most
+        valuable pieces by the least valuable attackers, then killer moves, then quiet moves by history score.
+        """
+        squares = game.get_squares()
+        killers = self._killers[ply]
+        history = self._history
+        scored = []
+        for index in range(count):
+            move = buffer[index]
+            if move == table_move:
+                order = 1 << 30
+            elif squares[jg.MOVE_SQUARES[move][1]] and move // 100 != move % 100:
+                order = (1 << 28) + capture_order(squares, move)
+            elif move == killers[0]:
+                order = 1 << 27
+            elif move == killers[1]:
+                order = (1 << 27) - 1
+            else:
+                order = history[move]
+            scored.append((order, move))
+        scored.sort(reverse=True)
+        return [move for order, move in scored]
+
+    def _principal_variation(self, game, depth):
+        """
+        Follows the best moves stored in the transposition table from the current position and returns them as a
+        list of Moves. Each move is checked to be valid before it is followed.
+        """
+        pv = []
+        buffer = jg.move_buffer()
+        for _ in range(depth):
+            entry = self._probe(game.position_key())
+            if entry is None or not entry[3]:
+                break
+            count = game.generate_legal(buffer)
+            if entry[3] not in buffer[:count]:
+                break
+            pv.append(jg.Move.from_id(entry[3]))
+            game.push(entry[3])
+        for _ in pv:
+            game.pop()
+        return pv
+
+
+def capture_order(squares, move):
+    """
+    Returns a sort key for a capture which puts the most valuable victims first and, among those, the least valuable
+    attackers first.
+    """
+    orig, dest = jg.MOVE_SQUARES[move]
+    return CAPTURE_VALUES[squares[dest]] * 16 - CAPTURE_VALUES[squares[orig]] // 100
+
+
+def score_to_table(score, ply):
+    """
+    Converts a mate score to be relative to the node being stored rather than the root, so it stays correct when
+    the entry is found again at a different ply.
+    """
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def score_from_table(score, ply):
+    """
+    Converts a mate score read from the transposition table back to be relative to the root.
+    """
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+    return score
+
+
+def search(game, max_depth=None, time_ms=None, workers=1):
+    """
+    Picks a move for the side to move in a JanggiGame. Searches up to max_depth plies, or for at most time_ms
+    milliseconds, and returns a SearchResult with the best move, score, principal variation, and node count. With
+    workers greater than one, the root moves are dealt out between that many processes, each searching its share
+    with its own Searcher, and the best of their answers at the deepest depth all of them completed is returned. A
+    worker which runs out of time before completing one ply is left out, and its moves are not considered. The time
+    taken to start the workers comes out of time_ms, and RESULT_ALLOWANCE_MS of it is kept back for collecting
+    their results.
+    """
+    if workers <= 1:
+        return Searcher().search(game, max_depth, time_ms)
+
+    start = time.perf_counter()
+    buffer = jg.move_buffer()
+    count = game.generate_legal(buffer)
+    if game.get_game_state() != 'UNFINISHED' or count < 2:
+        return Searcher().search(game, max_depth, time_ms)
+
+    # Move ordering does not use the transposition table, so the Searcher which splits the root needs only one slot.
+    shares = Searcher(table_size=1).split_root(game, workers)
+    workers = len(shares)
+    data = game.to_bytes()
+    # The workers share one wall clock deadline, so the time taken to start them comes out of their budget, and time
+    # is kept back for collecting their results.
+    deadline = time.time() + (time_ms - RESULT_ALLOWANCE_MS) / 1000 if time_ms is not None else None
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(search_task, [data] * workers, shares, [max_depth] * workers, [deadline] * workers))
+
+    return merge_results(results, shares[0][0], (time.perf_counter() - start) * 1000)
+
+
+def merge_results(results, fallback, time_ms):
+    """
+    Combines the (iterations, nodes) pairs returned by search_task for each share of the root moves into one
+    SearchResult. Shares whose worker did not complete a ply are left out, and the fallback move ID is returned
+    with a score of 0 only if no worker completed one.
+    """
+    nodes = sum(result[1] for result in results)
+    finished = [iterations for iterations, share_nodes in results if iterations]
+    if not finished:
+        return SearchResult(jg.Move.from_id(fallback), 0, [jg.Move.from_id(fallback)], nodes, 0, time_ms)
+
+    # A worker that stopped early on a mate score has its answer for every deeper iteration too.
+    depth = min(MAX_DEPTH if abs(iterations[-1][2]) >= MATE_BOUND else iterations[-1][0] for iterations in finished)
+    best = None
+    for iterations in finished:
+        entry = [iteration for iteration in iterations if iteration[0] <= depth][-1]
+        if best is None or entry[2] > best[2]:
+            best = entry
+    pv = [jg.Move.from_id(move) for move in best[3]] or [jg.Move.from_id(best[1])]
+    depth = min(depth, max(iterations[-1][0] for iterations in finished))
+    return SearchResult(jg.Move.from_id(best[1]), best[2], pv, nodes, depth, time_ms)
+
+
+def search_task(data, moves, max_depth, deadline):
+    """
+    Worker process entry point for a parallel search: rebuilds the position from its to_bytes form, searches only
+    the given root moves until the time.time() deadline, if there is one, and returns the list of completed
+    iterations along with the number of nodes visited.
+    """
+    game = jg.JanggiGame.from_bytes(data, jg.MoveCache(0))
+    searcher = Searcher()
+    time_ms = max((deadline - time.time()) * 1000, 0) if deadline is not None else None
+    result = searcher.search(game, max_depth, time_ms, moves)
+    return searcher.get_iterations(), result.get_nodes()
+
+
+if __name__ == '__main__':
+    result = search(jg.JanggiGame(), time_ms=5000)
+    print('best move:', result.get_best_move(), 'score:', result.get_score(), 'depth:', result.get_depth())
+    print('pv:', result.get_pv())
+    print('nodes:', result.get_nodes(), 'nodes/sec:', int(result.get_nodes_per_second()))
@@ -0,0 +1,389 @@
+# Author: Bryan Zierk
+# Date: 10/18/26
+# Description: Headless game server for JanggiGame. An asyncio server hosts any number of games keyed by game id and
+# speaks a line delimited JSON protocol over TCP or a Unix socket: every request is one JSON object on one line with
+# an "op" of create, move, legal_moves, state, undo, or delete, and gets back one JSON object on one line. Move
+# checking and generation run on a thread pool, one request at a time per game, so the event loop keeps serving
+# other connections. A load generator client plays random games against a server and reports move latency
+# percentiles and moves per second.
+
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import JanggiGame as jg
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = 4
+GAME_CACHE_SIZE = 16
+LINE_LIMIT = 1 << 20
+
+# Requests may carry an "id", which is copied into the response so a client can match answers to questions. Squares
+# are written as in make_move, column letter then row number, for example "c10".
+OPERATIONS = ('create', 'move', 'legal_moves', 'state', 'undo', 'delete')
+
+
+class RequestError(Exception):
+    """
+    Raised while handling a request which cannot be answered. The message is sent back to the client.
+    """
+    pass
+
+
+def square_name(square):
+    """
+    Returns the name of a square, such as 'c10', from its index row * 9 + col
+    """
+    row, col = divmod(square, 9)
+    return chr(ord('a') + col) + str(row + 1)
+
+
+def game_state(game):
+    """
+    Returns a dictionary describing a game for a response: the side to move, the game state, whether the side to
+    move is in check, and the position in the text notation.
+    """
+    turn = game.active_turn()
+    return {'turn': turn, 'game_state': game.get_game_state(), 'in_check': game.is_in_check(turn),
+            'position': game.to_text()}
+
+
+def legal_move_names(game):
+    """
+    Returns the valid moves of the side to move as a sorted list of [origin, destination] square name pairs
+    """
+    moves = game.get_valid_moves(game.active_turn())
+    return sorted([square_name(orig), square_name(dest)] for orig, dest in (jg.MOVE_SQUARES[move] for move in moves))
+
+
+def play_move(game, orig, dest):
+    """
+    Plays a move on a game with make_move and returns the response fields: whether the move was valid and the state
+    after it. Raises RequestError if a square is not written as a column letter and row number.
+    """
+    try:
+        valid = game.make_move(orig, dest)
+    except (ValueError, IndexError):
+        raise RequestError('squares must be a column a-i and a row 1-10, got %r and %r' % (orig, dest))
+    return {'valid': valid, 'state': game_state(game)}
+
+
+def undo_move(game):
+    """
+    Takes back the last move of a game and returns the response fields: whether a move was taken back and the state.
+    """
+    return {'undone': game.undo_move(), 'state': game_state(game)}
+
+
+class GameServer:
+    """
+    Hosts games keyed by game id and answers protocol requests about them. Work on a game is done in the executor,
+    a thread pool of DEFAULT_WORKERS threads unless one is given, and a lock per game keeps the requests for one game
+    in the order they arrived.
+    """
+    def __init__(self, executor=None):
+        self._executor = executor if executor is not None else ThreadPoolExecutor(DEFAULT_WORKERS)
+        self._games = {}
+        self._locks = {}
+        self._ids = itertools.count(1)
+        self._requests = 0
+
+    def get_game_count(self):
+        """
+        Returns the number of games being hosted
+        """
+        return len(self._games)
+
+    def get_request_count(self):
+        """
+        Returns the number of requests answered
+        """
+        return self._requests
+
+    async def handle_request(self, request):
+        """
+        Answers one request, given as a dictionary decoded from JSON, and returns the response dictionary. The
+        response has "ok" set to True and the fields for the operation, or "ok" set to False and an "error" message.
+        Any other exception raised while answering is also reported as an error, so one bad request cannot end the
+        client's connection.
+        """
+        self._requests += 1
+        response = {'id': request.get('id')} if isinstance(request, dict) and 'id' in request else {}
+        try:
+            response.update(await self._dispatch(request))
+            response['ok'] = True
+        except RequestError as error:
+            response['ok'] = False
+            response['error'] = str(error)
+        except Exception as error:
+            response['ok'] = False
+            response['error'] = 'request failed: %s' % type(error).__name__
+        return response
+
+    async def _dispatch(self, request):
+        """
+        Checks a request and runs its operation, returning the response fields. Raises RequestError if the request
+        is malformed or names a game which does not exist.
+        """
+        if not isinstance(request, dict):
+            raise RequestError('a request must be a JSON object')
+        op = request.get('op')
+        if op not in OPERATIONS:
+            raise RequestError('unknown op %r, expected one of %s' % (op, ', '.join(OPERATIONS)))
+        if op == 'create':
+            game_id = str(next(self._ids))
+            self._games[game_id] = jg.JanggiGame(jg.MoveCache(GAME_CACHE_SIZE))
+            self._locks[game_id] = asyncio.Lock()
+            return {'game': game_id, 'state': game_state(self._games[game_id])}
+
+        game_id = request.get('game')
+        if not isinstance(game_id, str):
+            raise RequestError('"game" must be a game id string')
+        game = self._games.get(game_id)
+        if game is None:
+            raise RequestError('no game with id %r' % (game_id,))
+        if op == 'delete':
+            # Waiting for the lock lets a move or undo already running on the game finish first.
+            async with self._locks[game_id]:
+                if self._games.get(game_id) is not game:
+                    raise RequestError('no game with id %r' % (game_id,))
+                del self._games[game_id]
+                del self._locks[game_id]
+            return {'game': game_id}
+        if op == 'move':
+            orig = request.get('orig')
+            dest = request.get('dest')
+            if not isinstance(orig, str) or not isinstance(dest, str):
+                raise RequestError('a move needs "orig" and "dest" squares')
+            return await self._run(game_id, play_move, game, orig, dest)
+        if op == 'legal_moves':
+            return {'moves': await self._run(game_id, legal_move_names, game)}
+        if op == 'undo':
+            return await self._run(game_id, undo_move, game)
+        return {'state': await self._run(game_id, game_state, game)}
+
+    async def _run(self, game_id, function, game, *args):
+        """
+        Runs function(game, *args) in the executor while holding the game's lock and returns its result. Raises
+        RequestError if the game was deleted while waiting for the lock.
+        """
+        async with self._locks[game_id]:
+            if self._games.get(game_id) is not game:
+                raise RequestError('no game with id %r' % (game_id,))
+            return await asyncio.get_running_loop().run_in_executor(self._executor, function, game, *args)
+
+    async def handle_connection(self, reader, writer):
+        """
+        Serves one client connection, answering each request line in turn until the client disconnects.
+        """
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    response = {'ok': False, 'error': 'request is not valid JSON'}
+                except RecursionError:
+                    response = {'ok': False, 'error': 'request is nested too deeply'}
+                else:
+                    response = await self.handle_request(request)
+                try:
+                    data = json.dumps(response, separators=(',', ':'))
+                except (ValueError, RecursionError):
+                    data = json.dumps({'ok': False, 'error': 'response could not be encoded'})
+                writer.write(data.encode() + b'\n')
+                await writer.drain()
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT, path=None):
+        """
+        Starts listening on a Unix socket at path, or on host and port if path is None, and returns the
+        asyncio.Server. Port 0 picks a free port.
+        """
+        if path is not None:
+            return await asyncio.start_unix_server(self.handle_connection, path, limit=LINE_LIMIT)
+        return await asyncio.start_server(self.handle_connection, host, port, limit=LINE_LIMIT)
+
+    def close(self):
+        """
+        Shuts down the executor once the work already handed to it is done.
+        """
+        self._executor.shutdown()
+
+
+class Client:
+    """
+    A connection to a GameServer which sends one request at a time and waits for its response.
+    """
+    def __init__(self, reader, writer):
+        self._reader = reader
+        self._writer = writer
+
+    @classmethod
+    async def connect(cls, host=DEFAULT_HOST, port=DEFAULT_PORT, path=None):
+        """
+        Opens a connection to a server on a Unix socket at path, or on host and port if path is None.
+        """
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path, limit=LINE_LIMIT)
+        else:
+            reader, writer = await asyncio.open_connection(host, port, limit=LINE_LIMIT)
+        return cls(reader, writer)
+
+    async def request(self, op, **fields):
+        """
+        Sends a request with the given op and fields and returns the response dictionary. Raises ConnectionError if
+        the server closes the connection.
+        """
+        fields['op'] = op
+        self._writer.write(json.dumps(fields, separators=(',', ':')).encode() + b'\n')
+        await self._writer.drain()
+        line = await self._reader.readline()
+        if not line:
+            raise ConnectionError('the server closed the connection')
+        return json.loads(line)
+
+    async def close(self):
+        """
+        Closes the connection.
+        """
+        self._writer.close()
+        await self._writer.wait_closed()
+
+
+def percentile(values, fraction):
+    """
+    Returns the value at the given fraction, from 0 to 1, of a sorted list by the nearest rank method
+    """
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, math.ceil(fraction * len(values)) - 1))]
+
+
+async def play_random_game(client, rng, max_moves, latencies):
+    """
+    Plays one game on a server with random valid moves, other than passes when anything else is possible, until
+    it ends or max_moves moves have been made, appending the round trip time of each move request in milliseconds to
+    latencies. The game is deleted from the server afterwards.
+    """
+    game_id = (await client.request('create'))['game']
+    for _ in range(max_moves):
+        moves = (await client.request('legal_moves', game=game_id))['moves']
+        real_moves = [move for move in moves if move[0] != move[1]]
+        if not moves:
+            break
+        orig, dest = rng.choice(real_moves or moves)
+        start = time.perf_counter()
+        response = await client.request('move', game=game_id, orig=orig, dest=dest)
+        latencies.append((time.perf_counter() - start) * 1000)
+        if response['state']['game_state'] != 'UNFINISHED':
+            break
+    await client.request('delete', game=game_id)
+
+
+async def run_load(games, concurrency, host=DEFAULT_HOST, port=DEFAULT_PORT, path=None, max_moves=60, seed=0):
+    """
+    Plays games random games against a server from concurrency connections at once, each playing its share of the
+    games one after another. Returns a dictionary with the number of games and moves, the time taken in seconds,
+    moves per second, and the 50th and 99th percentile move latency in milliseconds.
+    """
+    latencies = []
+    start = time.perf_counter()
+
+    async def worker(index):
+        client = await Client.connect(host, port, path)
+        rng = random.Random(seed * 1000003 + index)
+        try:
+            for _ in range(index, games, concurrency):
+                await play_random_game(client, rng, max_moves, latencies)
+        finally:
+            await client.close()
+
+    await asyncio.gather(*(worker(index) for index in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {'games': games, 'moves': len(latencies), 'time': elapsed,
+            'moves_per_second': len(latencies) / elapsed if elapsed else 0,
+            'p50_ms': percentile(latencies, 0.5), 'p99_ms': percentile(latencies, 0.99)}
+
+
+async def serve(host, port, path, workers):
+    """
+    Runs a server until it is cancelled.
+    """
+    server = GameServer(ThreadPoolExecutor(workers))
+    listener = await server.start(host, port, path)
+    print('serving on %s' % (path or '%s:%d' % (host, port)))
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        server.close()
+
+
+async def load_locally(args):
+    """
+    Starts a server in this process on a free port, runs the load generator against it, and returns the totals.
+    """
+    server = GameServer(ThreadPoolExecutor(args.workers))
+    listener = await server.start(args.host, 0)
+    port = listener.sockets[0].getsockname()[1]
+    try:
+        return await run_load(args.games, args.concurrency, args.host, port, None, args.max_moves, args.seed)
+    finally:
+        listener.close()
+        await listener.wait_closed()
+        server.close()
+
+
+def main(argv=None):
+    """
+    Command line entry point. "serve" runs a server; "load" plays random games against a running server, or against
+    one started in the same process with --local, and prints moves per second and move latency percentiles.
+    """
+    parser = argparse.ArgumentParser(description='Headless Janggi game server and load generator')
+    parser.add_argument('mode', choices=('serve', 'load'), help='run a server, or a load generator against one')
+    parser.add_argument('--host', default=DEFAULT_HOST, help='host to listen on or connect to (default %s)'
+                        % DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='TCP port (default %d)' % DEFAULT_PORT)
+    parser.add_argument('--unix', default=None, help='Unix socket path to use instead of TCP')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='threads for game work (default %d)'
+                        % DEFAULT_WORKERS)
+    parser.add_argument('--games', type=int, default=100, help='games for the load generator to play (default 100)')
+    parser.add_argument('--concurrency', type=int, default=10, help='connections playing at once (default 10)')
+    parser.add_argument('--max-moves', type=int, default=60, help='moves per load generator game (default 60)')
+    parser.add_argument('--seed', type=int, default=0, help='load generator random seed (default 0)')
+    parser.add_argument('--local', action='store_true', help='start a server in this process for the load generator')
+    args = parser.parse_args(argv)
+
+    if args.mode == 'serve':
+        try:
+            asyncio.run(serve(args.host, args.port, args.unix, args.workers))
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    if args.local:
+        totals = asyncio.run(load_locally(args))
+    else:
+        totals = asyncio.run(run_load(args.games, args.concurrency, args.host, args.port, args.unix, args.max_moves,
+                                      args.seed))
+    print('games %d  moves %d  time %.3fs  moves/sec %.0f  p50 %.2fms  p99 %.2fms'
+          % (totals['games'], totals['moves'], totals['time'], totals['moves_per_second'], totals['p50_ms'],
+             totals['p99_ms']))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,227 @@
+# Author: Bryan Zierk
+# Date: 10/18/26
+# Description: Headless self-play for JanggiGame. Plays many games between pluggable move choosers (random, greedy
+# capture, alpha-beta search to a fixed depth, or Monte Carlo tree search) across a pool of processes, streams one
+# JSON line per finished game, and reports the overall throughput in games per second. Nothing here imports pygame,
+# so it runs on machines with no display.
+
+import argparse
+import json
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import JanggiGame as jg
+import JanggiMCTS
+import JanggiSearch
+
+DEFAULT_MAX_MOVES = 300
+REPETITION_LIMIT = 3
+
+
+def random_chooser(game, buffer, count, rng):
+    """
+    Chooses any valid move, including the pass, with equal chance.
+    """
+    return buffer[rng.randrange(count)]
+
+
+def greedy_chooser(game, buffer, count, rng):
+    """
+    Chooses the capture of the most valuable piece, breaking ties at random, or a random move other than a pass if
+    nothing can be captured.
+    """
+    squares = game.get_squares()
+    best_value = 0
+    best = []
+    quiet = []
+    for index in range(count):
+        move = buffer[index]
+        orig, dest = jg.MOVE_SQUARES[move]
+        if orig == dest:
+            continue
+        value = JanggiSearch.CAPTURE_VALUES[squares[dest]]
+        if value > best_value:
+            best_value = value
+            best = [move]
+        elif value and value == best_value:
+            best.append(move)
+        elif not value:
+            quiet.append(move)
+    if best:
+        return rng.choice(best)
+    if quiet:
+        return rng.choice(quiet)
+    return buffer[0]
+
+
+class SearchChooser:
+    """
+    Chooses moves with an alpha-beta search to a fixed depth. The Searcher is kept for the whole game so each search
+    starts from what the previous one learned.
+    """
+    def __init__(self, depth):
+        self._depth = depth
+        self._searcher = JanggiSearch.Searcher()
+
+    def __call__(self, game, buffer, count, rng):
+        """
+        Returns the move ID of the best move the search finds
+        """
+        return int(self._searcher.search(game, self._depth).get_best_move())
+
+
+class MCTSChooser:
+    """
+    Chooses moves with a fixed number of Monte Carlo tree search playouts. The MCTS is kept for the whole game so
+    each search reuses the tree left by the one before, and it draws its random numbers from the game's generator.
+    """
+    def __init__(self, playouts):
+        self._playouts = playouts
+        self._mcts = None
+
+    def __call__(self, game, buffer, count, rng):
+        """
+        Returns the move ID of the most visited move
+        """
+        if self._mcts is None:
+            self._mcts = JanggiMCTS.MCTS(rng=rng)
+        return int(self._mcts.search(game, self._playouts).get_best_move())
+
+
+def make_chooser(spec):
+    """
+    Returns a move chooser from its name: 'random', 'greedy', 'search:DEPTH', or 'mcts:PLAYOUTS'. Raises ValueError
+    for anything else. A chooser is called with the game, a buffer holding its valid move IDs, how many there are,
+    and a random.Random, and returns the move ID to play.
+    """
+    if spec == 'random':
+        return random_chooser
+    if spec == 'greedy':
+        return greedy_chooser
+    if spec.startswith('search:') and spec[7:].isdigit() and int(spec[7:]) > 0:
+        return SearchChooser(int(spec[7:]))
+    if spec.startswith('mcts:') and spec[5:].isdigit() and int(spec[5:]) > 0:
+        return MCTSChooser(int(spec[5:]))
+    raise ValueError("unknown move chooser %r, expected 'random', 'greedy', 'search:DEPTH' or 'mcts:PLAYOUTS'" % spec)
+
+
+def play_game(blue, red, seed=0, max_moves=DEFAULT_MAX_MOVES):
+    """
+    Plays one game from the opening between the choosers named blue and red and returns a dictionary describing it:
+    the winner ('blue', 'red', or None for a draw), the number of moves played, why the game ended ('checkmate',
+    'repetition', 'passes', or 'move limit'), and the time taken in milliseconds. Games with the same seed and choosers
+    are played the same way.
+    """
+    start = time.perf_counter()
+    rng = random.Random(seed)
+    choosers = {'blue': make_chooser(blue), 'red': make_chooser(red)}
+    game = jg.JanggiGame(jg.MoveCache(0))
+    buffer = jg.move_buffer()
+    seen = {game.position_key(): 1}
+    passes = 0
+    winner = None
+    reason = 'move limit'
+    length = 0
+    while length < max_moves:
+        turn = game.active_turn()
+        count = game.generate_legal(buffer)
+        if count == 0:
+            winner = 'red' if turn == 'blue' else 'blue'
+            game.set_game_state(winner.upper() + '_WON')
+            reason = 'checkmate'
+            break
+        move = choosers[turn](game, buffer, count, rng)
+        game.push(move)
+        length += 1
+        passes = passes + 1 if move // 100 == move % 100 else 0
+        if passes == 2:
+            reason = 'passes'
+            break
+        key = game.position_key()
+        seen[key] = seen.get(key, 0) + 1
+        if seen[key] >= REPETITION_LIMIT:
+            reason = 'repetition'
+            break
+    return {'seed': seed, 'blue': blue, 'red': red, 'winner': winner, 'length': length, 'reason': reason,
+            'time_ms': round((time.perf_counter() - start) * 1000, 3)}
+
+
+def play_task(blue, red, seed, max_moves):
+    """
+    Worker process entry point: plays one game and returns its result dictionary.
+    """
+    return play_game(blue, red, seed, max_moves)
+
+
+def run_games(games, blue, red, workers=1, seed=0, max_moves=DEFAULT_MAX_MOVES, output=None):
+    """
+    Plays the given number of games, numbering their seeds from seed, in a pool of worker processes (or in this
+    process when workers is one). Each result is written to output as a JSON line as soon as it arrives, if an
+    output file is given. Returns a dictionary of totals: games played, wins for each side, draws, moves, time in
+    seconds, and games and moves per second.
+    """
+    # Both choosers are built once here so a bad name fails before any worker starts.
+    make_chooser(blue)
+    make_chooser(red)
+    start = time.perf_counter()
+    totals = {'games': 0, 'blue_wins': 0, 'red_wins': 0, 'draws': 0, 'moves': 0}
+    seeds = range(seed, seed + games)
+    if workers > 1:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        results = pool.map(play_task, [blue] * games, [red] * games, seeds, [max_moves] * games,
+                           chunksize=max(1, games // (workers * 8)))
+    else:
+        pool = None
+        results = (play_game(blue, red, game_seed, max_moves) for game_seed in seeds)
+    try:
+        for result in results:
+            totals['games'] += 1
+            totals['moves'] += result['length']
+            if result['winner'] is None:
+                totals['draws'] += 1
+            else:
+                totals[result['winner'] + '_wins'] += 1
+            if output is not None:
+                output.write(json.dumps(result) + '\n')
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    elapsed = time.perf_counter() - start
+    totals['time'] = elapsed
+    totals['games_per_second'] = totals['games'] / elapsed if elapsed else 0
+    totals['moves_per_second'] = totals['moves'] / elapsed if elapsed else 0
+    return totals
+
+
+def main(argv=None):
+    """
+    Command line entry point. Plays the requested games, writing one JSON line per game to the output file or to
+    standard output, and prints the totals and throughput to standard error.
+    """
+    parser = argparse.ArgumentParser(description='Headless Janggi self-play')
+    parser.add_argument('games', type=int, nargs='?', default=100, help='number of games to play (default 100)')
+    parser.add_argument('--blue', default='random', help="Blue's move chooser: random, greedy, search:DEPTH or "
+                        "mcts:PLAYOUTS")
+    parser.add_argument('--red', default='random', help="Red's move chooser: random, greedy, search:DEPTH or "
+                        "mcts:PLAYOUTS")
+    parser.add_argument('--workers', type=int, default=1, help='number of worker processes (default 1)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first game (default 0)')
+    parser.add_argument('--max-moves', type=int, default=DEFAULT_MAX_MOVES, help='moves before a game is drawn')
+    parser.add_argument('--output', help='file to write the per-game JSON lines to (default standard output)')
+    args = parser.parse_args(argv)
+
+    output = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        totals = run_games(args.games, args.blue, args.red, args.workers, args.seed, args.max_moves, output)
+    finally:
+        if args.output:
+            output.close()
+    print('games %d  blue wins %d  red wins %d  draws %d  moves %d  time %.3fs  games/sec %.1f  moves/sec %.0f'
+          % (totals['games'], totals['blue_wins'], totals['red_wins'], totals['draws'], totals['moves'],
+             totals['time'], totals['games_per_second'], totals['moves_per_second']), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
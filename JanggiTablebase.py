@@ -0,0 +1,491 @@
+# Author: Bryan Zierk
+# Date: 10/18/26
+# Description: Endgame tablebases for JanggiGame. For a material signature such as KR-KA (Blue has a General and a
+# Chariot, Red a General and a Guard), every placement of those pieces is given a number by a perfect index, the valid
+# moves of every placement are generated across a pool of processes, and a retrograde analysis works back from the
+# checkmates to find whether each position is won, lost, or drawn for the side to move, and in how many moves. The
+# results are written to one small file per signature and probing a position is a single array lookup.
+
+import argparse
+import os
+import struct
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+import JanggiGame as jg
+
+# A signature lists Blue's pieces, a dash, then Red's, using the letters of the text notation in this order. Each side
+# has exactly one General. Captures lead to smaller signatures, so a table is built after the tables it captures into.
+SIGNATURE_ORDER = 'KABNRCP'
+LETTER_TYPES = {letter.upper(): piece_type for piece_type, letter in jg.PIECE_LETTERS.items()}
+
+# Each position is stored as a signed short: 0 for a draw, n for a win in n moves (counting both sides' moves), and
+# -n - 1 for a loss in n moves, so a side which is checkmated now is -1. INVALID marks indexes which are not a legal
+# position: two pieces on one point, or the side which just moved left in check.
+DRAW = 0
+INVALID = -32768
+
+MAGIC = b'JGTB'
+VERSION = 1
+HEADER_STRUCT = struct.Struct('<4sH16sI')
+
+POSITIONS_PER_TASK = 4096
+
+
+def normalize_signature(signature):
+    """
+    Returns a signature with each side's pieces in the standard order, so 'KRA-KA' becomes 'KAR-KA'. Raises
+    ValueError if it is not a valid signature.
+    """
+    sides = signature.upper().split('-')
+    if len(sides) != 2:
+        raise ValueError('a signature is two sides separated by a dash: %r' % signature)
+    for side in sides:
+        if side.count('K') != 1 or any(letter not in LETTER_TYPES for letter in side):
+            raise ValueError('each side needs one General and only the letters %s: %r' % (SIGNATURE_ORDER,
+                                                                                         signature))
+    return '-'.join(''.join(sorted(side, key=SIGNATURE_ORDER.index)) for side in sides)
+
+
+def game_signature(game):
+    """
+    Returns the material signature of a game's current position.
+    """
+    squares = game.get_squares()
+    sides = []
+    for color in ('blue', 'red'):
+        letters = [jg.PIECE_LETTERS[squares[square] & jg.TYPE_MASK].upper() for square in game.get_piece_squares(color)]
+        sides.append(''.join(sorted(letters, key=SIGNATURE_ORDER.index)))
+    return '-'.join(sides)
+
+
+def piece_domain(code):
+    """
+    Returns the squares a piece code can ever stand on: the own palace for Generals and Guards, the rows a Soldier can
+    still reach without moving backward, and the whole board for everything else.
+    """
+    color = code & jg.COLOR_MASK
+    piece_type = code & jg.TYPE_MASK
+    if piece_type in (jg.GENERAL, jg.GUARD):
+        return tuple(square for square in range(90) if jg.in_own_palace(square // 9, square % 9, color))
+    if piece_type == jg.SOLDIER:
+        rows = range(0, 7) if color == jg.BLUE else range(3, 10)
+        return tuple(square for square in range(90) if square // 9 in rows)
+    return tuple(range(90))
+
+
+class Layout:
+    """
+    The perfect index of a signature. Each piece has a slot holding its position in its list of possible squares,
+    the slots are combined as the digits of a mixed radix number, and the lowest bit of the index is the side to move.
+    The piece with the most possible squares is only indexed on columns a to e; a position with it on the right is
+    looked up as its mirror image, which has the same value since the rules are symmetric. The middle column is its own
+    mirror and is kept whole, so a table is 5/9 of the unmirrored size rather than half.
+    """
+    def __init__(self, signature):
+        self._signature = normalize_signature(signature)
+        blue, red = self._signature.split('-')
+        self._codes = tuple([jg.BLUE | LETTER_TYPES[letter] for letter in blue] +
+                            [jg.RED | LETTER_TYPES[letter] for letter in red])
+        domains = [piece_domain(code) for code in self._codes]
+        sizes = [len(domain) for domain in domains]
+        self._mirror_slot = sizes.index(max(sizes))
+        domains[self._mirror_slot] = tuple(square for square in domains[self._mirror_slot] if square % 9 <= 4)
+        self._domains = tuple(domains)
+        self._domain_index = tuple(tuple(domain.index(square) if square in domain else -1 for square in range(90))
+                                   for domain in domains)
+        self._sizes = tuple(len(domain) for domain in domains)
+        self._size = 2
+        for size in self._sizes:
+            self._size *= size
+
+    def get_signature(self):
+        """
+        Returns the normalized signature
+        """
+        return self._signature
+
+    def get_codes(self):
+        """
+        Returns the piece code held in each slot
+        """
+        return self._codes
+
+    def get_size(self):
+        """
+        Returns the number of indexes, including those which are not valid positions
+        """
+        return self._size
+
+    def sub_signatures(self):
+        """
+        Returns the signatures reached by capturing one piece other than a General, without repeats
+        """
+        blue, red = self._signature.split('-')
+        subs = []
+        for side, other, flip in ((blue, red, False), (red, blue, True)):
+            for letter in sorted(set(side) - {'K'}, key=SIGNATURE_ORDER.index):
+                smaller = side.replace(letter, '', 1)
+                subs.append('%s-%s' % ((other, smaller) if flip else (smaller, other)))
+        return subs
+
+    def index(self, squares, red_to_move):
+        """
+        Returns the index of the position with the piece of each slot on the given square, or None if a piece is
+        somewhere it can never be.
+        """
+        if squares[self._mirror_slot] % 9 > 4:
+            squares = [square - square % 9 + 8 - square % 9 for square in squares]
+        index = 0
+        for slot, square in enumerate(squares):
+            position = self._domain_index[slot][square]
+            if position < 0:
+                return None
+            index = index * self._sizes[slot] + position
+        return index * 2 + red_to_move
+
+    def decode(self, index):
+        """
+        Returns the (squares, red_to_move) pair of an index, the inverse of index.
+        """
+        red_to_move = index & 1
+        index >>= 1
+        squares = [0] * len(self._sizes)
+        for slot in range(len(self._sizes) - 1, -1, -1):
+            index, position = divmod(index, self._sizes[slot])
+            squares[slot] = self._domains[slot][position]
+        return squares, red_to_move
+
+    def game_index(self, game):
+        """
+        Returns the index of a game's current position, or None if its material is not this signature.
+        """
+        squares = game.get_squares()
+        by_code = {}
+        for color in ('blue', 'red'):
+            for square in game.get_piece_squares(color):
+                by_code.setdefault(squares[square], []).append(square)
+        if sum(len(found) for found in by_code.values()) != len(self._codes):
+            return None
+        for found in by_code.values():
+            found.sort(reverse=True)
+        placed = []
+        for code in self._codes:
+            found = by_code.get(code)
+            if not found:
+                return None
+            placed.append(found.pop())
+        return self.index(placed, game.active_turn() == 'red')
+
+
+LAYOUTS = {}
+
+
+def get_layout(signature):
+    """
+    Returns the Layout of a signature, building it the first time it is asked for.
+    """
+    signature = normalize_signature(signature)
+    layout = LAYOUTS.get(signature)
+    if layout is None:
+        layout = LAYOUTS[signature] = Layout(signature)
+    return layout
+
+
+def successors_task(signature, start, end):
+    """
+    Worker process entry point: generates the valid moves of the indexes from start to end. Returns a list with None
+    for each index which is not a valid position, and otherwise a pair of lists: the indexes reached by moves which
+    capture nothing, and the (signature, index) pairs reached by captures.
+    """
+    layout = get_layout(signature)
+    codes = layout.get_codes()
+    move_cache = jg.MoveCache(0)
+    buffer = jg.move_buffer()
+    results = []
+    for index in range(start, end):
+        squares, red_to_move = layout.decode(index)
+        board = bytearray(91)
+        for slot, square in enumerate(squares):
+            if board[square]:
+                break
+            board[square] = codes[slot]
+        else:
+            board[90] = jg.RED if red_to_move else jg.BLUE
+            game = jg.JanggiGame.from_bytes(board, move_cache)
+            if not game.is_in_check('blue' if red_to_move else 'red'):
+                results.append(piece_successors(layout, game, squares, red_to_move, buffer))
+                continue
+        results.append(None)
+    return results
+
+
+def piece_successors(layout, game, squares, red_to_move, buffer):
+    """
+    Returns the (quiet, captures) successor lists of one valid position, as described at successors_task.
+    """
+    quiet = []
+    captures = []
+    for move_number in range(game.generate_legal(buffer)):
+        orig, dest = jg.MOVE_SQUARES[buffer[move_number]]
+        moved = list(squares)
+        moved[squares.index(orig)] = dest
+        if orig != dest and dest in squares:
+            captured = squares.index(dest)
+            del moved[captured]
+            sub = get_layout(sub_signature(layout, captured))
+            captures.append((sub.get_signature(), sub.index(moved, not red_to_move)))
+        else:
+            quiet.append(layout.index(moved, not red_to_move))
+    return quiet, captures
+
+
+def sub_signature(layout, captured):
+    """
+    Returns the signature left when the piece in the given slot is captured.
+    """
+    blue, red = layout.get_signature().split('-')
+    if captured < len(blue):
+        return '%s-%s' % (blue[:captured] + blue[captured + 1:], red)
+    captured -= len(blue)
+    return '%s-%s' % (blue, red[:captured] + red[captured + 1:])
+
+
+class Tablebase:
+    """
+    The win, loss, or draw value and distance of every position of one signature.
+    """
+    def __init__(self, signature, values):
+        self._layout = get_layout(signature)
+        if len(values) != self._layout.get_size():
+            raise ValueError('%s needs %d values, got %d' % (signature, self._layout.get_size(), len(values)))
+        self._values = values
+
+    def get_signature(self):
+        """
+        Returns the signature the table covers
+        """
+        return self._layout.get_signature()
+
+    def get_value(self, index):
+        """
+        Returns the stored value of an index, encoded as described at DRAW
+        """
+        return self._values[index]
+
+    def probe(self, game):
+        """
+        Returns the value of a game's current position for the side to move as an (outcome, moves) pair, where
+        outcome is 'win', 'loss', or 'draw' and moves is the number of moves, counting both sides, until checkmate
+        with best play, or 0 for a draw. Returns None if the position's material is not this table's signature.
+        """
+        index = self._layout.game_index(game)
+        if index is None:
+            return None
+        return decode_value(self._values[index])
+
+    def get_counts(self):
+        """
+        Returns a dictionary with the number of won, lost, drawn, and invalid indexes
+        """
+        counts = {'win': 0, 'loss': 0, 'draw': 0, 'invalid': 0}
+        for value in self._values:
+            if value == INVALID:
+                counts['invalid'] += 1
+            else:
+                counts[decode_value(value)[0]] += 1
+        return counts
+
+    def save(self, path):
+        """
+        Writes the table to a file at path, replacing any file already there.
+        """
+        values = array('h', self._values)
+        if sys.byteorder == 'big':
+            values.byteswap()
+        with open(path, 'wb') as file:
+            file.write(HEADER_STRUCT.pack(MAGIC, VERSION, self.get_signature().encode(), len(values)))
+            file.write(values.tobytes())
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads a table written by save. Raises ValueError if the file is not a tablebase.
+        """
+        with open(path, 'rb') as file:
+            data = file.read()
+        if len(data) < HEADER_STRUCT.size:
+            raise ValueError('%s is too short to be a tablebase' % path)
+        magic, version, signature, count = HEADER_STRUCT.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION or len(data) != HEADER_STRUCT.size + 2 * count:
+            raise ValueError('%s is not a version %d tablebase' % (path, VERSION))
+        values = array('h')
+        values.frombytes(data[HEADER_STRUCT.size:])
+        if sys.byteorder == 'big':
+            values.byteswap()
+        return cls(signature.rstrip(b'\0').decode(), values)
+
+
+def decode_value(value):
+    """
+    Converts a stored value into an (outcome, moves) pair as returned by Tablebase.probe, or None for INVALID.
+    """
+    if value == INVALID:
+        return None
+    if value > 0:
+        return 'win', value
+    if value < 0:
+        return 'loss', -value - 1
+    return 'draw', 0
+
+
+def solve(layout, successors, tables):
+    """
+    Runs the retrograde analysis of one signature. successors holds the result of successors_task for every index
+    and tables the finished Tablebases of every signature a capture can lead to. Positions are settled in order of
+    distance: a position is won in n + 1 moves as soon as one move reaches a position lost in n, and lost in n + 1
+    once every move reaches a won position, the longest of those wins being n. A position with a capture into a lost
+    position is won and never scheduled as lost. Anything never settled is a draw. Returns the array of values.
+    """
+    size = layout.get_size()
+    values = array('h', [DRAW]) * size
+    predecessors = [[] for _ in range(size)]
+    remaining = [0] * size
+    longest = [0] * size
+    winning = [False] * size
+    buckets = {}
+    for index in range(size):
+        result = successors[index]
+        if result is None:
+            values[index] = INVALID
+            continue
+        quiet, captures = result
+        remaining[index] = len(quiet)
+        for successor in quiet:
+            predecessors[successor].append(index)
+        for signature, sub_index in captures:
+            value = tables[signature].get_value(sub_index)
+            if value < 0:
+                buckets.setdefault(-value, []).append((index, True))
+                winning[index] = True
+            elif value > 0:
+                longest[index] = max(longest[index], value)
+            else:
+                remaining[index] += 1
+        if not remaining[index] and not winning[index]:
+            buckets.setdefault(longest[index] + 1 if captures else 0, []).append((index, False))
+
+    distance = 0
+    while buckets:
+        settled = buckets.pop(distance, ())
+        for index, won in settled:
+            if values[index] != DRAW:
+                continue
+            values[index] = distance if won else -distance - 1
+            for predecessor in predecessors[index]:
+                if values[predecessor] != DRAW:
+                    continue
+                if won:
+                    remaining[predecessor] -= 1
+                    if distance > longest[predecessor]:
+                        longest[predecessor] = distance
+                    if not remaining[predecessor] and not winning[predecessor]:
+                        buckets.setdefault(longest[predecessor] + 1, []).append((predecessor, False))
+                else:
+                    buckets.setdefault(distance + 1, []).append((predecessor, True))
+        distance += 1
+    return values
+
+
+def generate(signature, workers=1, tables=None):
+    """
+    Builds the Tablebase of a signature and of every smaller signature its captures lead to, generating moves in a
+    pool of worker processes when workers is more than one. Tables already present in tables are reused. Returns the
+    dictionary of every table by signature.
+    """
+    if tables is None:
+        tables = {}
+    layout = get_layout(signature)
+    if layout.get_signature() in tables:
+        return tables
+    for sub in layout.sub_signatures():
+        generate(sub, workers, tables)
+
+    size = layout.get_size()
+    starts = range(0, size, POSITIONS_PER_TASK)
+    ends = [min(start + POSITIONS_PER_TASK, size) for start in starts]
+    names = [layout.get_signature()] * len(starts)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunks = list(pool.map(successors_task, names, starts, ends))
+    else:
+        chunks = [successors_task(name, start, end) for name, start, end in zip(names, starts, ends)]
+    successors = [result for chunk in chunks for result in chunk]
+    tables[layout.get_signature()] = Tablebase(layout.get_signature(), solve(layout, successors, tables))
+    return tables
+
+
+class Tablebases:
+    """
+    A set of tables loaded from a directory of .jgtb files, probed by the signature of the position.
+    """
+    def __init__(self, tables=None):
+        self._tables = dict(tables or {})
+
+    @classmethod
+    def load_directory(cls, path):
+        """
+        Loads every tablebase file in a directory.
+        """
+        tables = {}
+        for name in sorted(os.listdir(path)):
+            if name.endswith('.jgtb'):
+                table = Tablebase.load(os.path.join(path, name))
+                tables[table.get_signature()] = table
+        return cls(tables)
+
+    def __len__(self):
+        return len(self._tables)
+
+    def probe(self, game):
+        """
+        Returns the (outcome, moves) value of a game's current position, or None if there is no table for its
+        material.
+        """
+        table = self._tables.get(game_signature(game))
+        if table is None:
+            return None
+        return table.probe(game)
+
+
+def main(argv=None):
+    """
+    Command line entry point. Builds the tables of the given signatures and everything they capture into, writes
+    each to SIGNATURE.jgtb in the output directory, and prints their sizes, results, and positions per second.
+    """
+    parser = argparse.ArgumentParser(description='Build Janggi endgame tablebases')
+    parser.add_argument('signatures', nargs='+', help='material signatures such as KR-KA')
+    parser.add_argument('--workers', type=int, default=1, help='number of worker processes (default 1)')
+    parser.add_argument('--output', default='.', help='directory to write the tables to (default .)')
+    args = parser.parse_args(argv)
+
+    tables = {}
+    for signature in args.signatures:
+        start = time.perf_counter()
+        before = set(tables)
+        generate(signature, args.workers, tables)
+        elapsed = time.perf_counter() - start
+        positions = sum(get_layout(name).get_size() for name in set(tables) - before)
+        for name in sorted(set(tables) - before):
+            tables[name].save(os.path.join(args.output, name + '.jgtb'))
+            counts = tables[name].get_counts()
+            print('%-10s win %8d  loss %8d  draw %8d  invalid %8d'
+                  % (name, counts['win'], counts['loss'], counts['draw'], counts['invalid']))
+        print('%s: %d positions in %.3fs, %d positions/sec' % (normalize_signature(signature), positions, elapsed,
+                                                              positions / elapsed if elapsed else 0))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
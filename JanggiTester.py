@@ -2,8 +2,33 @@
 # Date: 2/28/21
 # Description: Testing file for JanggiGame
 
+import asyncio
+import copy
+import io
+import json
+import os
+import random
+import tempfile
 import unittest
+from array import array
 from JanggiGame import *
+import JanggiBook
+import JanggiDatabase
+import JanggiImporter
+import JanggiMCTS
+import JanggiPerft
+import JanggiSearch
+import JanggiServer
+import JanggiSimulator
+import JanggiTablebase
+
+# The batched move generation and feature planes need numpy, which the rest of the game does not.
+try:
+    import numpy as np
+    import JanggiBatch
+    import JanggiFeatures
+except ImportError:
+    np = None
 
 
 class TestGanggi(unittest.TestCase):
@@ -14,37 +39,840 @@ class TestGanggi(unittest.TestCase):
         self.gs = JanggiGame()
 
     def test_first_turn(self):
-        self.assertEqual(self.gs.active_turn(), 'b')
+        self.assertEqual(self.gs.active_turn(), 'blue')
         self.gs.set_next_turn()
-        self.assertEqual(self.gs.active_turn(), 'r')
+        self.assertEqual(self.gs.active_turn(), 'red')
         self.gs.set_next_turn()
-        self.assertEqual(self.gs.active_turn(), 'b')
+        self.assertEqual(self.gs.active_turn(), 'blue')
 
     def test_game_state(self):
         self.assertEqual(self.gs.get_game_state(), 'UNFINISHED')
         self.gs.set_game_state('BLUE WON')
         self.assertEqual(self.gs.get_game_state(), 'BLUE WON')
 
-    def test_validate_move(self):
-        test_soldier = Soldier('b', 3, 0)
-        self.assertEqual(self.gs.validate_move('a1', 'a2', test_soldier), True)
-        self.assertEqual(self.gs.validate_move('a0', 'a1', test_soldier), False)
-        self.assertEqual(self.gs.validate_move('a10', 'a9', test_soldier), True)
-        self.assertEqual(self.gs.validate_move('a11', 'a1', test_soldier), False)
-        self.assertEqual(self.gs.validate_move('a1', 'j1', test_soldier), False)
-        self.assertEqual(self.gs.validate_move('i10', 'a1', test_soldier), True)
+    def test_invalid_moves(self):
+        self.assertFalse(self.gs.make_move('a1', 'a2'))
+        self.assertFalse(self.gs.make_move('a0', 'a1'))
+        self.assertFalse(self.gs.make_move('a11', 'a1'))
+        self.assertFalse(self.gs.make_move('a10', 'j10'))
+        self.assertFalse(self.gs.make_move('e5', 'e6'))
+        self.assertFalse(self.gs.make_move('a10', 'a5'))
+        self.assertEqual(self.gs.active_turn(), 'blue')
 
     def test_make_move(self):
-        self.assertEqual(self.gs.active_turn(), 'b')
-        self.gs.make_move('a10', 'a9')
-        self.assertEqual(self.gs.active_turn(), 'r')
-        self.gs.make_move('a1', 'a2')
-        self.assertEqual(self.gs.active_turn(), 'b')
+        self.assertEqual(self.gs.active_turn(), 'blue')
+        self.assertTrue(self.gs.make_move('a10', 'a9'))
+        self.assertEqual(self.gs.active_turn(), 'red')
+        self.assertTrue(self.gs.make_move('a1', 'a2'))
+        self.assertEqual(self.gs.active_turn(), 'blue')
+
+    def test_checkmate(self):
+        game = JanggiGame.from_text('9/4K4/9/9/9/9/9/R8/8R/3k5 b 0 1')
+        self.assertTrue(game.make_move('a3', 'a2'))
+        self.assertEqual(game.get_game_state(), 'UNFINISHED')
+        self.assertTrue(game.undo_move())
+        self.assertTrue(game.make_move('a3', 'a1'))
+        self.assertEqual(game.get_game_state(), 'BLUE_WON')
+        self.assertFalse(game.make_move('d1', 'e1'))
+        self.assertTrue(game.undo_move())
+        self.assertEqual(game.get_game_state(), 'UNFINISHED')
+
+    def test_has_any_legal_move(self):
+        self.assertTrue(self.gs.has_any_legal_move('blue'))
+        self.assertTrue(self.gs.has_any_legal_move('red'))
+        game = JanggiGame.from_text('9/4K4/9/9/9/9/9/9/8R/R2k5 r 0 1')
+        self.assertTrue(game.is_in_check('red'))
+        self.assertFalse(game.has_any_legal_move('red'))
+        game = JanggiGame.from_text('9/4K4/9/9/9/9/9/9/R8/3k5 r 0 1')
+        self.assertFalse(game.is_in_check('red'))
+        self.assertTrue(game.has_any_legal_move('red'))
+        rng = random.Random(11)
+        buffer = move_buffer()
+        checks = 0
+        for _ in range(20):
+            game = JanggiGame(MoveCache(0))
+            for _ in range(150):
+                turn = game.active_turn()
+                count = game.generate_legal(buffer)
+                checks += game.is_in_check(turn)
+                self.assertEqual(game.has_any_legal_move(turn), count > 0)
+                if not count:
+                    break
+                moves = [buffer[index] for index in range(count) if buffer[index] // 100 != buffer[index] % 100]
+                captures = [move for move in moves if game.get_squares()[MOVE_SQUARES[move][1]]]
+                game.push(rng.choice(captures if captures and rng.random() < 0.7 else moves or [buffer[0]]))
+        self.assertGreater(checks, 0)
+
+    def test_iter_moves(self):
+        for game in [self.gs] + JanggiPerft.random_games(40, seed=12, max_moves=150):
+            squares = game.get_squares()
+            for color in ('blue', 'red'):
+                valid = game.get_valid_moves(color)
+                moves = list(game.iter_moves(color))
+                self.assertEqual(len(moves), len(valid))
+                self.assertEqual(set(moves), valid)
+                captures = [move for move in valid if move.get_orig() != move.get_target() and
+                            squares[MOVE_SQUARES[move][1]]]
+                self.assertEqual(sorted(game.iter_moves(color, captures_only=True)), sorted(captures))
+                ordered = list(game.iter_moves(color, captures_first=True))
+                self.assertEqual(set(ordered), valid)
+                self.assertEqual(sorted(ordered[:len(captures)]), sorted(captures))
+                square = game.get_piece_squares(color)[0]
+                self.assertEqual(set(game.iter_moves(color, piece_filter=lambda other, code: other == square)),
+                                 set(move for move in valid if MOVE_SQUARES[move][0] == square))
+        self.assertTrue(self.gs.is_valid_move(next(self.gs.iter_moves('blue'))))
+
+    def test_piece_lists(self):
+        rng = random.Random(13)
+        buffer = move_buffer()
+        for _ in range(10):
+            game = JanggiGame(MoveCache(0))
+            lists = []
+            for _ in range(120):
+                for color in ('blue', 'red'):
+                    self.assertEqual(sorted(game.get_piece_squares(color)),
+                                     [square for square in range(90)
+                                      if game.get_squares()[square] & COLOR_MASK == COLOR_BITS[color]])
+                count = game.generate_legal(buffer)
+                if not count:
+                    break
+                moves = [buffer[index] for index in range(count)]
+                captures = [move for move in moves if game.get_squares()[MOVE_SQUARES[move][1]]]
+                lists.append({color: list(game.get_piece_squares(color)) for color in ('blue', 'red')})
+                game.push(rng.choice(captures if captures and rng.random() < 0.7 else moves))
+            # Taking the moves back puts every piece list back in its original order.
+            while lists:
+                game.pop()
+                expected = lists.pop()
+                for color in ('blue', 'red'):
+                    self.assertEqual(game.get_piece_squares(color), expected[color])
+
+    def test_board_view(self):
+        board = self.gs.get_board()
+        self.assertEqual(board[8][4].get_name(), 'General')
+        self.assertEqual(board[8][4].get_color(), 'blue')
+        self.assertEqual(board[0][1].get_name(), 'Elephant')
+        self.assertIsNone(board[4][4])
+        board[8][4] = None
+        self.assertEqual(self.gs.get_board()[8][4].get_name(), 'General')
+
+    def test_board_checks(self):
+        board = self.gs.get_board()
+        self.assertFalse(valid_space_check(8, 4, board, 'blue'))
+        self.assertTrue(valid_space_check(8, 4, board, 'red'))
+        self.assertTrue(valid_space_check(4, 4, board, 'blue'))
+        self.assertFalse(valid_space_check(10, 0, board, 'blue'))
+        self.assertTrue(blue_palace_check(7, 4, board, 'blue'))
+        self.assertFalse(blue_palace_check(2, 4, board, 'blue'))
+        self.assertTrue(red_palace_check(2, 4, board, 'red'))
+        self.assertFalse(red_palace_check(1, 4, board, 'red'))
+
+    def test_opening_moves(self):
+        valid_moves = self.gs.get_valid_moves('blue')
+        self.assertEqual(len(valid_moves), 47)
+        self.assertIn(Move((9, 2), (7, 3)), valid_moves)
+        self.assertNotIn(Move((9, 0), (5, 0)), valid_moves)
+        self.assertTrue(self.gs.make_move('c10', 'd8'))
+        self.assertEqual(self.gs.get_board()[7][3].get_name(), 'Horse')
+        self.assertIsNone(self.gs.get_board()[9][2])
+
+    def test_move_tables(self):
+        self.assertEqual(len(PALACE_STEPS[BLUE][8 * 9 + 4]), 8)
+        self.assertEqual(PALACE_STEPS[RED][8 * 9 + 4], ())
+        self.assertEqual(len(HORSE_MOVES[0]), 2)
+        self.assertEqual(ELEPHANT_MOVES[0], ((9, 19, 29), (1, 11, 21)))
+        self.assertIn((1 * 9 + 4, 2 * 9 + 3), SLIDER_RAYS[0 * 9 + 5])
+
+    def test_square_attacked(self):
+        random.seed(3)
+        for _ in range(40):
+            for color in ('red', 'blue'):
+                targets = set(move.get_target() for move in self.gs.fill_possible_moves(color)
+                              if move.get_orig() != move.get_target())
+                for row in range(10):
+                    for col in range(9):
+                        self.assertEqual(self.gs.is_square_attacked((row, col), color), (row, col) in targets)
+            self.gs.make_move_helper(random.choice(sorted(self.gs.get_valid_moves(self.gs.active_turn()))))
+        self.assertEqual(self.gs.is_in_check('blue'), self.gs.is_square_attacked(self.gs.get_general_loc('blue'),
+                                                                                  'red'))
+
+    def test_valid_moves_match_trial_moves(self):
+        random.seed(4)
+        for _ in range(60):
+            color = self.gs.active_turn()
+            expected = set()
+            for move in self.gs.fill_possible_moves(color):
+                self.gs.push(move)
+                if not self.gs.is_in_check(color):
+                    expected.add(move.get_orig() + move.get_target())
+                self.gs.pop()
+            valid_moves = self.gs.get_valid_moves(color)
+            self.assertEqual(set(move.get_orig() + move.get_target() for move in valid_moves), expected)
+            self.gs.make_move_helper(random.choice(sorted(move for move in valid_moves
+                                                          if move.get_orig() != move.get_target())))
+
+    def test_undo_move(self):
+        start = self.gs.get_board()
+        self.assertFalse(self.gs.undo_move())
+        self.assertTrue(self.gs.make_move('c10', 'd8'))
+        self.assertTrue(self.gs.make_move('c4', 'd4'))
+        self.assertTrue(self.gs.make_move('a7', 'b7'))
+        self.assertTrue(self.gs.make_move('e2', 'e2'))
+        self.assertTrue(self.gs.undo_move())
+        self.assertEqual(self.gs.active_turn(), 'red')
+        self.assertEqual(self.gs.get_board()[6][1].get_name(), 'Soldier')
+        self.assertTrue(self.gs.undo_move())
+        self.assertTrue(self.gs.undo_move())
+        self.assertTrue(self.gs.undo_move())
+        self.assertFalse(self.gs.undo_move())
+        self.assertEqual(self.gs.active_turn(), 'blue')
+        self.assertEqual([[piece and piece.get_code() for piece in row] for row in self.gs.get_board()],
+                         [[piece and piece.get_code() for piece in row] for row in start])
+
+    def test_push_pop_general(self):
+        move = Move((8, 4), (7, 4))
+        self.gs.push(move)
+        self.assertEqual(self.gs.get_general_loc('blue'), (7, 4))
+        self.assertEqual(self.gs.pop(), move)
+        self.assertEqual(self.gs.get_general_loc('blue'), (8, 4))
+        self.assertEqual(self.gs.active_turn(), 'blue')
+
+    def test_move_encoding(self):
+        move = Move((0, 1), (1, 1))
+        self.assertEqual(move, 111)
+        self.assertEqual(hash(move), hash(Move.from_id(111)))
+        self.assertEqual(move.get_orig(), (0, 1))
+        self.assertEqual(move.get_target(), (1, 1))
+        self.assertEqual(copy.deepcopy(move), move)
+        self.assertIsInstance(self.gs.get_valid_moves('blue'), frozenset)
+        buffer = move_buffer()
+        count = self.gs._legal_moves(BLUE, buffer)
+        self.assertEqual(set(buffer[:count]), self.gs.get_valid_moves('blue'))
+
+    def test_position_key(self):
+        start = self.gs.position_key()
+        random.seed(5)
+        for _ in range(30):
+            self.gs.make_move_helper(random.choice(sorted(self.gs.get_valid_moves(self.gs.active_turn()))))
+            expected = ZOBRIST_RED_TO_MOVE if self.gs.active_turn() == 'red' else 0
+            for row, pieces in enumerate(self.gs.get_board()):
+                for col, piece in enumerate(pieces):
+                    if piece is not None:
+                        expected ^= ZOBRIST[piece.get_code()][row * 9 + col]
+            self.assertEqual(self.gs.position_key(), expected)
+        while self.gs.undo_move():
+            pass
+        self.assertEqual(self.gs.position_key(), start)
+
+    def test_position_key_transposition(self):
+        other = JanggiGame()
+        for orig, dest in (('c10', 'd8'), ('c4', 'd4'), ('a7', 'b7')):
+            self.gs.make_move(orig, dest)
+        for orig, dest in (('a7', 'b7'), ('c4', 'd4'), ('c10', 'd8')):
+            other.make_move(orig, dest)
+        self.assertEqual(self.gs.position_key(), other.position_key())
+        other.make_move('e2', 'e2')
+        self.assertNotEqual(self.gs.position_key(), other.position_key())
+
+    def test_move_cache(self):
+        first = self.gs.get_valid_moves('blue')
+        self.assertIs(self.gs.get_valid_moves('blue'), first)
+        self.assertEqual(self.gs.move_cache_stats()['hits'], 1)
+        self.gs.make_move('c10', 'd8')
+        self.gs.undo_move()
+        self.assertIs(self.gs.get_valid_moves('blue'), first)
+
+    def test_move_cache_eviction(self):
+        cache = MoveCache(2)
+        cache.put(1, 'a')
+        cache.put(2, 'b')
+        self.assertEqual(cache.get(1), 'a')
+        cache.put(3, 'c')
+        self.assertIsNone(cache.get(2))
+        self.assertEqual(cache.get(1), 'a')
+        self.assertEqual(cache.get_stats(), {'hits': 2, 'misses': 1, 'size': 2, 'max_size': 2})
 
     def test_set(self):
         moves = set()
         moves.add((2, 1))
         self.assertEqual((2,1) in moves, True)
 
+    def test_is_valid_move(self):
+        for name, moves, expected in JanggiPerft.PERFT_POSITIONS:
+            game = JanggiPerft.load_position(moves)
+            valid_moves = game.get_valid_moves(game.active_turn())
+            for move in range(10000):
+                self.assertEqual(game.is_valid_move(move), move in valid_moves, (name, move))
+
+
+class TestSerialization(unittest.TestCase):
+    """
+    Checks the text notation and binary records
+    """
+    def test_start_text(self):
+        game = JanggiGame()
+        self.assertEqual(game.to_text(), START_TEXT)
+        self.assertEqual(JanggiGame.from_text(START_TEXT).position_key(), game.position_key())
+        self.assertEqual(len(game.to_record()), RECORD_SIZE)
+
+    def test_round_trip(self):
+        game = JanggiPerft.load_position(JanggiPerft.find_position('middlegame'))
+        self.assertEqual(game.get_fullmove_number(), 16)
+        for copy_game in (JanggiGame.from_text(game.to_text()), JanggiGame.from_record(game.to_record())):
+            self.assertEqual(copy_game.get_squares(), game.get_squares())
+            self.assertEqual(copy_game.position_key(), game.position_key())
+            self.assertEqual(copy_game.get_halfmove_clock(), game.get_halfmove_clock())
+            self.assertEqual(copy_game.get_fullmove_number(), game.get_fullmove_number())
+            self.assertEqual(copy_game.to_record(), game.to_record())
+
+    def test_counters(self):
+        game = JanggiGame.from_text('RBNA1ABNR/4K4/1C5C1/P1P1P1P1P/9/9/p1p1p1p1p/1c5c1/4k4/rbna1abnr r 7 12')
+        self.assertEqual(game.active_turn(), 'red')
+        game.make_move('a4', 'a5')
+        self.assertEqual(game.get_halfmove_clock(), 8)
+        self.assertEqual(game.get_fullmove_number(), 13)
+        game.make_move('a7', 'a6')
+        game.make_move('a5', 'a6')
+        self.assertEqual(game.get_halfmove_clock(), 0)
+        self.assertTrue(game.to_text().endswith(' b 0 14'))
+        game.undo_move()
+        self.assertTrue(game.to_text().endswith(' r 9 13'))
+        game.undo_move()
+        game.undo_move()
+        self.assertTrue(game.to_text().endswith(' r 7 12'))
+
+    def test_bulk(self):
+        games = [JanggiPerft.load_position(moves) for name, moves, expected in JanggiPerft.PERFT_POSITIONS]
+        data = encode_records(games)
+        self.assertEqual(len(data), RECORD_SIZE * len(games))
+        self.assertEqual([game.to_text() for game in decode_records(data)], [game.to_text() for game in games])
+        self.assertEqual([game.to_text() for game in decode_texts(encode_texts(games))],
+                         [game.to_text() for game in games])
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, JanggiGame.from_text, '9/9/9/9/9/9/9/9/9/9 b 0 1')
+        self.assertRaises(ValueError, JanggiGame.from_text, START_TEXT.replace('rbna1', 'rbnx1'))
+        self.assertRaises(ValueError, JanggiGame.from_text, START_TEXT.replace(' b ', ' w '))
+        self.assertRaises(ValueError, JanggiGame.from_record, JanggiGame().to_record()[1:])
+        self.assertRaises(ValueError, decode_records, b'\x00' * RECORD_SIZE)
+        game = JanggiGame.from_text(START_TEXT.replace('p1p1p1p1p', 'ppppppppp'))
+        self.assertRaises(ValueError, game.to_record)
+
+
+class TestDatabase(unittest.TestCase):
+    """
+    Checks writing and looking up positions in a PositionDatabase file
+    """
+    def test_lookup(self):
+        builder = JanggiDatabase.DatabaseBuilder()
+        games = [JanggiPerft.load_position(moves) for name, moves, expected in JanggiPerft.PERFT_POSITIONS]
+        for number, game in enumerate(games):
+            builder.add(game, number - 2, number * 10, Move((0, 0), (1, 0)) if number else None)
+        builder.add(games[1], 50, 7)
+        self.assertEqual(len(builder), len(games))
+        handle, path = tempfile.mkstemp()
+        os.close(handle)
+        try:
+            builder.write(path)
+            with JanggiDatabase.PositionDatabase(path) as database:
+                self.assertEqual(len(database), len(games))
+                entry = database.lookup(JanggiGame())
+                self.assertEqual((entry.get_score(), entry.get_visits(), entry.get_best_move()), (-2, 0, None))
+                entry = database.lookup(JanggiGame.from_text(games[1].to_text()))
+                self.assertEqual((entry.get_score(), entry.get_visits()), (50, 7))
+                self.assertEqual(database.lookup(games[2]).get_best_move(), Move((0, 0), (1, 0)))
+                games[0].make_move('a7', 'a6')
+                self.assertIsNone(database.lookup(games[0]))
+                self.assertEqual(sorted(game.to_text() for game, entry in database),
+                                 sorted(game.to_text() for game in games[1:] + [JanggiGame()]))
+            with open(path, 'r+b') as file:
+                file.write(b'XXXX')
+            self.assertRaises(ValueError, JanggiDatabase.PositionDatabase, path)
+        finally:
+            os.remove(path)
+
+
+class TestSearch(unittest.TestCase):
+    """
+    Contains unit tests for JanggiSearch
+    """
+    def setUp(self):
+        self.gs = JanggiGame()
+
+    def test_search_restores_game(self):
+        key = self.gs.position_key()
+        result = JanggiSearch.search(self.gs, max_depth=2)
+        self.assertEqual(self.gs.position_key(), key)
+        self.assertIn(result.get_best_move(), self.gs.get_valid_moves('blue'))
+        self.assertEqual(result.get_pv()[0], result.get_best_move())
+        self.assertEqual(result.get_depth(), 2)
+        self.assertGreater(result.get_nodes(), 0)
+
+    def test_search_takes_hanging_chariot(self):
+        for orig, dest in (('a7', 'b7'), ('a4', 'b4'), ('a10', 'a4'), ('a1', 'a2')):
+            self.assertTrue(self.gs.make_move(orig, dest))
+        result = JanggiSearch.search(self.gs, max_depth=2)
+        self.assertEqual(result.get_best_move(), Move((3, 0), (1, 0)))
+        self.assertGreaterEqual(result.get_score(), 1000)
+
+    def test_parallel_search(self):
+        game = JanggiGame()
+        for move in (('a7', 'b7'), ('a4', 'b4'), ('a10', 'a4'), ('a1', 'a2')):
+            game.make_move(*move)
+        key = game.position_key()
+        result = JanggiSearch.search(game, 2, workers=2)
+        self.assertEqual(result.get_best_move(), Move((3, 0), (1, 0)))
+        self.assertEqual(result.get_depth(), 2)
+        self.assertEqual(game.position_key(), key)
+
+    def test_merge_results(self):
+        # The second share's worker ran out of time, so only the other two shares are compared.
+        results = [([(1, 8070, 20, [8070]), (2, 8070, -10, [8070, 1020])], 500), ([], 40),
+                   ([(1, 9273, 35, [9273])], 300)]
+        result = JanggiSearch.merge_results(results, 1222, 5)
+        self.assertEqual(result.get_best_move(), Move.from_id(9273))
+        self.assertEqual(result.get_score(), 35)
+        self.assertEqual(result.get_depth(), 1)
+        self.assertEqual(result.get_nodes(), 840)
+        result = JanggiSearch.merge_results([([], 40), ([], 10)], 1222, 5)
+        self.assertEqual(result.get_best_move(), Move.from_id(1222))
+        self.assertEqual(result.get_depth(), 0)
+
+    def test_search_time_budget(self):
+        # Without a depth limit only the time budget can stop the search short of MAX_DEPTH.
+        result = JanggiSearch.search(self.gs, time_ms=150)
+        self.assertIsNotNone(result.get_best_move())
+        self.assertGreaterEqual(result.get_depth(), 1)
+        self.assertLess(result.get_depth(), JanggiSearch.MAX_DEPTH)
+        self.assertEqual(self.gs.to_text(), START_TEXT)
+
+    def test_small_table(self):
+        # A table far smaller than the search still finds the same move, with colliding positions replacing each other.
+        for orig, dest in (('a7', 'b7'), ('a4', 'b4'), ('a10', 'a4'), ('a1', 'a2')):
+            self.assertTrue(self.gs.make_move(orig, dest))
+        result = JanggiSearch.Searcher(table_size=64).search(self.gs, 3)
+        self.assertEqual(result.get_best_move(), Move((3, 0), (1, 0)))
+        self.assertEqual(result.get_depth(), 3)
+
+
+class TestPerft(unittest.TestCase):
+    """
+    Checks perft counts against the reference numbers stored in JanggiPerft
+    """
+    def test_reference_counts(self):
+        for name, moves, expected in JanggiPerft.PERFT_POSITIONS:
+            game = JanggiPerft.load_position(moves)
+            key = game.position_key()
+            for depth in (1, 2):
+                self.assertEqual(game.perft(depth), expected[depth - 1], name)
+            self.assertEqual(game.position_key(), key)
+
+    def test_divide(self):
+        game = JanggiGame()
+        counts = game.divide(2)
+        self.assertEqual(len(counts), 32)
+        self.assertEqual(sum(counts.values()), game.perft(2))
+
+    def test_parallel_perft(self):
+        game = JanggiPerft.load_position(JanggiPerft.find_position('palace'))
+        self.assertEqual(game.perft(3, workers=2), game.perft(3))
+        self.assertEqual(game.divide(2, workers=2), game.divide(2))
+
+    def test_bytes_round_trip(self):
+        game = JanggiPerft.load_position(JanggiPerft.find_position('opening'))
+        copy_game = JanggiGame.from_bytes(game.to_bytes())
+        self.assertEqual(copy_game.position_key(), game.position_key())
+        self.assertEqual(copy_game.active_turn(), game.active_turn())
+        self.assertEqual(copy_game.get_valid_moves('blue'), game.get_valid_moves('blue'))
+        self.assertRaises(ValueError, JanggiGame.from_bytes, game.to_bytes()[:90])
+        self.assertRaises(ValueError, JanggiGame.from_bytes, bytes(91))
+
+
+class TestSimulator(unittest.TestCase):
+    """
+    Checks headless self-play
+    """
+    def test_play_game(self):
+        result = JanggiSimulator.play_game('greedy', 'random', seed=3, max_moves=150)
+        self.assertEqual(result, dict(JanggiSimulator.play_game('greedy', 'random', seed=3, max_moves=150),
+                                      time_ms=result['time_ms']))
+        self.assertLessEqual(result['length'], 150)
+        self.assertIn(result['reason'], ('checkmate', 'repetition', 'passes', 'move limit'))
+        self.assertEqual(result['winner'] is None, result['reason'] != 'checkmate')
+
+    def test_run_games(self):
+        output = io.StringIO()
+        totals = JanggiSimulator.run_games(4, 'random', 'search:1', max_moves=20, output=output)
+        lines = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual([line['seed'] for line in lines], [0, 1, 2, 3])
+        self.assertEqual(totals['games'], 4)
+        self.assertEqual(totals['moves'], sum(line['length'] for line in lines))
+        self.assertRaises(ValueError, JanggiSimulator.run_games, 1, 'random', 'search:x')
+
+
+class TestImporter(unittest.TestCase):
+    """
+    Checks reading and validating game records
+    """
+    def test_parse_move(self):
+        game = JanggiGame()
+        self.assertEqual(JanggiImporter.parse_move('c10-d8', game), Move((9, 2), (7, 3)))
+        self.assertEqual(JanggiImporter.parse_move('a4b4', game), Move((3, 0), (3, 1)))
+        self.assertEqual(JanggiImporter.parse_move('pass', game), Move((8, 4), (8, 4)))
+        self.assertRaises(ValueError, JanggiImporter.parse_move, 'j1-a1', game)
+
+    def test_import_games(self):
+        lines = ['# two games', 'c7-c6 a4-b4 h10-g8 1-0', '', 'c7-c6 a4-b4 a10-a4 pass']
+        records = list(JanggiImporter.import_games(lines, 'games.txt', positions=True))
+        self.assertEqual([record.get_line() for record in records], [2, 4])
+        self.assertTrue(records[0].is_valid())
+        self.assertEqual(records[0].get_result(), 'blue')
+        self.assertEqual(len(records[0].get_moves()), 3)
+        self.assertEqual(len(records[0].get_positions()), 4)
+        game = JanggiPerft.load_position([('c7', 'c6'), ('a4', 'b4'), ('h10', 'g8')])
+        self.assertEqual(records[0].get_positions()[-1], game.to_record())
+        self.assertFalse(records[1].is_valid())
+        self.assertEqual(records[1].get_moves(), [Move((6, 2), (5, 2)), Move((3, 0), (3, 1))])
+        self.assertIn('move 3', records[1].get_error())
+
+
+class TestBook(unittest.TestCase):
+    """
+    Checks building, saving, and probing an opening book
+    """
+    def test_probe(self):
+        lines = ['c7-c6 a4-b4 h10-g8 1-0', 'c7-c6 a4-b4 c10-d8 0-1', 'c7-c6 c4-c5 1/2-1/2', 'a7-a6 a4-a5 *',
+                 'c7-c6 a1-a9']
+        builder = JanggiBook.BookBuilder(max_ply=2)
+        for record in JanggiImporter.import_games(lines):
+            if record.is_valid():
+                builder.add_game(record.get_moves(), record.get_result())
+        self.assertEqual(builder.get_games(), 4)
+        book = builder.build()
+        self.assertEqual(len(book), 3)
+        game = JanggiGame()
+        entries = book.probe(game)
+        self.assertEqual([entry.get_move() for entry in entries], [Move((6, 2), (5, 2)), Move((6, 0), (5, 0))])
+        self.assertEqual(entries[0].get_games(), 3)
+        self.assertEqual(entries[0].get_score(), 0.5)
+        self.assertEqual(entries[0].get_weight(), 0.75)
+        game.make_move('c7', 'c6')
+        entries = book.probe(game)
+        self.assertEqual(entries[0].get_move(), Move((3, 0), (3, 1)))
+        self.assertEqual(entries[0].get_score(), 0.5)
+        self.assertEqual(entries[1].get_score(), 0.5)
+        self.assertIn(book.choose(game, random.Random(1)), (Move((3, 0), (3, 1)), Move((3, 2), (4, 2))))
+        game.make_move('a4', 'b4')
+        self.assertEqual(book.probe(game), [])
+        self.assertIsNone(book.choose(game))
+        self.assertEqual(len(builder.build(min_games=2)), 2)
+
+    def test_save_load(self):
+        builder = JanggiBook.BookBuilder()
+        builder.add_game([int(move) for move in JanggiSearch.search(JanggiGame(), 3).get_pv()], 'blue')
+        book = builder.build()
+        handle, path = tempfile.mkstemp()
+        os.close(handle)
+        try:
+            book.save(path)
+            loaded = JanggiBook.OpeningBook.load(path)
+            game = JanggiGame()
+            self.assertEqual(len(loaded), len(book))
+            self.assertEqual(repr(loaded.probe(game)), repr(book.probe(game)))
+            self.assertEqual(loaded.probe(game)[0].get_score(), 1)
+            with open(path, 'ab') as file:
+                file.write(b'x')
+            self.assertRaises(ValueError, JanggiBook.OpeningBook.load, path)
+        finally:
+            os.remove(path)
+
+
+class TestTablebase(unittest.TestCase):
+    """
+    Checks endgame tablebase indexing, generation, and probing
+    """
+    def test_layout(self):
+        self.assertEqual(JanggiTablebase.normalize_signature('kra-ka'), 'KAR-KA')
+        self.assertRaises(ValueError, JanggiTablebase.normalize_signature, 'R-KA')
+        layout = JanggiTablebase.get_layout('KR-KA')
+        self.assertEqual(layout.get_size(), 2 * 9 * 50 * 9 * 9)
+        self.assertEqual(sorted(layout.sub_signatures()), ['K-KA', 'KR-K'])
+        for index in range(0, layout.get_size(), 97):
+            squares, red_to_move = layout.decode(index)
+            self.assertEqual(layout.index(squares, red_to_move), index)
+            mirrored = [square - square % 9 + 8 - square % 9 for square in squares]
+            self.assertIn(layout.decode(layout.index(mirrored, red_to_move)), ((squares, red_to_move),
+                                                                              (mirrored, red_to_move)))
+
+    def test_generate(self):
+        tables = JanggiTablebase.generate('KA-KA')
+        self.assertEqual(sorted(tables), ['K-K', 'K-KA', 'KA-K', 'KA-KA'])
+        game = JanggiGame.from_text('3AK4/9/9/9/9/9/9/9/4k4/3a5 b 0 1')
+        self.assertEqual(JanggiTablebase.game_signature(game), 'KA-KA')
+        probes = JanggiTablebase.Tablebases(tables)
+        value = probes.probe(game)
+        self.assertEqual(value, tables['KA-KA'].probe(game))
+        buffer = move_buffer()
+        children = []
+        for index in range(game.generate_legal(buffer)):
+            game.push(buffer[index])
+            children.append(probes.probe(game))
+            game.pop()
+        self.assertEqual(value, ('draw', 0))
+        self.assertIn(('draw', 0), children)
+        mirror = JanggiGame.from_text('4KA3/9/9/9/9/9/9/9/4k4/5a3 b 0 1')
+        self.assertEqual(probes.probe(mirror), value)
+        self.assertIsNone(tables['K-K'].probe(game))
+        self.assertIsNone(probes.probe(JanggiGame()))
+
+        handle, path = tempfile.mkstemp()
+        os.close(handle)
+        try:
+            tables['KA-KA'].save(path)
+            loaded = JanggiTablebase.Tablebase.load(path)
+            self.assertEqual(loaded.get_signature(), 'KA-KA')
+            self.assertEqual(loaded.get_counts(), tables['KA-KA'].get_counts())
+            self.assertEqual(loaded.probe(game), value)
+        finally:
+            os.remove(path)
+
+    def test_solve_capture_win(self):
+        # Index 0 has one quiet move, into a position won in 1, and one capture into a position lost in 20. The quiet
+        # move alone would make it lost in 2, but the capture wins in 21.
+        layout = JanggiTablebase.get_layout('K-K')
+        values = array('h', [JanggiTablebase.DRAW]) * layout.get_size()
+        values[0] = -21
+        tables = {'K-K': JanggiTablebase.Tablebase('K-K', values)}
+        successors = [([1], [('K-K', 0)]), ([2], []), ([], [])] + [None] * (layout.get_size() - 3)
+        solved = JanggiTablebase.solve(layout, successors, tables)
+        self.assertEqual(list(solved[:3]), [21, 1, -1])
+
+
+@unittest.skipUnless(np is not None, 'requires numpy')
+class TestBatch(unittest.TestCase):
+    """
+    Checks batched NumPy move generation against get_valid_moves
+    """
+    def test_legal_masks(self):
+        games = [JanggiPerft.load_position(moves) for name, moves, expected in JanggiPerft.PERFT_POSITIONS]
+        games += JanggiPerft.random_games(200, seed=5)
+        boards, colors = JanggiBatch.boards_from_games(games)
+        masks = JanggiBatch.legal_masks(boards, colors)
+        for game, mask in zip(games, masks):
+            self.assertEqual(JanggiBatch.mask_moves(mask), sorted(game.get_valid_moves(game.active_turn())))
+
+    def test_pseudo_legal_masks(self):
+        games = JanggiPerft.random_games(100, seed=6)
+        boards, colors = JanggiBatch.boards_from_games(games)
+        pseudo = JanggiBatch.pseudo_legal_masks(boards, colors)
+        legal = JanggiBatch.legal_masks(boards, colors)
+        diagonal = range(90)
+        self.assertFalse(pseudo[:, diagonal, diagonal].any())
+        legal[:, diagonal, diagonal] = False
+        self.assertFalse((legal & ~pseudo).any())
+
+
+@unittest.skipUnless(np is not None, 'requires numpy')
+class TestFeatures(unittest.TestCase):
+    """
+    Checks feature plane export, shards, and batch loading
+    """
+    def test_planes(self):
+        games = [JanggiGame()] + JanggiPerft.random_games(50, seed=8)
+        planes = JanggiFeatures.games_to_planes(games)
+        self.assertTrue((JanggiFeatures.records_to_planes(encode_records(games)) == planes).all())
+        for game, plane in zip(games, planes):
+            squares = game.get_squares()
+            self.assertEqual(plane[:JanggiFeatures.SIDE_PLANE].sum(), sum(1 for code in squares if code))
+            for square, code in enumerate(squares):
+                if code:
+                    index = JanggiFeatures.plane_index(COLOR_NAMES[code & COLOR_MASK], code & TYPE_MASK)
+                    self.assertEqual(plane[index, square // 9, square % 9], 1)
+            self.assertTrue((plane[JanggiFeatures.SIDE_PLANE] == (game.active_turn() == 'red')).all())
+        self.assertRaises(ValueError, JanggiFeatures.records_to_planes, b'\0' * 35)
+
+    def test_shards(self):
+        games = JanggiPerft.random_games(25, seed=9)
+        expected = JanggiFeatures.games_to_planes(games)
+        with tempfile.TemporaryDirectory() as directory:
+            with JanggiFeatures.ShardWriter(directory, shard_size=10) as writer:
+                writer.add_records(encode_records(games[:12]))
+                writer.add_games(games[12:])
+            self.assertEqual(len(writer), 25)
+            self.assertRaises(ValueError, writer.add_games, games)
+            shards = JanggiFeatures.load_shards(directory)
+            self.assertEqual([len(shard) for shard in shards], [10, 10, 5])
+            batches = [batch.copy() for batch in JanggiFeatures.iter_batches(shards, 8)]
+            self.assertEqual(len(batches), 3)
+            self.assertTrue((batches[1] == expected[8:16]).all())
+            shuffled = [batch.copy() for batch in JanggiFeatures.iter_batches(shards, 12, shuffle=True, seed=1)]
+            self.assertEqual(len(shuffled), 2)
+            self.assertEqual(sorted(map(bytes, np.concatenate(shuffled))),
+                             sorted(map(bytes, expected[np.random.default_rng(1).permutation(25)[:24]])))
+            del shards, batches, shuffled
+
+            # A smaller export into the same directory replaces the old shards rather than mixing with them.
+            with open(os.path.join(directory, 'notes.txt'), 'w') as file:
+                file.write('kept')
+            with JanggiFeatures.ShardWriter(directory, shard_size=10) as writer:
+                writer.add_games(games[:4])
+            shards = JanggiFeatures.load_shards(directory)
+            self.assertEqual([len(shard) for shard in shards], [4])
+            self.assertTrue((shards[0] == expected[:4]).all())
+            self.assertTrue(os.path.exists(os.path.join(directory, 'notes.txt')))
+            del shards
+
+
+class TestMCTS(unittest.TestCase):
+    """
+    Checks pseudo-legal playout moves and Monte Carlo tree search
+    """
+    def test_pseudo_legal(self):
+        buffer = move_buffer()
+        for game in [JanggiGame()] + JanggiPerft.random_games(30, seed=10):
+            moves = [buffer[index] for index in range(game.generate_pseudo_legal(buffer))]
+            self.assertTrue(all(move // 100 != move % 100 for move in moves))
+            valid = set(move for move in game.get_valid_moves(game.active_turn()) if move // 100 != move % 100)
+            self.assertEqual(set(move for move in moves if game.is_safe_move(move)), valid)
+
+    def test_search(self):
+        game = JanggiGame(MoveCache(0))
+        mcts = JanggiMCTS.MCTS(rng=random.Random(3))
+        key = game.position_key()
+        result = mcts.search(game, playouts=150)
+        self.assertEqual(game.position_key(), key)
+        self.assertEqual(result.get_playouts(), 150)
+        self.assertEqual(result.get_reused(), 0)
+        self.assertEqual(mcts.get_root().get_visits(), 150)
+        self.assertTrue(game.is_valid_move(result.get_best_move()))
+        self.assertEqual(result.get_visits(), max(child.get_visits() for child in mcts.get_root().get_children()))
+
+        game.push(result.get_best_move())
+        reply = mcts.search(game, playouts=50)
+        self.assertEqual(reply.get_reused(), result.get_visits())
+        self.assertEqual(mcts.get_root().get_visits(), result.get_visits() + 50)
+        self.assertTrue(game.is_valid_move(reply.get_best_move()))
+        self.assertEqual(mcts.search(game, time_ms=50).get_reused(), result.get_visits() + 50)
+
+    def test_checkmated_root(self):
+        mcts = JanggiMCTS.MCTS(rng=random.Random(4))
+        result = mcts.search(JanggiGame.from_text('9/4K4/9/9/9/9/9/9/8R/R2k5 r 0 1'), playouts=500)
+        self.assertIsNone(result.get_best_move())
+        self.assertEqual(result.get_playouts(), 0)
+        self.assertEqual(mcts.get_root().get_visits(), 0)
+
+    def test_chooser(self):
+        record = JanggiSimulator.play_game('mcts:20', 'random', seed=2, max_moves=6)
+        self.assertEqual(record['length'], 6)
+
+
+class TestServer(unittest.TestCase):
+    """
+    Checks the game server protocol and the load generator
+    """
+    def test_protocol(self):
+        async def session():
+            server = JanggiServer.GameServer()
+            listener = await server.start(port=0)
+            client = await JanggiServer.Client.connect(port=listener.sockets[0].getsockname()[1])
+            try:
+                created = await client.request('create', id=1)
+                self.assertTrue(created['ok'])
+                self.assertEqual(created['id'], 1)
+                self.assertEqual(created['state']['position'], START_TEXT)
+                game = created['game']
+                moves = (await client.request('legal_moves', game=game))['moves']
+                self.assertEqual(len(moves), len(JanggiGame().get_valid_moves('blue')))
+                self.assertIn(['c10', 'd8'], moves)
+
+                moved = await client.request('move', game=game, orig='c10', dest='d8')
+                self.assertTrue(moved['valid'])
+                self.assertEqual(moved['state']['turn'], 'red')
+                self.assertFalse((await client.request('move', game=game, orig='c10', dest='d8'))['valid'])
+                self.assertFalse((await client.request('move', game=game, orig='a1')).get('ok'))
+                self.assertTrue((await client.request('undo', game=game))['undone'])
+                self.assertEqual((await client.request('state', game=game))['state']['position'], START_TEXT)
+
+                self.assertFalse((await client.request('state', game='missing'))['ok'])
+                self.assertFalse((await client.request('state', game=[1]))['ok'])
+                self.assertFalse((await client.request('state', game={'id': game}))['ok'])
+                self.assertTrue((await client.request('state', game=game))['ok'])
+                self.assertFalse((await client.request('resign', game=game))['ok'])
+                self.assertEqual(server.get_game_count(), 1)
+                self.assertTrue((await client.request('delete', game=game))['ok'])
+                self.assertEqual(server.get_game_count(), 0)
+            finally:
+                await client.close()
+                listener.close()
+                await listener.wait_closed()
+                server.close()
+        asyncio.run(session())
+
+    def test_bad_lines_keep_connection(self):
+        async def session():
+            server = JanggiServer.GameServer()
+            listener = await server.start(port=0)
+            reader, writer = await asyncio.open_connection(port=listener.sockets[0].getsockname()[1])
+            responses = []
+            try:
+                for line in (b'{"op": "state", "game": ' + b'[' * 100000 + b'}\n', b'not json\n',
+                             b'{"op": "create", "id": 7}\n'):
+                    writer.write(line)
+                    await writer.drain()
+                    responses.append(json.loads(await reader.readline()))
+            finally:
+                writer.close()
+                listener.close()
+                await listener.wait_closed()
+                server.close()
+            return responses
+        nested, invalid, created = asyncio.run(session())
+        self.assertFalse(nested['ok'])
+        self.assertFalse(invalid['ok'])
+        self.assertTrue(created['ok'])
+        self.assertEqual(created['id'], 7)
+
+    def test_delete_waits_for_moves(self):
+        async def session():
+            server = JanggiServer.GameServer()
+            finished = []
 
+            async def send(name, request):
+                response = await server.handle_request(request)
+                finished.append(name)
+                return response
+            try:
+                game = (await server.handle_request({'op': 'create'}))['game']
+                responses = await asyncio.gather(
+                    send('move', {'op': 'move', 'game': game, 'orig': 'c10', 'dest': 'd8'}),
+                    send('state', {'op': 'state', 'game': game}),
+                    send('delete', {'op': 'delete', 'game': game}),
+                    send('late', {'op': 'move', 'game': game, 'orig': 'c1', 'dest': 'd3'}))
+                return responses, finished, server.get_game_count()
+            finally:
+                server.close()
+        (moved, state, deleted, late), finished, count = asyncio.run(session())
+        # The delete waits for the move and the state request queued before it, and the move queued after it finds
+        # the game gone once it gets the lock.
+        self.assertEqual(finished, ['move', 'state', 'delete', 'late'])
+        self.assertTrue(moved['ok'] and moved['valid'])
+        self.assertEqual(state['state']['turn'], 'red')
+        self.assertTrue(deleted['ok'])
+        self.assertFalse(late['ok'])
+        self.assertEqual(count, 0)
 
+    def test_load(self):
+        async def session():
+            server = JanggiServer.GameServer()
+            listener = await server.start(port=0)
+            try:
+                return await JanggiServer.run_load(4, 2, port=listener.sockets[0].getsockname()[1], max_moves=5)
+            finally:
+                listener.close()
+                await listener.wait_closed()
+                server.close()
+        totals = asyncio.run(session())
+        self.assertEqual(totals['moves'], 20)
+        self.assertLessEqual(totals['p50_ms'], totals['p99_ms'])
+        self.assertEqual(JanggiServer.percentile([1, 2, 3, 4], 0.5), 2)
+        self.assertEqual(JanggiServer.percentile([1, 2, 3, 4], 0.99), 4)